@@ -0,0 +1,138 @@
+"""
+Бенчмарк гарячого шляху до і після архівації: останній рік має сталий обсяг, а історія за 10 років
+зростає так, що всього даних стає в 10 разів більше.
+Для кожного розміру запити вимірюються на тій самій базі спершу без архіву, потім після перенесення
+витрат, старших за рік, в expenses_archive. Окремо - запит, що сягає архіву (місячний ряд за 5 років).
+
+Запуск:  python -m benchmarks.bench_archive --rows 200000,2000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+from datetime import date, timedelta
+from time import perf_counter
+
+TMP_DIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(TMP_DIR, "bench_archive.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+# Межа архіву в бенчмарку не перечитується з БД під час вимірювань
+os.environ.setdefault("ARCHIVE_STATE_TTL", "3600")
+
+from exchanger.dependencies import Base, engine, async_engine, AsyncSessionLocal  # noqa: E402
+from exchanger.models import users_model, category_model  # noqa: E402,F401
+from exchanger.services.analytics_service import (  # noqa: E402
+    get_expenses_by_category_for_user, get_expenses_summary_for_user, get_expenses_timeseries_for_user,
+)
+from exchanger.services.archive_service import archive_boundary, archive_expenses  # noqa: E402
+from exchanger.services.expense_service import get_expenses_page  # noqa: E402
+from exchanger.services.rollup_service import rebuild_rollups  # noqa: E402
+
+USERS = 10
+HISTORY_DAYS = 3650
+TODAY = date.today()
+NO_FILTERS = {"cursor": None, "category_id": None, "date_from": None, "date_to": None}
+
+
+def seed(rows: int, hot_rows: int):
+    engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(1)
+    conn = sqlite3.connect(DB_PATH)
+    conn.executemany("INSERT INTO users (id, email, hashed_password, full_name, role, is_active) VALUES (?, ?, 'x', 'B', 'user', 1)",
+                     [(i, f"u{i}@b") for i in range(1, USERS + 1)])
+    conn.executemany("INSERT INTO categories (id, name, user_id) VALUES (?, ?, 1)", [(i, f"c{i}") for i in range(1, 21)])
+    # Останній рік (гарячий шар) завжди hot_rows витрат, решта - старша історія до 10 років.
+    # created_at завжди дата вставки, тож id зростають разом з датою
+    days = sorted([TODAY - timedelta(days=rnd.randrange(365)) for _ in range(hot_rows)] +
+                  [TODAY - timedelta(days=rnd.randrange(365, HISTORY_DAYS)) for _ in range(rows - hot_rows)])
+    batch = []
+    for day in days:
+        batch.append((rnd.randrange(1, USERS + 1), rnd.randrange(1, 21), rnd.randrange(1, 5000), "x", day, day))
+        if len(batch) == 100_000:
+            conn.executemany("INSERT INTO expenses (user_id, category_id, amount, description, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO expenses (user_id, category_id, amount, description, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+def hot_queries():
+    month_start = TODAY.replace(day=1)
+    return {
+        "list page": lambda db: get_expenses_page(db, 1, 50, **NO_FILTERS),
+        "list 30 days": lambda db: get_expenses_page(db, 1, 50, **{**NO_FILTERS, "date_from": TODAY - timedelta(days=30)}),
+        "summary month": lambda db: get_expenses_summary_for_user(db, 1, month_start, TODAY),
+        "by category 90d": lambda db: get_expenses_by_category_for_user(db, 1, TODAY - timedelta(days=90), TODAY),
+        "timeseries 90d": lambda db: get_expenses_timeseries_for_user(db, 1, TODAY - timedelta(days=90), TODAY, "day"),
+    }
+
+
+def cold_queries():
+    return {
+        "timeseries 5y": lambda db: get_expenses_timeseries_for_user(db, 1, TODAY - timedelta(days=5 * 365), TODAY,
+                                                                     "month", True),
+        "summary 5y": lambda db: get_expenses_summary_for_user(db, 1, TODAY - timedelta(days=5 * 365), TODAY),
+    }
+
+
+async def measure(queries: dict, repeats: int) -> tuple[dict, dict]:
+    timings, results = {}, {}
+    async with AsyncSessionLocal() as db:
+        for name, query in queries.items():
+            samples = []
+            for _ in range(repeats):
+                started = perf_counter()
+                results[name] = await query(db)
+                samples.append(perf_counter() - started)
+            timings[name] = statistics.median(samples) * 1000
+    return timings, results
+
+
+async def run(rows: int, repeats: int) -> dict:
+    async with AsyncSessionLocal() as db:
+        await rebuild_rollups(db)
+        await db.commit()
+    archive_boundary.set(None)
+    before, before_results = await measure({**hot_queries(), **cold_queries()}, repeats)
+
+    started = perf_counter()
+    report = await archive_expenses(older_than_days=365, grace_seconds=0)
+    archive_s = perf_counter() - started
+    after, after_results = await measure({**hot_queries(), **cold_queries()}, repeats)
+    assert before_results == after_results, "archived reads differ from hot-only reads"
+    print(f"rows={rows}: archived {report['archived']} in {archive_s:.1f}s, hot rows left {rows - report['archived']}")
+    return {"before": before, "after": after}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="200000,2000000")
+    parser.add_argument("--hot-rows", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    sizes = [int(value) for value in args.rows.split(",")]
+    results = {}
+    for rows in sizes:
+        seed(rows, args.hot_rows)
+        results[rows] = asyncio.run(run(rows, args.repeats))
+        asyncio.run(async_engine.dispose())
+
+    header = f"{'query':<16}" + "".join(f" {f'{rows} hot-only':>17} {f'{rows} archived':>17}" for rows in sizes)
+    print(header)
+    for name in {**hot_queries(), **cold_queries()}:
+        print(f"{name:<16}" + "".join(f" {results[rows]['before'][name]:>14.2f} ms {results[rows]['after'][name]:>14.2f} ms"
+                                      for rows in sizes))
+
+
+if __name__ == "__main__":
+    main()
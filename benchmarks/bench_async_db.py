@@ -0,0 +1,122 @@
+"""
+Бенчмарк: пропускна здатність конкурентних запитів із синхронною сесією
+всередині async-хендлера (як було) та з AsyncSession (як стало).
+
+Запуск:  python -m benchmarks.bench_async_db --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+from time import perf_counter
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Повільний запит, що імітує важку агрегацію у SQLite
+SLOW_QUERY = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < :n) "
+    "SELECT count(*) FROM c"
+)
+
+
+def build_sync_app(db_path: str, n: int) -> FastAPI:
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        with engine.connect() as conn:
+            return {"count": conn.execute(SLOW_QUERY, {"n": n}).scalar()}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def build_async_app(db_path: str, n: int) -> FastAPI:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        async with engine.connect() as conn:
+            return {"count": (await conn.execute(SLOW_QUERY, {"n": n})).scalar()}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+async def probe_loop_lag(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    # Наскільки пізніше запланованого прокидається корутина = скільки event loop був заблокований
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def run(app: FastAPI, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    ping_latencies = []
+    lags = []
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(i: int):
+            async with semaphore:
+                # Кожен четвертий запит - легкий, міряємо як сильно його блокують важкі
+                if i % 4 == 0:
+                    started = perf_counter()
+                    await client.get("/ping")
+                    ping_latencies.append(perf_counter() - started)
+                else:
+                    await client.get("/slow")
+
+        prober = asyncio.create_task(probe_loop_lag(stop, lags))
+        started = perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = perf_counter() - started
+        stop.set()
+        await prober
+
+    ping_latencies.sort()
+    lags.sort()
+    return {
+        "rps": total / elapsed,
+        "elapsed": elapsed,
+        "ping_p50_ms": ping_latencies[len(ping_latencies) // 2] * 1000,
+        "loop_lag_p99_ms": lags[int(len(lags) * 0.99)] * 1000,
+        "loop_lag_max_ms": lags[-1] * 1000,
+    }
+
+
+def main():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=200_000, help="розмір рекурсивного CTE")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        for name, builder in (("sync session", build_sync_app), ("AsyncSession", build_async_app)):
+            result = asyncio.run(run(builder(db_path, args.rows), args.requests, args.concurrency))
+            print(
+                f"{name:>13}: {result['rps']:8.1f} req/s  total {result['elapsed']:.2f}s  "
+                f"ping p50 {result['ping_p50_ms']:.1f}ms  "
+                f"loop lag p99 {result['loop_lag_p99_ms']:.1f}ms  max {result['loop_lag_max_ms']:.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Мікробенчмарк накладних витрат автентифікації на запит:
+повний jwt.decode з перевіркою підпису проти кешу перевірених claims.
+
+Запуск:  python -m benchmarks.bench_auth --iterations 20000
+"""
+import argparse
+import os
+from datetime import timedelta
+from timeit import timeit
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from jose import jwt  # noqa: E402
+
+from exchanger.dependencies import SECRET_KEY, ALGORITHM  # noqa: E402
+from exchanger.services.auth_service import create_access_token, decode_token, token_claims_cache  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = create_access_token("bench@example.com", 1, "user", True, timedelta(minutes=20))
+
+    full = timeit(lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), number=args.iterations)
+    token_claims_cache.clear()
+    decode_token(token)
+    cached = timeit(lambda: decode_token(token), number=args.iterations)
+
+    for name, total in (("jwt.decode", full), ("cached claims", cached)):
+        print(f"{name:>14}: {total / args.iterations * 1e6:8.2f} us/request")
+    print(f"speedup: {full / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
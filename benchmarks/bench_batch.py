@@ -0,0 +1,107 @@
+"""
+Бенчмарк синхронізації клієнта після офлайну: N змін витрат (створення, оновлення, видалення)
+окремими запитами POST/PUT/DELETE /expenses проти одного POST /batch (atomic та independent).
+Застосунок запускається в процесі через ASGI-транспорт httpx, Redis - fakeredis,
+тож мережевий round trip тут не враховано: реальний виграш через мережу більший.
+
+Запуск:  python -m benchmarks.bench_batch --ops 10,50,200
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+from time import perf_counter
+
+import httpx
+
+from benchmarks.loadtest import build_rollups, configure_environment, issue_tokens, seed, use_fake_redis
+
+CATEGORIES = 20
+
+
+def plan_operations(rnd: random.Random, count: int, existing: list[int]) -> list[dict]:
+    """Приблизно 60% створень, 25% оновлень і 15% видалень витрат, створених попередніми раундами."""
+    operations = []
+    candidates = list(existing)
+    rnd.shuffle(candidates)
+    for i in range(count):
+        kind = rnd.random()
+        data = {"category_id": rnd.randint(1, CATEGORIES), "amount": rnd.randint(1, 5000), "description": f"sync {i}"}
+        if kind < 0.6 or not candidates:
+            operations.append({"op": "create", "entity": "expense", "data": data})
+        elif kind < 0.85:
+            operations.append({"op": "update", "entity": "expense", "id": candidates[-1], "data": data})
+        else:
+            operations.append({"op": "delete", "entity": "expense", "id": candidates.pop()})
+    return operations
+
+
+async def replay_single(client: httpx.AsyncClient, headers: dict, operations: list[dict]) -> list[int]:
+    created = []
+    for operation in operations:
+        if operation["op"] == "create":
+            response = await client.post("/expenses/new", json=operation["data"], headers=headers)
+            created.append(response.json()["id"])
+        elif operation["op"] == "update":
+            response = await client.put(f"/expenses/{operation['id']}", json=operation["data"], headers=headers)
+        else:
+            response = await client.delete(f"/expenses/{operation['id']}", headers=headers)
+        response.raise_for_status()
+    return created
+
+
+async def replay_batch(client: httpx.AsyncClient, headers: dict, operations: list[dict], mode: str) -> list[int]:
+    response = await client.post("/batch", json={"mode": mode, "operations": operations}, headers=headers)
+    response.raise_for_status()
+    body = response.json()
+    assert body["committed"] and all(result["status"] < 300 for result in body["results"]), body
+    return [result["id"] for result, operation in zip(body["results"], operations) if operation["op"] == "create"]
+
+
+async def run(app, token: str, sizes: list[int], rounds: int):
+    headers = {"Authorization": f"Bearer {token}"}
+    rnd = random.Random(1)
+    existing = []
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            # Прогрів: перші запити ініціалізують кеші, пули і курси
+            existing += await replay_single(client, headers, plan_operations(rnd, 20, existing))
+            print(f"{'ops':>6} {'single ms':>10} {'atomic ms':>10} {'indep. ms':>10} {'speedup':>8}")
+            for size in sizes:
+                timings = {"single": [], "atomic": [], "independent": []}
+                for _ in range(rounds):
+                    for name in timings:
+                        operations = plan_operations(rnd, size, existing)
+                        started = perf_counter()
+                        if name == "single":
+                            created = await replay_single(client, headers, operations)
+                        else:
+                            created = await replay_batch(client, headers, operations, name)
+                        timings[name].append(perf_counter() - started)
+                        removed = {operation["id"] for operation in operations if operation["op"] == "delete"}
+                        existing = [expense_id for expense_id in existing if expense_id not in removed] + created
+                single, atomic, independent = (statistics.median(timings[name]) * 1000 for name in timings)
+                print(f"{size:>6} {single:>10.1f} {atomic:>10.1f} {independent:>10.1f} {single / atomic:>7.1f}x")
+
+
+def main():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", default="10,50,200")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--sql-profile", default=None)
+    args = parser.parse_args()
+
+    db_path = configure_environment(args)
+    from exchanger.main import app
+
+    use_fake_redis()
+    seed(db_path, 1, CATEGORIES, 1000, 1)
+    asyncio.run(build_rollups())
+    asyncio.run(run(app, issue_tokens(1)[1], [int(value) for value in args.ops.split(",")], args.rounds))
+
+
+if __name__ == "__main__":
+    main()
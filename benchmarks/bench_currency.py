@@ -0,0 +1,95 @@
+"""
+Бенчмарк конвертації згрупованих сум (валюта, день): ExchangeRateTable.convert (NumPy, searchsorted)
+проти конвертації кожного рядка окремо з bisect.
+
+Запуск:  python -m benchmarks.bench_currency --groups 100000
+"""
+import argparse
+import bisect
+import os
+import random
+import statistics
+from datetime import date, timedelta
+from time import perf_counter
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import numpy as np  # noqa: E402
+
+from exchanger.services.currency_service import ExchangeRateTable  # noqa: E402
+
+CURRENCIES = ["UAH", "USD", "EUR", "PLN", "GBP"]
+
+
+def build_rates(days: int) -> list[tuple[str, date, float]]:
+    rnd = random.Random(1)
+    start = date(2020, 1, 1)
+    rows = []
+    for currency in CURRENCIES[1:]:
+        rate = rnd.uniform(5, 50)
+        # Курси публікуються лише в робочі дні - решта днів береться as-of
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            if day.weekday() < 5:
+                rate *= rnd.uniform(0.99, 1.01)
+                rows.append((currency, day, rate))
+    return rows
+
+
+def convert_rows(rows, rates: dict, target: str) -> list[float]:
+    def asof(currency: str, day: date) -> float:
+        if currency == "UAH":
+            return 1.0
+        days, values = rates[currency]
+        return values[max(bisect.bisect_right(days, day) - 1, 0)]
+
+    return [amount * asof(currency, day) / asof(target, day) for currency, day, amount in rows]
+
+
+def measure(func, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = perf_counter()
+        func()
+        timings.append(perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    rate_rows = build_rates(args.days)
+    table = ExchangeRateTable("UAH")
+    table.load(rate_rows)
+    rates = {}
+    for currency, day, rate in rate_rows:
+        days, values = rates.setdefault(currency, ([], []))
+        days.append(day)
+        values.append(rate)
+
+    rnd = random.Random(2)
+    start = date(2020, 1, 1)
+    # GROUP BY currency, day віддає групи впорядкованими за валютою і днем
+    rows = sorted((rnd.choice(CURRENCIES), start + timedelta(days=rnd.randrange(args.days)), rnd.randrange(1, 10_000))
+                  for _ in range(args.groups))
+    currencies = np.array([row[0] for row in rows])
+    days = np.array([row[1] for row in rows], dtype="datetime64[D]")
+    amounts = np.array([row[2] for row in rows], dtype=np.int64)
+
+    vectorized = table.convert(amounts, currencies, days, "USD")
+    per_row = convert_rows(rows, rates, "USD")
+    assert np.allclose(vectorized, per_row)
+
+    numpy_ms = measure(lambda: table.convert(amounts, currencies, days, "USD"), args.repeats)
+    python_ms = measure(lambda: convert_rows(rows, rates, "USD"), args.repeats)
+    print(f"groups={args.groups} rates={len(rate_rows)}")
+    print(f"numpy   {numpy_ms:8.2f} ms")
+    print(f"per-row {python_ms:8.2f} ms  ({python_ms / numpy_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
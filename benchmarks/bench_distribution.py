@@ -0,0 +1,172 @@
+"""
+Бенчмарк /statistics/distribution для одного користувача з N витратами (рік статистики):
+  snapshot cold - один запит у масиви NumPy + векторизований розрахунок;
+  snapshot warm - лише розрахунок над знімком з кешу;
+  per-row       - той самий запит, розрахунок циклами Python;
+  sql           - окремий SQL-запит на кожну метрику (перцентилі через ORDER BY ... OFFSET).
+
+Запуск:  python -m benchmarks.bench_distribution --rows 100000,1000000,10000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+from collections import defaultdict
+from datetime import date, timedelta
+from time import perf_counter
+
+TMP_DIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(TMP_DIR, "bench_distribution.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from sqlalchemy import select, text  # noqa: E402
+
+from exchanger.dependencies import Base, engine, async_engine, AsyncSessionLocal  # noqa: E402
+from exchanger.models import users_model, category_model  # noqa: E402,F401
+from exchanger.models.expense_model import Expense  # noqa: E402
+from exchanger.services.distribution_service import (  # noqa: E402
+    PERCENTILES, OUTLIERS_LIMIT, compute_distribution, load_snapshot,
+)
+
+USER_ID = 1
+END = date(2026, 6, 30)
+START = END - timedelta(days=364)
+WINDOW = 7
+HISTORY_DAYS = 5 * 365
+
+
+def seed(rows: int):
+    # Пул тримає з'єднання зі старим файлом - закриваємо його перед видаленням бази
+    engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(1)
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("INSERT INTO users (id, email, hashed_password, full_name, role, is_active) VALUES (1, 'b@b', 'x', 'B', 'user', 1)")
+    conn.executemany("INSERT INTO categories (id, name, user_id) VALUES (?, ?, 1)", [(i, f"c{i}") for i in range(1, 21)])
+    first_day = END - timedelta(days=HISTORY_DAYS - 1)
+    batch = []
+    for i in range(rows):
+        day = (first_day + timedelta(days=i * HISTORY_DAYS // rows)).isoformat()
+        batch.append((USER_ID, rnd.randrange(1, 21), int(rnd.lognormvariate(4, 1)) + 1, "x", day, day))
+        if len(batch) == 100_000:
+            conn.executemany("INSERT INTO expenses (user_id, category_id, amount, description, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO expenses (user_id, category_id, amount, description, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+async def snapshot_cold(db):
+    snapshot = await load_snapshot(db, USER_ID, "UAH")
+    return compute_distribution(snapshot, START, END, window=WINDOW)
+
+
+def _percentile(ordered: list, p: float) -> float:
+    # Лінійна інтерполяція, як у np.percentile
+    position = (len(ordered) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+async def per_row(db):
+    query = (select(Expense.id, Expense.created_at, Expense.category_id, Expense.amount)
+             .filter(Expense.user_id == USER_ID).order_by(Expense.created_at, Expense.id)
+             .execution_options(yield_per=50_000))
+    amounts = []
+    daily = defaultdict(int)
+    weekday_totals = [0] * 7
+    weekday_counts = [0] * 7
+    selected = []
+    result = await db.stream(query)
+    async for rows in result.partitions():
+        for row in rows:
+            if START <= row.created_at <= END:
+                amounts.append(row.amount)
+                selected.append(row)
+                daily[row.created_at] += row.amount
+                weekday_totals[row.created_at.weekday()] += row.amount
+                weekday_counts[row.created_at.weekday()] += 1
+    days = [START + timedelta(days=offset) for offset in range((END - START).days + 1)]
+    daily_totals = [daily[day] for day in days]
+    moving_average = []
+    for i in range(len(days)):
+        window = daily_totals[max(0, i - WINDOW + 1):i + 1]
+        moving_average.append(sum(window) / len(window))
+    ordered = sorted(amounts)
+    percentiles = {f"p{p}": _percentile(ordered, p) for p in PERCENTILES}
+    threshold = percentiles["p75"] + 1.5 * (percentiles["p75"] - percentiles["p25"])
+    outliers = sorted((row for row in selected if row.amount > threshold), key=lambda row: -row.amount)[:OUTLIERS_LIMIT]
+    return {"count": len(amounts), "total": sum(amounts), "mean": statistics.fmean(amounts), "percentiles": percentiles,
+            "daily_totals": daily_totals, "moving_average": moving_average, "weekday_totals": weekday_totals,
+            "weekday_counts": weekday_counts, "outliers": outliers}
+
+
+async def sql_round_trips(db):
+    params = {"user_id": USER_ID, "start": START.isoformat(), "end": END.isoformat()}
+    where = "user_id = :user_id AND created_at BETWEEN :start AND :end"
+    count, total, mean = (await db.execute(text(f"SELECT count(*), sum(amount), avg(amount) FROM expenses WHERE {where}"), params)).one()
+    percentiles = {}
+    for p in PERCENTILES:
+        # Найближчий ранг: кожен перцентиль - окремий прохід з сортуванням
+        offset = int((count - 1) * p / 100)
+        percentiles[f"p{p}"] = (await db.execute(
+            text(f"SELECT amount FROM expenses WHERE {where} ORDER BY amount LIMIT 1 OFFSET :offset"),
+            {**params, "offset": offset})).scalar()
+    daily = (await db.execute(text(f"SELECT created_at, sum(amount) FROM expenses WHERE {where} GROUP BY created_at"), params)).all()
+    weekdays = (await db.execute(text(f"SELECT strftime('%w', created_at), sum(amount), count(*) FROM expenses WHERE {where} GROUP BY 1"), params)).all()
+    threshold = percentiles["p75"] + 1.5 * (percentiles["p75"] - percentiles["p25"])
+    outliers = (await db.execute(text(f"SELECT id, created_at, category_id, amount FROM expenses WHERE {where} AND amount > :threshold ORDER BY amount DESC LIMIT :limit"),
+                                 {**params, "threshold": threshold, "limit": OUTLIERS_LIMIT})).all()
+    return {"count": count, "total": total, "mean": mean, "percentiles": percentiles, "daily": daily,
+            "weekdays": weekdays, "outliers": outliers}
+
+
+async def measure(func, repeats: int) -> tuple[float, dict]:
+    timings = []
+    result = None
+    for _ in range(repeats):
+        async with AsyncSessionLocal() as db:
+            started = perf_counter()
+            result = await func(db)
+            timings.append(perf_counter() - started)
+    return statistics.median(timings) * 1000, result
+
+
+async def run(rows: int, repeats: int):
+    async with AsyncSessionLocal() as db:
+        snapshot = await load_snapshot(db, USER_ID, "UAH")
+    warm_ms, warm = await measure(lambda db: asyncio.sleep(0, compute_distribution(snapshot, START, END, window=WINDOW)),
+                                  repeats)
+    cold_ms, _ = await measure(snapshot_cold, repeats)
+    python_ms, python = await measure(per_row, max(1, repeats // 3))
+    sql_ms, _ = await measure(sql_round_trips, repeats)
+    assert warm["count"] == python["count"] and warm["total"] == python["total"]
+    assert all(abs(warm["percentiles"][key] - value) < 0.01 for key, value in python["percentiles"].items())
+    print(f"{rows:>10} {warm['count']:>9} {warm_ms:>10.1f} {cold_ms:>10.1f} {python_ms:>10.1f} {sql_ms:>10.1f}  "
+          f"{snapshot.ids.nbytes + snapshot.days.nbytes + snapshot.category_ids.nbytes + snapshot.amounts.nbytes >> 20} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="100000,1000000,10000000")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'in range':>9} {'warm ms':>10} {'cold ms':>10} {'per-row ms':>10} {'sql ms':>10}  snapshot")
+    for rows in (int(value) for value in args.rows.split(",")):
+        seed(rows)
+        asyncio.run(run(rows, args.repeats))
+        asyncio.run(async_engine.dispose())
+
+
+if __name__ == "__main__":
+    main()
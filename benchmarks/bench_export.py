@@ -0,0 +1,98 @@
+"""
+Бенчмарк експорту: потоковий експорт витрат (yield_per + StreamingResponse-генератор)
+проти буферизованого (усі рядки в пам'ять, потім один рядок відповіді).
+
+Пікова RSS міряється через ru_maxrss, тому потоковий варіант запускається першим.
+
+Запуск:  python -m benchmarks.bench_export --rows 1000000 [--compress]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+from time import perf_counter
+
+TMP_DIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(TMP_DIR, "bench_export.db")
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+from exchanger.dependencies import Base, async_engine, AsyncSessionLocal  # noqa: E402
+from exchanger.models import users_model, category_model, expense_model  # noqa: E402,F401
+from exchanger.services.expense_service import build_expenses_query, stream_expenses, gzip_stream, expense_to_dict  # noqa: E402
+
+
+def max_rss_mb() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux повертає кілобайти, macOS - байти
+    return usage / 1024 / 1024 if sys.platform == "darwin" else usage / 1024
+
+
+async def create_schema():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+def seed(rows: int):
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("INSERT INTO users (id, email, hashed_password, full_name, role, is_active) VALUES (1, 'b@b', 'x', 'B', 'user', 1)")
+    conn.execute("INSERT INTO categories (id, name, user_id) VALUES (1, 'bench', 1)")
+    start = date(2020, 1, 1)
+    batch = []
+    for i in range(rows):
+        day = (start + timedelta(days=i % 2000)).isoformat()
+        batch.append((1, 1, i % 5000, f"expense number {i}", day, day))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO expenses (user_id, category_id, amount, description, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO expenses (user_id, category_id, amount, description, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+async def streamed(fmt: str, compress: bool) -> int:
+    body = stream_expenses(1, {}, fmt)
+    if compress:
+        body = gzip_stream(body)
+    size = 0
+    async for chunk in body:
+        size += len(chunk)
+    return size
+
+
+async def buffered() -> int:
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(build_expenses_query(1))).all()
+        import json
+        return len(json.dumps([expense_to_dict(row) for row in rows]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--compress", action="store_true")
+    args = parser.parse_args()
+
+    asyncio.run(create_schema())
+    started = perf_counter()
+    seed(args.rows)
+    print(f"seeded {args.rows} rows in {perf_counter() - started:.1f}s, baseline RSS {max_rss_mb():.0f} MB")
+
+    started = perf_counter()
+    size = asyncio.run(streamed(args.format, args.compress))
+    elapsed = perf_counter() - started
+    print(f"streamed {args.format}{'+gzip' if args.compress else ''}: {size / 1e6:.1f} MB in {elapsed:.2f}s "
+          f"({args.rows / elapsed:,.0f} rows/s), peak RSS {max_rss_mb():.0f} MB")
+
+    started = perf_counter()
+    size = asyncio.run(buffered())
+    print(f"buffered json: {size / 1e6:.1f} MB in {perf_counter() - started:.2f}s, peak RSS {max_rss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
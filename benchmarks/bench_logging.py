@@ -0,0 +1,116 @@
+"""
+Бенчмарк накладних витрат логування на запит:
+  before - синхронний StreamHandler у stdout, два f-string записи на запит у middleware і один у хендлері;
+  after  - JSON через QueueHandler/QueueListener, один запис доступу, вибірка 1% для INFO.
+
+stdout перенаправляється в /dev/null, щоб міряти саме логування, а не термінал.
+
+Запуск:  python -m benchmarks.bench_logging --requests 5000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import uuid
+from time import perf_counter
+
+import httpx
+from fastapi import FastAPI, Request
+
+from exchanger.services.logging_service import (
+    setup_logging, stop_logging, bind_request_context, reset_request_context, log_request,
+)
+
+logger = logging.getLogger("service")
+
+
+def build_before_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def log_requests(request: Request, call_next):
+        start_time = perf_counter()
+        logger.info(f"New request: {request.method} {request.url}")
+        response = await call_next(request)
+        duration = perf_counter() - start_time
+        logger.info(f"Completed: {request.method} {request.url} - Status: {response.status_code} - Time: {duration:.2f}s")
+        return response
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        logger.info(f"Отримання елемента {item_id}")
+        return {"id": item_id}
+
+    return app
+
+
+def build_after_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def log_requests(request: Request, call_next):
+        start_time = perf_counter()
+        context = bind_request_context(uuid.uuid4().hex, "/items/{item_id}")
+        try:
+            response = await call_next(request)
+            log_request(request.method, "/items/{item_id}", response.status_code, perf_counter() - start_time)
+            return response
+        finally:
+            reset_request_context(context)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        logger.info("Отримання елемента %s", item_id)
+        return {"id": item_id}
+
+    return app
+
+
+async def run(app: FastAPI, total: int) -> float:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for i in range(50):
+            await client.get(f"/items/{i}")
+        started = perf_counter()
+        for i in range(total):
+            await client.get(f"/items/{i}")
+        return perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    real_stdout = sys.stdout
+    devnull = open(os.devnull, "w")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    root = logging.getLogger()
+
+    # before
+    sys.stdout = devnull
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+    before = asyncio.run(run(build_before_app(), args.requests))
+
+    # after
+    setup_logging("INFO", "json", args.sample_rate)
+    after = asyncio.run(run(build_after_app(), args.requests))
+    stop_logging()
+
+    # база без логування взагалі
+    root.handlers = []
+    root.setLevel(logging.CRITICAL)
+    no_logging = asyncio.run(run(build_after_app(), args.requests))
+    sys.stdout = real_stdout
+
+    for name, elapsed in (("no logging", no_logging), ("before", before), ("after", after)):
+        overhead = (elapsed - no_logging) / args.requests * 1e6
+        print(f"{name:>10}: {args.requests / elapsed:8.0f} req/s  logging overhead {overhead:7.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
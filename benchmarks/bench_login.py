@@ -0,0 +1,91 @@
+"""
+Бенчмарк входу: bcrypt.verify прямо в async-хендлері (як було) проти пулу bcrypt
+з обмеженою чергою (як стало). Показує пропускну здатність /login і затримку
+легкого ендпоінту, який виконується паралельно з логінами.
+
+Запуск:  BCRYPT_ROUNDS=10 python -m benchmarks.bench_login --requests 100 --concurrency 20
+"""
+import argparse
+import asyncio
+import logging
+from time import perf_counter
+
+import httpx
+from fastapi import FastAPI
+
+from exchanger.services.password_service import get_bcrypt_context, verify_password, shutdown_password_pool
+
+PASSWORD = "correct horse battery staple"
+
+
+def build_app(hashed: str, pooled: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/login")
+    async def login():
+        if pooled:
+            verified, _ = await verify_password(PASSWORD, hashed)
+        else:
+            verified = get_bcrypt_context().verify(PASSWORD, hashed)
+        return {"ok": verified}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+async def run(app: FastAPI, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = {}
+    ping_latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def login():
+            async with semaphore:
+                response = await client.post("/login")
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def pinger(stop: asyncio.Event):
+            while not stop.is_set():
+                started = perf_counter()
+                await client.get("/ping")
+                ping_latencies.append(perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        stop = asyncio.Event()
+        ping_task = asyncio.create_task(pinger(stop))
+        started = perf_counter()
+        await asyncio.gather(*(login() for _ in range(total)))
+        elapsed = perf_counter() - started
+        stop.set()
+        await ping_task
+
+    ping_latencies.sort()
+    return {
+        "logins_per_s": total / elapsed,
+        "statuses": statuses,
+        "pings": len(ping_latencies),
+        "ping_p50_ms": ping_latencies[len(ping_latencies) // 2] * 1000,
+        "ping_max_ms": ping_latencies[-1] * 1000,
+    }
+
+
+def main():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    hashed = get_bcrypt_context().hash(PASSWORD)
+    for name, pooled in (("inline bcrypt", False), ("bcrypt pool", True)):
+        result = asyncio.run(run(build_app(hashed, pooled), args.requests, args.concurrency))
+        print(f"{name:>13}: {result['logins_per_s']:6.1f} logins/s  statuses {result['statuses']}  "
+              f"pings {result['pings']}  p50 {result['ping_p50_ms']:.1f}ms  max {result['ping_max_ms']:.1f}ms")
+        shutdown_password_pool()
+
+
+if __name__ == "__main__":
+    main()
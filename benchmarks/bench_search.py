@@ -0,0 +1,124 @@
+"""
+Бенчмарк пошуку витрат за описом: FTS5-індекс (search_expenses, sort=rank і sort=date) проти LIKE '%...%'.
+
+Описи складаються з назви продавця (розподіл Ципфа), місяця і випадкового слова,
+тож у наборі є і рідкісні, і дуже часті слова.
+
+Запуск:  python -m benchmarks.bench_search --rows 1000000 --users 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+from datetime import date, timedelta
+from time import perf_counter
+
+TMP_DIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(TMP_DIR, "bench_search.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from sqlalchemy import select  # noqa: E402
+
+from exchanger.dependencies import Base, engine, AsyncSessionLocal  # noqa: E402
+from exchanger.models import users_model, category_model  # noqa: E402,F401
+from exchanger.models.expense_model import Expense  # noqa: E402
+from exchanger.services.expense_service import EXPENSE_COLUMNS  # noqa: E402
+from exchanger.services.search_service import ensure_search_index, search_expenses  # noqa: E402
+
+MERCHANTS = ["uber", "rent", "grocery", "coffee", "netflix", "spotify", "pharmacy", "gym", "taxi", "bakery",
+             "cinema", "fuel", "parking", "insurance", "internet", "electricity", "water", "books", "pizza",
+             "sushi", "hotel", "flight", "train", "bus", "museum", "concert", "dentist", "vet", "florist", "zoo"]
+MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august", "september", "october",
+          "november", "december"]
+
+QUERIES = [
+    ("frequent word", "uber"),
+    ("rare word", "zoo"),
+    ("two words", "rent march"),
+    ("typing", "rent mar"),
+    ("prefix", "phar"),
+    ("unique word", "w4242"),
+]
+
+
+def seed(rows: int, users: int):
+    rnd = random.Random(1)
+    weights = [1 / (rank + 1) for rank in range(len(MERCHANTS))]
+    conn = sqlite3.connect(DB_PATH)
+    conn.executemany("INSERT INTO users (id, email, hashed_password, full_name, role, is_active) VALUES (?, ?, 'x', 'B', 'user', 1)",
+                     [(i, f"b{i}@b") for i in range(1, users + 1)])
+    conn.execute("INSERT INTO categories (id, name, user_id) VALUES (1, 'bench', 1)")
+    start = date(2020, 1, 1)
+    batch = []
+    merchants = rnd.choices(MERCHANTS, weights=weights, k=rows)
+    for i in range(rows):
+        day = (start + timedelta(days=i % 2000)).isoformat()
+        description = f"{merchants[i]} {rnd.choice(MONTHS)} w{rnd.randrange(50_000)}"
+        batch.append(((i % users) + 1, 1, i % 5000, description, day, day))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO expenses (user_id, category_id, amount, description, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO expenses (user_id, category_id, amount, description, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+async def fts_search(db, user_id: int, q: str, limit: int, sort: str):
+    return (await search_expenses(db, user_id, q, limit, sort=sort))["items"]
+
+
+async def like_search(db, user_id: int, q: str, limit: int):
+    query = select(*EXPENSE_COLUMNS).filter(Expense.user_id == user_id)
+    for term in q.split():
+        query = query.filter(Expense.description.like(f"%{term}%"))
+    query = query.order_by(Expense.created_at.desc(), Expense.id.desc()).limit(limit)
+    return (await db.execute(query)).all()
+
+
+async def measure(search, repeats: int) -> tuple[float, int]:
+    timings = []
+    found = 0
+    async with AsyncSessionLocal() as db:
+        for _ in range(repeats):
+            started = perf_counter()
+            found = len(await search(db))
+            timings.append(perf_counter() - started)
+    return statistics.median(timings) * 1000, found
+
+
+async def run(users: int, limit: int, repeats: int):
+    user_id = users // 2 or 1
+    print(f"{'query':<14} {'q':<11} {'rank ms':>9} {'date ms':>9} {'like ms':>9}  found")
+    for name, q in QUERIES:
+        rank_ms, found = await measure(lambda db: fts_search(db, user_id, q, limit, "rank"), repeats)
+        date_ms, _ = await measure(lambda db: fts_search(db, user_id, q, limit, "date"), repeats)
+        like_ms, _ = await measure(lambda db: like_search(db, user_id, q, limit), repeats)
+        print(f"{name:<14} {q:<11} {rank_ms:>9.2f} {date_ms:>9.2f} {like_ms:>9.2f}  {found}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    started = perf_counter()
+    seed(args.rows, args.users)
+    print(f"seeded {args.rows} rows in {perf_counter() - started:.1f}s")
+    started = perf_counter()
+    with engine.begin() as conn:
+        ensure_search_index(conn)
+    print(f"built FTS5 index in {perf_counter() - started:.1f}s")
+    asyncio.run(run(args.users, args.limit, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
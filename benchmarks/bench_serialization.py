@@ -0,0 +1,82 @@
+"""
+Бенчмарк відповіді зі списком на 10k витрат:
+- json.loads закешованого рядка + стандартний JSONResponse FastAPI (як було);
+- готовий JSON з кешу як сирий Response (як стало на попаданні в кеш);
+- ORJSONResponse з response_model (промах кешу, серіалізує сам FastAPI).
+
+Запуск:  python -m benchmarks.bench_serialization --items 10000 --iterations 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+from datetime import date, timedelta
+from time import perf_counter
+
+import httpx
+import orjson
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+
+from exchanger.schemas.expense_schemas import ExpensePageResponse
+
+
+def build_page(items: int) -> dict:
+    start = date(2024, 1, 1)
+    return {
+        "items": [
+            {"id": i, "amount": i % 5000, "description": f"expense number {i}", "category_id": i % 20,
+             "created_at": (start + timedelta(days=i % 365)).isoformat()}
+            for i in range(items)
+        ],
+        "next_cursor": None,
+    }
+
+
+def build_app(page: dict) -> FastAPI:
+    # З Redis (decode_responses=True) значення приходить рядком
+    cached = orjson.dumps(page).decode()
+    app = FastAPI()
+
+    @app.get("/decoded", response_class=JSONResponse)
+    async def decoded():
+        return json.loads(cached)
+
+    @app.get("/raw")
+    async def raw():
+        return Response(content=cached, media_type="application/json")
+
+    @app.get("/model", response_class=ORJSONResponse, response_model=ExpensePageResponse)
+    async def model():
+        return page
+
+    return app
+
+
+async def run(app: FastAPI, path: str, iterations: int) -> tuple[float, int]:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.get(path)
+        size = 0
+        started = perf_counter()
+        for _ in range(iterations):
+            size += len((await client.get(path)).content)
+        return perf_counter() - started, size
+
+
+def main():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    app = build_app(build_page(args.items))
+    for name, path in (("json.loads + JSONResponse", "/decoded"), ("cached bytes", "/raw"),
+                       ("ORJSONResponse + model", "/model")):
+        elapsed, size = asyncio.run(run(app, path, args.iterations))
+        print(f"{name:>26}: {args.iterations / elapsed:7.1f} req/s  {size / elapsed / 1e6:8.1f} MB/s  "
+              f"{elapsed / args.iterations * 1000:7.2f} ms/response")
+
+
+if __name__ == "__main__":
+    main()
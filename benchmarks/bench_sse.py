@@ -0,0 +1,127 @@
+"""
+Бенчмарк живих оновлень (GET /statistics/stream) без HTTP-шару: потоки - це генератори live_stream,
+які читаються задачами asyncio, Redis - fakeredis (pub/sub через LiveHub, як у воркері).
+  idle        - пам'ять на одне відкрите з'єднання без подій (tracemalloc);
+  fan-out     - час від publish_expense_changes до доставки подій усім потокам користувача;
+  incremental - оновлення підсумку дельтою проти повторного агрегатного запиту, як при опитуванні.
+
+Запуск:  python -m benchmarks.bench_sse --connections 1000,5000
+"""
+import argparse
+import asyncio
+import gc
+import statistics
+import tracemalloc
+from datetime import date
+from time import perf_counter
+
+from benchmarks.loadtest import build_rollups, configure_environment, seed, use_fake_redis
+
+USERS = 50
+EXPENSES_PER_USER = 2000
+
+
+async def consume(stream, received: list, index: int):
+    async for _ in stream:
+        received[index] += 1
+
+
+async def open_streams(count: int, received: list) -> list[asyncio.Task]:
+    from exchanger.services.live_service import live_stream
+    from exchanger.services.redis_client import get_redis
+
+    redis_client = await get_redis()
+    tasks = []
+    for i in range(count):
+        # Потоки рівномірно розподілені між користувачами; кожен спершу читає підсумок з БД
+        tasks.append(asyncio.create_task(consume(live_stream(redis_client, i % USERS + 1, "month", None), received, i)))
+        if len(tasks) % 200 == 0:
+            await asyncio.sleep(0)
+    while sum(1 for value in received[:count] if value) < count:
+        await asyncio.sleep(0.05)
+    return tasks
+
+
+async def run(sizes: list[int], events: int):
+    from exchanger.dependencies import AsyncSessionLocal
+    from exchanger.services.analytics_service import calculate_date_range, get_expenses_summary_for_user
+    from exchanger.services.live_service import PeriodTotals, live_hub, publish_expense_changes
+    from exchanger.services.pubsub_service import subscriber
+    from exchanger.services.redis_client import get_redis
+
+    redis_client = await get_redis()
+    live_hub.start()
+    subscriber.start()
+    await asyncio.sleep(0.2)
+    print(f"{'streams':>8} {'open s':>8} {'KB/stream':>10} {'fan-out ms':>11} {'per stream us':>14}")
+    for count in sizes:
+        received = [0] * count
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        started = perf_counter()
+        tasks = await open_streams(count, received)
+        open_s = perf_counter() - started
+        gc.collect()
+        per_stream_kb = (tracemalloc.get_traced_memory()[0] - before) / count / 1024
+        tracemalloc.stop()
+
+        # Усі потоки одного користувача отримують кожну подію
+        listeners = count // USERS
+        timings = []
+        for i in range(events):
+            expected = [value + 2 for value in received]
+            event = {"type": "created", "expense": {"id": -i}, "deltas": [[date.today().isoformat(), 1, "UAH", 100, 1]]}
+            started = perf_counter()
+            await publish_expense_changes(redis_client, 1, [event])
+            while any(received[j] < expected[j] for j in range(0, count, USERS)):
+                await asyncio.sleep(0)
+            timings.append(perf_counter() - started)
+        fan_out_ms = statistics.median(timings) * 1000
+        print(f"{count:>8} {open_s:>8.1f} {per_stream_kb:>10.1f} {fan_out_ms:>11.2f} "
+              f"{fan_out_ms * 1000 / listeners:>14.1f}")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Підсумок дельтою проти нового агрегатного запиту
+    totals = PeriodTotals(1, "month", None)
+    await totals.load(redis_client)
+    message = {"version": None, "events": [{"type": "created", "expense": None,
+                                            "deltas": [[date.today().isoformat(), 1, "UAH", 100, 1]]}]}
+    repeats = 2000
+    started = perf_counter()
+    for _ in range(repeats):
+        totals.apply(message)
+    incremental_us = (perf_counter() - started) / repeats * 1e6
+    start_date, end_date = calculate_date_range("month")
+    samples = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(200):
+            started = perf_counter()
+            await get_expenses_summary_for_user(db, 1, start_date, end_date, "UAH")
+            samples.append(perf_counter() - started)
+    query_us = statistics.median(samples) * 1e6
+    print(f"summary update: delta {incremental_us:.1f} us, aggregate query {query_us:.1f} us "
+          f"({query_us / incremental_us:.0f}x)")
+    live_hub.stop()
+    await subscriber.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", default="1000,5000")
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--sql-profile", default=None)
+    args = parser.parse_args()
+
+    db_path = configure_environment(args)
+    use_fake_redis()
+    seed(db_path, USERS, 20, EXPENSES_PER_USER, 1)
+    asyncio.run(build_rollups())
+    asyncio.run(run([int(value) for value in args.connections.split(",")], args.events))
+
+
+if __name__ == "__main__":
+    main()
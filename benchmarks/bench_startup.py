@@ -0,0 +1,109 @@
+"""
+Бенчмарк холодного старту воркера. Кожен прогін - окремий процес Python:
+  import  - час імпорту exchanger.main;
+  startup - lifespan до готовності (міграції, курси, прогрів пулів і кешів);
+  first   - перший запит до маршруту після старту, warm - медіана наступних.
+Redis - порожній fakeredis, тож перший запит без прогріву ще й наповнює кеш.
+
+Запуск:  python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+CATEGORIES = 20
+
+
+def build_requests(token: str) -> dict:
+    """Назва -> функція (номер повтору) -> (метод, шлях, параметри httpx)."""
+    from benchmarks.loadtest import PASSWORD
+
+    headers = {"Authorization": f"Bearer {token}"}
+    return {
+        "login": lambda i: ("POST", "/auth/token",
+                            {"data": {"username": "user1@loadtest.local", "password": PASSWORD}}),
+        "register": lambda i: ("POST", "/auth/register",
+                               {"json": {"email": f"new{os.getpid()}-{i}@bench.example.com", "full_name": "New",
+                                         "password": PASSWORD, "role": "user"}}),
+        "categories": lambda i: ("GET", "/categories/", {"headers": headers}),
+        "expenses": lambda i: ("GET", "/expenses/", {"params": {"limit": 50}, "headers": headers}),
+        "create_expense": lambda i: ("POST", "/expenses/new",
+                                     {"json": {"category_id": i % CATEGORIES + 1, "amount": 100,
+                                               "description": f"startup {i}"}, "headers": headers}),
+    }
+
+
+async def measure(app, token: str, repeats: int) -> dict:
+    import httpx
+
+    result = {}
+    started = perf_counter()
+    async with app.router.lifespan_context(app):
+        result["startup_ms"] = (perf_counter() - started) * 1000
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for name, make_request in build_requests(token).items():
+                timings = []
+                for i in range(repeats + 1):
+                    method, path, kwargs = make_request(i)
+                    started = perf_counter()
+                    response = await client.request(method, path, **kwargs)
+                    timings.append((perf_counter() - started) * 1000)
+                    response.raise_for_status()
+                result[name] = {"first_ms": timings[0], "warm_ms": statistics.median(timings[1:])}
+    return result
+
+
+def child(repeats: int):
+    # Імпорт застосунку - першим, до httpx і помічників бенчмарку, які імпортують спільні залежності
+    started = perf_counter()
+    from exchanger.main import app
+    import_ms = (perf_counter() - started) * 1000
+
+    from benchmarks.loadtest import use_fake_redis
+
+    use_fake_redis()
+    result = asyncio.run(measure(app, os.environ["BENCH_TOKEN"], repeats))
+    print(json.dumps({"import_ms": import_ms, **result}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--sql-profile", default=None)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.repeats)
+        return
+
+    from benchmarks.loadtest import configure_environment, issue_tokens, seed
+
+    db_path = configure_environment(args)
+    seed(db_path, 1, CATEGORIES, 1000, 1)
+    # Токен випускає батьківський процес, щоб дочірній не імпортував jose до першого запиту
+    env = {**os.environ, "BENCH_TOKEN": issue_tokens(1)[1]}
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child",
+                                 "--repeats", str(args.repeats)], env=env, capture_output=True, text=True, check=True)
+        runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    print(f"runs: {args.runs}, medians")
+    print(f"import exchanger.main {statistics.median(run['import_ms'] for run in runs):8.1f} ms")
+    print(f"lifespan startup      {statistics.median(run['startup_ms'] for run in runs):8.1f} ms")
+    print(f"{'route':<16} {'first ms':>9} {'warm ms':>9}")
+    for name in build_requests(""):
+        first = statistics.median(run[name]["first_ms"] for run in runs)
+        warm = statistics.median(run[name]["warm_ms"] for run in runs)
+        print(f"{name:<16} {first:>9.2f} {warm:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""
+Навантажувальний тест основних маршрутів API.
+
+Застосунок exchanger.main:app запускається в цьому ж процесі: через ASGI-транспорт httpx
+(--mode asgi) або на локальному uvicorn (--mode uvicorn). SQLite у тимчасовій теці
+наповнюється тестовими даними, замість Redis використовується fakeredis. Сценарії
+виконуються випадково з вагами; результат - p50/p95/p99 і RPS на маршрут у JSON,
+який можна порівнювати між комітами.
+
+Запуск:      python -m benchmarks.loadtest --requests 5000 --concurrency 32 --output after.json
+Порівняння:  python -m benchmarks.loadtest ... --compare before.json --max-regression 0.2
+Профіль SQL: python -m benchmarks.loadtest ... --sql-profile sql.json  (запити на маршрут, N+1, плани)
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from time import perf_counter
+
+import httpx
+
+PASSWORD = "benchmark-password"
+
+DEFAULT_WEIGHTS = {
+    "login": 2,
+    "list_expenses": 30,
+    "create_expense": 15,
+    "summary": 10,
+    "by_category": 10,
+    "timeseries": 8,
+    "categories": 25,
+}
+
+
+def parse_weights(value: str) -> dict[str, float]:
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_WEIGHTS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}, expected one of {', '.join(DEFAULT_WEIGHTS)}")
+        weights[name] = float(weight)
+    return weights
+
+
+def configure_environment(args):
+    """Має виконатися до імпорту exchanger: конфігурація читається під час імпорту dependencies."""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="exchanger-loadtest-"), "loadtest.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("SECRET_KEY", "loadtest-secret-key")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["MAIL_DISPATCHER_ENABLED"] = "false"
+    # Усі віртуальні користувачі приходять з одного IP; ліміти можна ввімкнути явно через змінну
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    if args.sql_profile:
+        os.environ["SQL_PROFILER_ENABLED"] = "true"
+    return db_path
+
+
+def use_fake_redis():
+    import fakeredis
+    import redis.asyncio as redis
+    from exchanger.services import redis_client
+
+    redis_client.redis_pool = redis.ConnectionPool(
+        connection_class=fakeredis.aioredis.FakeConnection, server=fakeredis.FakeServer(), decode_responses=True,
+    )
+
+
+def seed(db_path: str, users: int, categories: int, expenses_per_user: int, seed_value: int):
+    from exchanger.dependencies import engine
+    from exchanger.services.migrations import apply_migrations
+    from exchanger.services.password_service import get_bcrypt_context
+
+    # Схему створює lifespan застосунку, але дані потрібні раніше
+    apply_migrations(engine)
+    rnd = random.Random(seed_value)
+    hashed = get_bcrypt_context().hash(PASSWORD)
+    today = date.today()
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO users (id, email, hashed_password, full_name, role, is_active, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, 'user', 1, ?, ?)",
+        [(i, f"user{i}@loadtest.local", hashed, f"User {i}", today, today) for i in range(1, users + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO categories (id, name, user_id, created_at, updated_at) VALUES (?, ?, 1, ?, ?)",
+        [(i, f"category {i}", today, today) for i in range(1, categories + 1)],
+    )
+    for user_id in range(1, users + 1):
+        rows = []
+        for i in range(expenses_per_user):
+            day = (today - timedelta(days=rnd.randrange(365))).isoformat()
+            rows.append((user_id, rnd.randint(1, categories), rnd.randint(1, 5000), f"expense {i}", day, day))
+        conn.executemany(
+            "INSERT INTO expenses (user_id, category_id, amount, description, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    conn.commit()
+    conn.close()
+
+
+async def build_rollups():
+    from exchanger.dependencies import AsyncSessionLocal
+    from exchanger.services.rollup_service import rebuild_rollups
+
+    async with AsyncSessionLocal() as db:
+        await rebuild_rollups(db)
+        await db.commit()
+
+
+def issue_tokens(users: int) -> dict[int, str]:
+    from exchanger.services.auth_service import create_access_token
+
+    return {
+        user_id: create_access_token(f"user{user_id}@loadtest.local", user_id, "user", True, timedelta(hours=2))
+        for user_id in range(1, users + 1)
+    }
+
+
+def build_scenarios(categories: int):
+    today = date.today()
+
+    def login(rnd, user_id, headers):
+        return "POST", "/auth/token", {"data": {"username": f"user{user_id}@loadtest.local", "password": PASSWORD}}
+
+    def list_expenses(rnd, user_id, headers):
+        params = {"limit": 50}
+        if rnd.random() < 0.3:
+            params["category_id"] = rnd.randint(1, categories)
+        return "GET", "/expenses/", {"params": params, "headers": headers}
+
+    def create_expense(rnd, user_id, headers):
+        body = {"category_id": rnd.randint(1, categories), "amount": rnd.randint(1, 5000), "description": "loadtest"}
+        return "POST", "/expenses/new", {"json": body, "headers": headers}
+
+    def summary(rnd, user_id, headers):
+        return "GET", "/statistics/period-summary", {"params": {"period": "month"}, "headers": headers}
+
+    def by_category(rnd, user_id, headers):
+        return "GET", "/statistics/period-by-category", {"params": {"period": "year"}, "headers": headers}
+
+    def timeseries(rnd, user_id, headers):
+        params = {"start": (today - timedelta(days=90)).isoformat(), "end": today.isoformat(), "bucket": "week"}
+        return "GET", "/statistics/timeseries", {"params": params, "headers": headers}
+
+    def list_categories(rnd, user_id, headers):
+        return "GET", "/categories/", {"headers": headers}
+
+    return {
+        "login": login,
+        "list_expenses": list_expenses,
+        "create_expense": create_expense,
+        "summary": summary,
+        "by_category": by_category,
+        "timeseries": timeseries,
+        "categories": list_categories,
+    }
+
+
+async def drive(client: httpx.AsyncClient, args, tokens: dict[int, str]) -> tuple[dict, float]:
+    scenarios = build_scenarios(args.categories)
+    names = [name for name, weight in args.weights.items() if weight > 0]
+    weights = [args.weights[name] for name in names]
+    rnd = random.Random(args.seed)
+    samples: dict[str, dict] = {}
+
+    async def run_phase(plan: list[str], record: bool):
+        position = 0
+
+        async def worker(worker_rnd: random.Random):
+            nonlocal position
+            while position < len(plan):
+                name = plan[position]
+                position += 1
+                user_id = worker_rnd.randint(1, args.users)
+                method, path, kwargs = scenarios[name](worker_rnd, user_id,
+                                                       {"Authorization": f"Bearer {tokens[user_id]}"})
+                started = perf_counter()
+                response = await client.request(method, path, **kwargs)
+                elapsed = perf_counter() - started
+                if not record:
+                    continue
+                stats = samples.setdefault(name, {"route": f"{method} {path}", "latencies": [], "errors": {}})
+                stats["latencies"].append(elapsed)
+                if response.status_code >= 400:
+                    code = str(response.status_code)
+                    stats["errors"][code] = stats["errors"].get(code, 0) + 1
+
+        await asyncio.gather(*(worker(random.Random(rnd.random())) for _ in range(args.concurrency)))
+
+    # Розігрів прогріває кеші і пули з'єднань і не входить у результати
+    await run_phase(rnd.choices(names, weights=weights, k=args.warmup), record=False)
+    started = perf_counter()
+    await run_phase(rnd.choices(names, weights=weights, k=args.requests), record=True)
+    return samples, perf_counter() - started
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: dict) -> dict:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+        "errors": errors,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(args, samples: dict, elapsed: float) -> dict:
+    routes = {name: {"route": stats["route"], **summarize(stats["latencies"], elapsed, stats["errors"])}
+              for name, stats in sorted(samples.items())}
+    all_latencies = [value for stats in samples.values() for value in stats["latencies"]]
+    all_errors: dict[str, int] = {}
+    for stats in samples.values():
+        for code, count in stats["errors"].items():
+            all_errors[code] = all_errors.get(code, 0) + count
+    meta_args = {key: value for key, value in vars(args).items() if key not in ("output", "compare", "sql_profile")}
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "args": meta_args,
+            "elapsed_s": round(elapsed, 3),
+        },
+        "total": summarize(all_latencies, elapsed, all_errors),
+        "routes": routes,
+    }
+
+
+def print_report(report: dict):
+    header = f"{'scenario':<15} {'route':<36} {'count':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  errors"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["routes"].items()) + [("TOTAL", {"route": "", **report["total"]})]
+    for name, stats in rows:
+        print(f"{name:<15} {stats['route']:<36} {stats['count']:>6} {stats['rps']:>8.1f} {stats['p50_ms']:>8.2f} "
+              f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}  {stats['errors'] or ''}")
+
+
+def print_sql_report(sql_report: dict):
+    header = f"{'route':<36} {'requests':>8} {'q/req':>6} {'max q':>6} {'db ms':>7}  {'N+1':>4}"
+    print(header)
+    print("-" * len(header))
+    for route, stats in sql_report["routes"].items():
+        if not stats["requests"]:
+            continue
+        print(f"{route:<36} {stats['requests']:>8} {stats['queries_per_request']:>6.2f} "
+              f"{stats['max_queries_per_request']:>6} {stats['db_ms_per_request']:>7.2f}  {stats['n_plus_one_requests']:>4}")
+        # Підказки для індексів: запити з повним скануванням таблиці або повторами в межах запиту
+        for statement in stats["statements"]:
+            if statement["full_scan"] or statement["n_plus_one"]:
+                flags = ", ".join(flag for flag in ("full_scan", "n_plus_one") if statement[flag])
+                print(f"    [{flags}] {statement['count']}x {statement['avg_ms']:.2f} ms  {statement['sql'][:120]}")
+                for line in statement["plan"]:
+                    print(f"        {line}")
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Регресія - p95 виріс або RPS впав більше ніж на max_regression (частка)."""
+    regressions = []
+    current_routes = {**report["routes"], "TOTAL": report["total"]}
+    baseline_routes = {**baseline["routes"], "TOTAL": baseline["total"]}
+    print(f"\nvs baseline {baseline['meta'].get('commit')}:")
+    for name, stats in current_routes.items():
+        base = baseline_routes.get(name)
+        if not base or not base["count"]:
+            continue
+        p95_change = stats["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        rps_change = stats["rps"] / base["rps"] - 1 if base["rps"] else 0.0
+        flag = ""
+        if p95_change > max_regression or rps_change < -max_regression:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<15} p95 {base['p95_ms']:>8.2f} -> {stats['p95_ms']:>8.2f} ({p95_change:+.0%})  "
+              f"rps {base['rps']:>8.1f} -> {stats['rps']:>8.1f} ({rps_change:+.0%}){flag}")
+    return regressions
+
+
+async def run_asgi(app, args, tokens):
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            return await drive(client, args, tokens)
+
+
+def run_uvicorn(app, args, tokens):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.05)
+
+    async def client_run():
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits) as client:
+            return await drive(client, args, tokens)
+
+    try:
+        return asyncio.run(client_run())
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def main():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--expenses-per-user", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--weights", type=parse_weights, default=dict(DEFAULT_WEIGHTS),
+                        help="e.g. login=0,list_expenses=50 (unlisted scenarios keep their defaults)")
+    # Низька вартість bcrypt за замовчуванням, щоб логіни не затьмарювали решту маршрутів
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON from a previous run")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--sql-profile", help="profile SQL per route and write the report to this JSON file")
+    args = parser.parse_args()
+
+    db_path = configure_environment(args)
+    from exchanger.main import app
+
+    use_fake_redis()
+    started = perf_counter()
+    seed(db_path, args.users, args.categories, args.expenses_per_user, args.seed)
+    asyncio.run(build_rollups())
+    print(f"seeded {args.users} users x {args.expenses_per_user} expenses in {perf_counter() - started:.1f}s ({db_path})")
+    tokens = issue_tokens(args.users)
+    if args.sql_profile:
+        from exchanger.dependencies import query_profiler
+
+        # Звіт лише за навантаженням, без запитів наповнення бази
+        query_profiler.reset()
+
+    if args.mode == "asgi":
+        samples, elapsed = asyncio.run(run_asgi(app, args, tokens))
+    else:
+        samples, elapsed = run_uvicorn(app, args, tokens)
+
+    report = build_report(args, samples, elapsed)
+    print_report(report)
+    if args.sql_profile:
+        sql_report = query_profiler.report()
+        print()
+        print_sql_report(sql_report)
+        with open(args.sql_profile, "w") as f:
+            json.dump(sql_report, f, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
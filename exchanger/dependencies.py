@@ -2,8 +2,12 @@ import os
 import logging
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
+from .services.logging_service import setup_logging, parse_route_mapping
+from .services.sqlite_tuning import configure_sqlite
+from .services.query_profiler import QueryProfiler
 
 load_dotenv()
 
@@ -14,18 +18,176 @@ ALGORITHM = os.getenv("ALGORITHM")
 EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 
+# SMTP налаштовується, щоб у тестах можна було підставити локальний SMTP-сервер
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+APP_BASE_URL = os.getenv("APP_BASE_URL", "http://0.0.0.0:80")
+MAIL_DISPATCHER_ENABLED = os.getenv("MAIL_DISPATCHER_ENABLED", "true").lower() == "true"
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "20"))
+MAIL_MAX_RETRIES = int(os.getenv("MAIL_MAX_RETRIES", "5"))
+# Затримка перед повтором: MAIL_RETRY_BACKOFF * 2^спроба секунд
+MAIL_RETRY_BACKOFF = float(os.getenv("MAIL_RETRY_BACKOFF", "2"))
+# Диспетчер без heartbeat довше за стільки секунд вважається впалим, його незавершені листи повертаються в чергу
+MAIL_WORKER_TTL = int(os.getenv("MAIL_WORKER_TTL", "30"))
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+# Вартість bcrypt; при зміні старі хеші перераховуються під час наступного входу
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+# Скільки операцій bcrypt може чекати в черзі, перш ніж віддавати 503
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "20"))
+# Кеш перевірених токенів і профілів користувачів у пам'яті процесу
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000"))
+USER_PROFILE_CACHE_TTL = float(os.getenv("USER_PROFILE_CACHE_TTL", "60"))
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "0.5"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+# Скільки секунд не звертатися до Redis після помилки з'єднання
+REDIS_RETRY_AFTER = float(os.getenv("REDIS_RETRY_AFTER", "5"))
+
+BULK_IMPORT_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_CHUNK_SIZE", "1000"))
+# Скільки помилок рядків повертати у звіті (решта лише рахується)
+BULK_IMPORT_MAX_ERRORS = int(os.getenv("BULK_IMPORT_MAX_ERRORS", "1000"))
+# Скільки операцій приймає один POST /batch
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "500"))
+
+ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+# Локальний LRU перед Redis; 0 - вимкнено
+ANALYTICS_LOCAL_CACHE_SIZE = int(os.getenv("ANALYTICS_LOCAL_CACHE_SIZE", "1024"))
+ANALYTICS_LOCAL_CACHE_TTL = float(os.getenv("ANALYTICS_LOCAL_CACHE_TTL", "30"))
+# Колонкові знімки витрат для /statistics/distribution: скільки користувачів тримати в пам'яті воркера
+DISTRIBUTION_CACHE_SIZE = int(os.getenv("DISTRIBUTION_CACHE_SIZE", "32"))
+DISTRIBUTION_CACHE_TTL = float(os.getenv("DISTRIBUTION_CACHE_TTL", "600"))
+# Дворівневий кеш: L1 у пам'яті воркера перед Redis (L2). CACHE_L1_SIZE - записів на кожен кеш
+# (категорії, сторінки витрат), CACHE_L1_VALIDATORS_SIZE - версій областей для ETag і ключів кешу.
+# Версії в L1 інвалідуються через Redis pub/sub; CACHE_L1_TTL - страховка, якщо повідомлення загубиться
+CACHE_L1_SIZE = int(os.getenv("CACHE_L1_SIZE", "1024"))
+CACHE_L1_TTL = float(os.getenv("CACHE_L1_TTL", "30"))
+CACHE_L1_VALIDATORS_SIZE = int(os.getenv("CACHE_L1_VALIDATORS_SIZE", "10000"))
+
+# Скільки з'єднань БД і Redis відкрити під час старту воркера, щоб перші запити їх не чекали
+STARTUP_WARM_CONNECTIONS = int(os.getenv("STARTUP_WARM_CONNECTIONS", "4"))
+
+
+# Обмеження частоти запитів (token bucket): rate - запитів за секунду, burst - розмір відра.
+# RATE_LIMIT_BACKEND=redis - спільні відра для всіх воркерів, local - у пам'яті кожного процесу
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local")
+RATE_LIMIT_USER_RATE = float(os.getenv("RATE_LIMIT_USER_RATE", "20"))
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "40"))
+RATE_LIMIT_IP_RATE = float(os.getenv("RATE_LIMIT_IP_RATE", "50"))
+RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "100"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Брати IP клієнта з X-Forwarded-For - лише за довіреним проксі
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+# Одночасні запити на шаблон маршруту; надлишок чекає в черзі не довше бюджету, далі - 503
+ROUTE_CONCURRENCY_LIMITS = parse_route_mapping(
+    os.getenv("ROUTE_CONCURRENCY_LIMITS", "/auth/token=8,/auth/register=8,/auth/users=4,/expenses/=32"), int)
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_BUDGET_MS = float(os.getenv("ADMISSION_QUEUE_BUDGET_MS", "500"))
+
+
+# Структуровані JSON-логи через чергу. Частка запитів, що логуються на рівні INFO, і мінімальний
+# рівень задаються для шаблону маршруту, напр. LOG_SAMPLING="/categories/=0.01,/expenses/=0.01"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_SAMPLING = parse_route_mapping(os.getenv("LOG_SAMPLING", ""), float)
+LOG_ROUTE_LEVELS = parse_route_mapping(os.getenv("LOG_ROUTE_LEVELS", ""), str)
+
+setup_logging(LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE, LOG_SAMPLING, LOG_ROUTE_LEVELS)
 logger = logging.getLogger("service")
 
 
 
 
-SQLALCHEMY_DATABASE_URL = 'sqlite:///exchanger.db'
+# URL бази: sqlite:///exchanger.db локально, для Postgres - postgresql://...
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", 'sqlite:///exchanger.db')
+
+
+def _async_database_url(url: str) -> str:
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={'check_same_thread': False})
+# Асинхронний URL: за замовчуванням той самий файл/сервер через aiosqlite або asyncpg
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_database_url(SQLALCHEMY_DATABASE_URL))
+
+# Режим SQLite для конкурентних запитів: WAL (читачі не блокують писача), fsync лише на checkpoint
+# при synchronous=NORMAL, очікування блокування замість "database is locked" і mmap для читання
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() == "true"
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Групові commit-и витрат: записи, що надійшли протягом вікна, потрапляють в одну транзакцію
+GROUP_COMMIT_ENABLED = os.getenv("GROUP_COMMIT_ENABLED", "true").lower() == "true"
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "200"))
+
+# Валюти: курси зберігаються як кількість одиниць базової валюти за одиницю іншої валюти.
+# Джерело - локальний CSV/JSON файл або URL; 0 - не оновлювати курси у фоні
+BASE_CURRENCY = os.getenv("BASE_CURRENCY", "UAH").upper()
+EXCHANGE_RATES_SOURCE = os.getenv("EXCHANGE_RATES_SOURCE", "")
+EXCHANGE_RATES_REFRESH_SECONDS = float(os.getenv("EXCHANGE_RATES_REFRESH_SECONDS", "0"))
+
+# Пошук без фільтрів ранжує лише стільки найновіших збігів, щоб час запиту не ріс разом з історією
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "1000"))
+
+# Архів: витрати, старші за ARCHIVE_AFTER_DAYS (з точністю до місяця), переносяться в expenses_archive
+# скриптом exchanger.scripts.archive_expenses. Межу архіву воркери перечитують раз на ARCHIVE_STATE_TTL секунд,
+# тому перенесені рядки видаляються з гарячої таблиці лише через ARCHIVE_GRACE_SECONDS після зміни межі
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "730"))
+ARCHIVE_STATE_TTL = float(os.getenv("ARCHIVE_STATE_TTL", "60"))
+ARCHIVE_GRACE_SECONDS = float(os.getenv("ARCHIVE_GRACE_SECONDS", str(2 * ARCHIVE_STATE_TTL)))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))
+
+# Живі оновлення статистики (GET /statistics/stream, SSE). Події змін витрат ідуть через Redis pub/sub,
+# тож доходять до з'єднань на всіх воркерах. SSE_BUFFER_SIZE - скільки подій чекає на повільного клієнта,
+# після переповнення замість них надсилаються перераховані підсумки. SSE_RESYNC_SECONDS - як часто
+# підсумки, оновлені подіями, звіряються з агрегатами
+SSE_ENABLED = os.getenv("SSE_ENABLED", "true").lower() == "true"
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_BUFFER_SIZE = int(os.getenv("SSE_BUFFER_SIZE", "64"))
+SSE_RESYNC_SECONDS = float(os.getenv("SSE_RESYNC_SECONDS", "300"))
+SSE_MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", "10000"))
+
+# Профайлер SQL (лише для діагностики): запити на маршрут, N+1, повільні запити з планом виконання.
+# SQL_PROFILE_REPORT - файл, куди записати звіт за маршрутами при зупинці застосунку
+SQL_PROFILER_ENABLED = os.getenv("SQL_PROFILER_ENABLED", "false").lower() == "true"
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+SQL_PROFILER_MAX_PLANS = int(os.getenv("SQL_PROFILER_MAX_PLANS", "256"))
+SQL_PROFILE_REPORT = os.getenv("SQL_PROFILE_REPORT", "")
+
+_connect_args = {'check_same_thread': False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=_connect_args)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+
+query_profiler = QueryProfiler(SQL_SLOW_QUERY_MS, SQL_N_PLUS_ONE_THRESHOLD, SQL_PROFILER_MAX_PLANS)
+
+for _engine in (engine, async_engine.sync_engine):
+    if _engine.dialect.name == "sqlite":
+        configure_sqlite(_engine, SQLITE_WAL, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE)
+    if SQL_PROFILER_ENABLED:
+        query_profiler.instrument(_engine)
+
+# expire_on_commit=False - після commit атрибути не перечитуються ліниво (в async це заборонено)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
@@ -1,44 +1,146 @@
-from .dependencies import Base, engine
-from .routers import auth,categories,expenses,analytics,users
+from .dependencies import (engine, async_engine, MAIL_DISPATCHER_ENABLED, GROUP_COMMIT_ENABLED, RATE_LIMIT_ENABLED,
+                           EXCHANGE_RATES_REFRESH_SECONDS, SQL_PROFILE_REPORT, SSE_ENABLED, query_profiler)
+from .routers import auth,categories,expenses,analytics,users,batch
+from .services.redis_client import get_redis, close_redis_pool, redis_available
+from .services.password_service import shutdown_password_pool
+from .services.mail_service import mail_dispatcher
+from .services.group_commit import expense_writer
+from .services.live_service import live_hub
+from .services.pubsub_service import subscriber
+from .services.admission_service import check_rate_limits, get_limiter, overloaded
+from .services.migrations import apply_migrations
+from .services.startup_service import warm_up
+from .services.currency_service import refresh_exchange_rates, rates_refresher
+from .services.logging_service import bind_request_context, reset_request_context, log_request
+from .services.metrics_service import instrument_engine, begin_request, end_request, metrics_payload
+import asyncio
 import logging
+import uuid
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from starlette.routing import Match
 import time
 
-app=FastAPI()
 
+# Маршрути, які не проходять контроль допуску: метрики і проби балансувальника
+SERVICE_ROUTES = {"/metrics", "/healthz", "/readyz"}
 
-Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    # Схема - один раз і до першого запиту; воркери, що стартують разом, чекають на блокуванні міграцій
+    await asyncio.to_thread(apply_migrations, engine)
+    redis_client = await get_redis()
+    await refresh_exchange_rates()
+    if EXCHANGE_RATES_REFRESH_SECONDS > 0:
+        rates_refresher.start(EXCHANGE_RATES_REFRESH_SECONDS)
+    if MAIL_DISPATCHER_ENABLED:
+        mail_dispatcher.start()
+    if GROUP_COMMIT_ENABLED:
+        expense_writer.start()
+    if SSE_ENABLED:
+        live_hub.start()
+    subscriber.start()
+    await warm_up(redis_client)
+    app.state.ready = True
+    logger.info("Воркер готовий до запитів за %.0f мс", (time.perf_counter() - started) * 1000)
+    yield
+    # /readyz одразу віддає 503, щоб балансувальник перестав слати запити, поки воркер зупиняється
+    app.state.ready = False
+    live_hub.stop()
+    await subscriber.stop()
+    await rates_refresher.stop()
+    await expense_writer.stop()
+    await mail_dispatcher.stop()
+    await close_redis_pool()
+    shutdown_password_pool()
+    if query_profiler.enabled and SQL_PROFILE_REPORT:
+        query_profiler.dump_report(SQL_PROFILE_REPORT)
+
+
+# orjson для всіх відповідей, що серіалізує сам FastAPI
+app=FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.state.ready = False
+
+# Схема БД застосовується в lifespan (apply_migrations), а не під час імпорту
+instrument_engine(async_engine.sync_engine)
 
 app.include_router(auth.router)
 app.include_router(categories.router)
 app.include_router(expenses.router)
 app.include_router(analytics.router)
 app.include_router(users.router)
+app.include_router(batch.router)
 
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("fastapi-app")
 
-# Middleware для логування запитів
+
+def resolve_route_template(request: Request) -> str | None:
+    """Шаблон маршруту (/expenses/{expense_id}) замість сирого URL - для вибірки, логів і міток метрик."""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return None
+
+
+# Контроль допуску: ліміти частоти на користувача й IP і ліміти одночасних запитів на маршрут.
+# Оголошено раніше за log_requests, тому працює всередині нього і відхилені запити теж логуються
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    route = request.state.route
+    if route in SERVICE_ROUTES:
+        return await call_next(request)
+    if RATE_LIMIT_ENABLED:
+        rejected = await check_rate_limits(request, route or "unmatched")
+        if rejected is not None:
+            return rejected
+    limiter = get_limiter(route)
+    if limiter is None:
+        return await call_next(request)
+    if not await limiter.acquire():
+        return overloaded(route)
+    started = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        limiter.release(time.perf_counter() - started)
+
+
+# Middleware для логування і метрик запитів: один JSON-запис доступу на запит
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    logger.info(f"New request: {request.method} {request.url}")
-    
+    start_time = time.perf_counter()
+    route = resolve_route_template(request)
+    request.state.route = route
+    # Невідомі шляхи групуються в одну мітку, щоб сканери не роздували кардинальність метрик
+    metrics_route = route or "unmatched"
+    request_id = request.headers.get("x-request-id", "")[:64] or uuid.uuid4().hex
+    context = bind_request_context(request_id, route)
+    metrics_token = begin_request(request.method, metrics_route)
+    profile_token = query_profiler.begin_request(metrics_route)
+    status_code = 500
     try:
         response = await call_next(request)
-        duration = time.time() - start_time
-        logger.info(f"Completed: {request.method} {request.url} - Status: {response.status_code} - Time: {duration:.2f}s")
+        status_code = response.status_code
+        log_request(request.method, route, status_code, time.perf_counter() - start_time)
+        response.headers["X-Request-ID"] = request_id
         return response
     except Exception as e:
-        logger.error(f"Error occurred: {e}")
+        log_request(request.method, route, 500, time.perf_counter() - start_time, error=repr(e))
         raise e
+    finally:
+        end_request(request.method, metrics_route, status_code, time.perf_counter() - start_time, metrics_token)
+        query_profiler.end_request(profile_token)
+        reset_request_context(context)
 
 # Обробка помилок
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled error: {exc}")
+    logger.error("Unhandled error: %r", exc, exc_info=exc)
     return JSONResponse(status_code=500, content={"detail": "Internal Server Error"})
 
 # Ендпоінт для тестування
@@ -47,6 +149,24 @@ async def read_root():
     logger.info("Root endpoint accessed")
     return {"message": "Hello, Loki and Grafana!"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    content, media_type = metrics_payload()
+    return Response(content=content, media_type=media_type)
+
+# Liveness: процес живий і відповідає; залежності не перевіряються, щоб збій Redis не перезапускав воркери
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    return {"status": "ok"}
+
+# Readiness: міграції застосовано, пули і кеші прогріто. Без Redis воркер працює (без кешу), тому він
+# лише показується у відповіді, а не робить воркер неготовим
+@app.get("/readyz", include_in_schema=False)
+async def readyz(request: Request):
+    if not request.app.state.ready:
+        return ORJSONResponse(status_code=503, content={"status": "not ready"})
+    return {"status": "ready", "redis": redis_available(), "pubsub": subscriber.connected}
+
 @app.get("/error")
 async def trigger_error():
     logger.warning("Simulated error endpoint accessed")
@@ -0,0 +1,10 @@
+from ..dependencies import Base
+from sqlalchemy import Column, String, Date, Float
+
+
+class ExchangeRate(Base):
+  __tablename__ = 'exchange_rates'
+  # Скільки одиниць базової валюти (BASE_CURRENCY) коштує одиниця currency на дату day
+  currency=Column(String(3), primary_key=True)
+  day=Column(Date, primary_key=True)
+  rate=Column(Float, nullable=False)
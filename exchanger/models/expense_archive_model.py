@@ -0,0 +1,28 @@
+from ..dependencies import Base, BASE_CURRENCY
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Index
+
+
+class ArchivedExpense(Base):
+  # Холодний шар: витрати старші за межу архіву, ті самі колонки й ідентифікатори, що в expenses
+  __tablename__ = 'expenses_archive'
+  id=Column(Integer, primary_key=True)
+  user_id=Column(Integer, ForeignKey("users.id"))
+  category_id=Column(Integer, ForeignKey("categories.id"),nullable=False)
+  amount=Column(Integer, nullable=False)
+  currency=Column(String(3), nullable=False, default=BASE_CURRENCY, server_default=BASE_CURRENCY)
+  description=Column(String,nullable=False)
+  created_at=Column(Date)
+  updated_at=Column(Date)
+
+  __table_args__ = (
+    Index("ix_expenses_archive_user_created_id", "user_id", "created_at", "id"),
+    # Статистика читає з архіву за цілі місяці лише суми в інших валютах
+    Index("ix_expenses_archive_user_currency_created", "user_id", "currency", "created_at"),
+  )
+
+
+class ExpenseArchiveState(Base):
+  # Один рядок: витрати до cutoff (не включно) читаються з архіву, решта - з expenses
+  __tablename__ = 'expense_archive_state'
+  id=Column(Integer, primary_key=True)
+  cutoff=Column(Date, nullable=False)
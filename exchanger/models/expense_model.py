@@ -1,5 +1,5 @@
-from ..dependencies import Base
-from sqlalchemy import Column, Integer, String, Date, ForeignKey
+from ..dependencies import Base, BASE_CURRENCY
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Index
 from datetime import datetime
 
 
@@ -9,6 +9,12 @@ class Expense(Base):
   user_id=Column(Integer, ForeignKey("users.id"))
   category_id=Column(Integer, ForeignKey("categories.id"),nullable=False)
   amount=Column(Integer, nullable=False)
+  currency=Column(String(3), nullable=False, default=BASE_CURRENCY, server_default=BASE_CURRENCY)
   description=Column(String,nullable=False)
   created_at=Column(Date, default=datetime.now)
-  updated_at=Column(Date, default=datetime.now,onupdate=datetime.now)
\ No newline at end of file
+  updated_at=Column(Date, default=datetime.now,onupdate=datetime.now)
+
+  # Покриває фільтр за користувачем і keyset-пагінацію від нових до старих
+  __table_args__ = (
+    Index("ix_expenses_user_created_id", "user_id", "created_at", "id"),
+  )
@@ -0,0 +1,24 @@
+from ..dependencies import Base
+from sqlalchemy import Column, Integer, String, Date, ForeignKey
+
+
+class ExpenseDailyRollup(Base):
+  __tablename__ = 'expense_daily_rollups'
+  user_id=Column(Integer, ForeignKey("users.id"), primary_key=True)
+  day=Column(Date, primary_key=True)
+  category_id=Column(Integer, ForeignKey("categories.id"), primary_key=True)
+  # Суми зберігаються у валюті витрат, конвертація - під час читання статистики за курсом дня
+  currency=Column(String(3), primary_key=True)
+  total=Column(Integer, nullable=False, default=0)
+  count=Column(Integer, nullable=False, default=0)
+
+
+class ExpenseMonthlyRollup(Base):
+  # Місячні агрегати архівних витрат; month - перше число місяця
+  __tablename__ = 'expense_monthly_rollups'
+  user_id=Column(Integer, ForeignKey("users.id"), primary_key=True)
+  month=Column(Date, primary_key=True)
+  category_id=Column(Integer, ForeignKey("categories.id"), primary_key=True)
+  currency=Column(String(3), primary_key=True)
+  total=Column(Integer, nullable=False, default=0)
+  count=Column(Integer, nullable=False, default=0)
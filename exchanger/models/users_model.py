@@ -1,4 +1,4 @@
-from ..dependencies import Base
+from ..dependencies import Base, BASE_CURRENCY
 from sqlalchemy import Column, Integer, String, Date,Enum,Boolean
 from datetime import datetime
 
@@ -11,5 +11,7 @@ class Users(Base):
   role = Column(String, nullable=False)
   is_active = Column(Boolean, default=False)
   verification_token = Column(String, nullable=True)
+  # Валюта, в якій рахується статистика
+  home_currency = Column(String(3), nullable=False, default=BASE_CURRENCY, server_default=BASE_CURRENCY)
   created_at=Column(Date, default=datetime.now)
   updated_at=Column(Date, default=datetime.now,onupdate=datetime.now)
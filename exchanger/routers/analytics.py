@@ -1,11 +1,27 @@
-from fastapi import APIRouter,status
+from datetime import date, timedelta
+from typing import Literal
+from fastapi import APIRouter,status,Depends,Request,Response,Query,HTTPException
+from fastapi.responses import StreamingResponse
+import redis.asyncio as redis
 from ..schemas.analytics_schemas import *
 from ..services.analytics_service import *
 from ..services.utils import db_dependency,user_dependency
+from ..services.redis_client import get_redis
+from ..services.analytics_cache import get_cached_analytics, get_analytics_cache_stats
+from ..services.cache_service import user_scope
+from ..services.http_cache import conditional_get
+from ..services.tiered_cache import get_tiered_cache_stats
+from ..services.currency_service import exchange_rates, normalize_currency, resolve_currency
+from ..services.distribution_service import get_snapshot, compute_distribution
+from ..services.live_service import live_hub, live_stream
+from ..dependencies import SSE_ENABLED, SSE_MAX_CONNECTIONS
 
 
 
 
+# Валюта звіту; без параметра - домашня валюта користувача
+CurrencyQuery = Query(None, pattern="^[A-Za-z]{3}$")
+
 
 router=APIRouter(
     prefix="/statistics",
@@ -14,22 +30,137 @@ router=APIRouter(
 
 
 @router.get("/period-summary", response_model=SummaryResponse,status_code=status.HTTP_200_OK)
-def statistics_summary_by_period(
+async def statistics_summary_by_period(
     period: str,
+    request: Request,
+    response: Response,
     db: db_dependency,
-    user: user_dependency
+    user: user_dependency,
+    currency: str | None = CurrencyQuery,
+    redis_client: redis.Redis = Depends(get_redis)
 ):
     start_date, end_date = calculate_date_range(period)
-    summary = get_expenses_summary_for_user(db, user_id=user.get("id"), start_date=start_date, end_date=end_date)
-    return {"period": period, "start_date": start_date, "end_date": end_date, "summary": summary}
+    user_id = user.get("id")
+    # Межі періоду, валюта і версія курсів входять в ETag: з новим днем чи курсом змінюється і відповідь
+    version, headers, not_modified = await conditional_get(request, redis_client, user_scope(user_id),
+                                                           "summary", start_date, end_date, currency,
+                                                           exchange_rates.version)
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
+    currency = await resolve_currency(db, redis_client, user_id, currency)
+    summary = await get_cached_analytics(
+        redis_client, db, "summary", user_id, period, start_date, end_date,
+        lambda db: get_expenses_summary_for_user(db, user_id=user_id, start_date=start_date, end_date=end_date,
+                                                 currency=currency),
+        version=version, currency=currency
+    )
+    return {"period": period, "start_date": start_date, "end_date": end_date, "currency": currency, "summary": summary}
 
 # Ендпоінт для статистики за категоріями за період
 @router.get("/period-by-category", response_model=CategoryStatsResponse,status_code=status.HTTP_200_OK)
-def statistics_by_category_for_period(
+async def statistics_by_category_for_period(
     period: str,
+    request: Request,
+    response: Response,
     db: db_dependency,
-    user: user_dependency
+    user: user_dependency,
+    currency: str | None = CurrencyQuery,
+    redis_client: redis.Redis = Depends(get_redis)
 ):
     start_date, end_date = calculate_date_range(period)
-    stats = get_expenses_by_category_for_user(db, user_id=user.get("id"), start_date=start_date, end_date=end_date)
-    return {"period": period, "start_date": start_date, "end_date": end_date, "statistics": stats}
\ No newline at end of file
+    user_id = user.get("id")
+    # Межі періоду, валюта і версія курсів входять в ETag: з новим днем чи курсом змінюється і відповідь
+    version, headers, not_modified = await conditional_get(request, redis_client, user_scope(user_id),
+                                                           "by_category", start_date, end_date, currency,
+                                                           exchange_rates.version)
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
+    currency = await resolve_currency(db, redis_client, user_id, currency)
+    stats = await get_cached_analytics(
+        redis_client, db, "by_category", user_id, period, start_date, end_date,
+        lambda db: get_expenses_by_category_for_user(db, user_id=user_id, start_date=start_date, end_date=end_date,
+                                                     currency=currency),
+        version=version, currency=currency
+    )
+    return {"period": period, "start_date": start_date, "end_date": end_date, "currency": currency, "statistics": stats}
+
+# Часовий ряд (колонковий формат: паралельні масиви початків відрізків і сум)
+@router.get("/timeseries", response_model=TimeseriesResponse, response_model_exclude_none=True, status_code=status.HTTP_200_OK)
+async def statistics_timeseries(
+    start: date,
+    end: date,
+    request: Request,
+    response: Response,
+    db: db_dependency,
+    user: user_dependency,
+    bucket: Literal["day", "week", "month"] = "day",
+    by_category: bool = False,
+    currency: str | None = CurrencyQuery,
+    redis_client: redis.Redis = Depends(get_redis)
+):
+    _, headers, not_modified = await conditional_get(request, redis_client, user_scope(user.get("id")),
+                                                     "timeseries", start, end, bucket, by_category, currency,
+                                                     exchange_rates.version)
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
+    currency = await resolve_currency(db, redis_client, user.get("id"), currency)
+    timeseries = await get_expenses_timeseries_for_user(db, user_id=user.get("id"), start_date=start, end_date=end,
+                                                        bucket=bucket, by_category=by_category, currency=currency)
+    return {"start_date": start, "end_date": end, "bucket": bucket, "currency": currency, **timeseries}
+
+# Розподіл витрат: перцентилі, ковзне середнє, профіль за днями тижня і викиди.
+# Рахується над знімком усіх витрат користувача в пам'яті, який оновлюється з версією даних
+@router.get("/distribution", response_model=DistributionResponse, status_code=status.HTTP_200_OK)
+async def statistics_distribution(
+    request: Request,
+    response: Response,
+    db: db_dependency,
+    user: user_dependency,
+    start: date | None = None,
+    end: date | None = None,
+    category_id: int | None = None,
+    window: int = Query(7, ge=1, le=90),
+    currency: str | None = CurrencyQuery,
+    redis_client: redis.Redis = Depends(get_redis)
+):
+    user_id = user.get("id")
+    # За замовчуванням - останні 90 днів
+    end = end or date.today()
+    start = start or end - timedelta(days=89)
+    version, headers, not_modified = await conditional_get(request, redis_client, user_scope(user_id),
+                                                           "distribution", start, end, category_id, window,
+                                                           currency, exchange_rates.version)
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
+    currency = await resolve_currency(db, redis_client, user_id, currency)
+    snapshot = await get_snapshot(db, user_id, currency, version)
+    return {"start_date": start, "end_date": end, "currency": currency, "window": window,
+            **compute_distribution(snapshot, start, end, category_id, window)}
+
+# Живі оновлення для дашбордів замість опитування: підсумок періоду і події змін витрат (SSE).
+# БД читається лише на старті потоку і для перерахунку; далі підсумок оновлюють дельти з подій
+@router.get("/stream", status_code=status.HTTP_200_OK)
+async def statistics_stream(
+    user: user_dependency,
+    period: Literal["day", "week", "month", "year"] = "month",
+    currency: str | None = CurrencyQuery,
+    redis_client: redis.Redis = Depends(get_redis)
+):
+    if not SSE_ENABLED:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Live updates are disabled")
+    if live_hub.connections >= SSE_MAX_CONNECTIONS:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many live connections")
+    # Помилки параметрів - до початку потоку, поки ще можна повернути код відповіді
+    currency = normalize_currency(currency) if currency else None
+    return StreamingResponse(live_stream(redis_client, user.get("id"), period, currency),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Лічильники кешу статистики і дворівневих кешів (частки влучань у L1 і Redis) - для підбору розмірів і TTL
+@router.get("/cache-stats", status_code=status.HTTP_200_OK)
+async def statistics_cache_stats(user: user_dependency):
+    return {**get_analytics_cache_stats(), "tiers": get_tiered_cache_stats()}
\ No newline at end of file
@@ -7,12 +7,18 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from ..models.users_model import Users
 from ..schemas.user_schemas import CreateUserSchema
 from ..schemas.token_schemas import Token
-from ..dependencies import SECRET_KEY, ALGORITHM,logger
+from ..dependencies import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, logger
 from ..services.auth_service import *
-from ..services.utils import db_dependency
+from ..services.utils import db_dependency, user_dependency
+from ..services.redis_client import get_redis
+from ..services.user_service import invalidate_user_profile
+from ..services.mail_service import enqueue_verification_email
 
 import uuid
 import logging
+import redis.asyncio as redis
+
+from sqlalchemy import select
 
 
 router = APIRouter(
@@ -27,10 +33,10 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 async def read_all(db: db_dependency):
     logger.info("Отримання всіх користувачів з бази даних")
     
-    users = db.query(Users).all()
+    users = (await db.execute(select(Users))).scalars().all()
     
     if users:
-        logger.info(f"Знайдено {len(users)} користувачів")
+        logger.info("Знайдено %s користувачів", len(users))
     else:
         logger.warning("Користувачів не знайдено")
     
@@ -38,10 +44,11 @@ async def read_all(db: db_dependency):
 
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-async def register_user(user: CreateUserSchema, db: db_dependency, background_tasks: BackgroundTasks):
-    logger.info(f"Реєстрація нового користувача: {user.email}")
+async def register_user(user: CreateUserSchema, db: db_dependency, background_tasks: BackgroundTasks,
+                        redis_client: redis.Redis = Depends(get_redis)):
+    logger.info("Реєстрація нового користувача: %s", user.email)
     
-    if db.query(Users).filter_by(email=user.email).first():
+    if (await db.execute(select(Users).filter_by(email=user.email))).scalars().first():
         logger.warning("Email вже зареєстрований")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail='Email already registered')
@@ -49,7 +56,7 @@ async def register_user(user: CreateUserSchema, db: db_dependency, background_ta
     token = str(uuid.uuid4())
     create_user = Users(
         email=user.email,
-        hashed_password=bcrypt_context.hash(user.password),
+        hashed_password=await hash_password(user.password),
         full_name=user.full_name,
         role=user.role,
         is_active=False,
@@ -57,19 +64,19 @@ async def register_user(user: CreateUserSchema, db: db_dependency, background_ta
     )
     
     db.add(create_user)
-    db.commit()
-    logger.info(f"Користувача {user.email} зареєстровано успішно")
+    await db.commit()
+    logger.info("Користувача %s зареєстровано успішно", user.email)
     
-    background_tasks.add_task(send_verification_email, user.email, token)
+    await enqueue_verification_email(redis_client, user.email, token, background_tasks)
     return {"message": "User registered. Check your email for verification."}
 
 
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
                                  db: db_dependency):
-    logger.info(f"Аутентифікація користувача: {form_data.username}")
+    logger.info("Аутентифікація користувача: %s", form_data.username)
     
-    user = authenticate_user(form_data.username, form_data.password, db)
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user or user.is_active is False:
         logger.warning("Не вдалося автентифікувати користувача")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate user')
@@ -79,25 +86,33 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
         user.id,
         user.role,
         user.is_active,
-        timedelta(minutes=20)
+        timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     
-    logger.info(f"Користувач {user.email} успішно отримав токен")
+    logger.info("Користувач %s успішно отримав токен", user.email)
     return {'access_token': token, 'token_type': 'bearer'}
 
 
 @router.get("/verify/{token}")
-async def verify_email(token: str, db: db_dependency):
-    logger.info(f"Перевірка токена: {token}")
+async def verify_email(token: str, db: db_dependency, redis_client: redis.Redis = Depends(get_redis)):
+    logger.info("Перевірка токена: %s", token)
     
-    user = db.query(Users).filter(Users.verification_token == token).first()
+    user = (await db.execute(select(Users).filter(Users.verification_token == token))).scalars().first()
     if not user:
         logger.warning("Невірний або прострочений токен")
         raise HTTPException(status_code=400, detail="Invalid or expired token")
     
     user.is_active = True
     user.verification_token = None
-    db.commit()
-    logger.info(f"Користувач {user.email} успішно верифікований")
+    await db.commit()
+    await invalidate_user_profile(redis_client, user.id)
+    logger.info("Користувач %s успішно верифікований", user.email)
     
     return {"message": "Email successfully verified"}
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(user: user_dependency, token: Annotated[str, Depends(oauth2_scheme)],
+                 redis_client: redis.Redis = Depends(get_redis)):
+    await revoke_token(redis_client, token)
+    logger.info("Користувач %s вийшов із системи", user.get('email'))
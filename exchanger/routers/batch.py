@@ -0,0 +1,22 @@
+import redis.asyncio as redis
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import ORJSONResponse
+
+from ..schemas.batch_schemas import BatchRequest, BatchResponse
+from ..services.batch_service import run_batch
+from ..services.redis_client import get_redis
+from ..services.utils import db_dependency, user_dependency
+
+
+router = APIRouter(
+  prefix="/batch",
+  tags=["batch"]
+)
+
+
+@router.post("", status_code=status.HTTP_200_OK, response_model=BatchResponse)
+async def execute_batch(batch: BatchRequest, db: db_dependency, user: user_dependency,
+                        redis_client: redis.Redis = Depends(get_redis)):
+    # Один запит, одна автентифікація і одна транзакція на всі операції пакета
+    status_code, payload = await run_batch(db, redis_client, user.get('id'), batch)
+    return ORJSONResponse(content=payload, status_code=status_code)
@@ -1,114 +1,190 @@
 import os
-import smtplib
 import logging
 import redis.asyncio as redis
 import json
-from time import time
-from datetime import datetime, timedelta
-from typing import Annotated
+from datetime import date, datetime, timedelta
+from typing import Annotated, Literal
 from ..services.redis_client import get_redis
+from ..services.cache_service import user_scope
 
-from fastapi import APIRouter, HTTPException, status, Path,Depends
+from fastapi import APIRouter, HTTPException, status, Path,Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import select
 from ..models.category_model import Category
 from ..models.expense_model import Expense
 from ..schemas.category_schemas import CreateCategory
-from ..schemas.expense_schemas import ExpenseCreatedModel
+from ..schemas.expense_schemas import ExpenseCreatedModel, ExpenseDetailResponse, ExpensePageResponse, ExpenseSearchResponse
 from ..services.utils import db_dependency, user_dependency
-from ..dependencies import logger
+from ..services.expense_service import (get_expenses_page, stream_expenses, gzip_stream, insert_expense,
+                                       get_mutable_expense, update_expense_values, delete_expense_row,
+                                       expenses_cache)
+from ..services.category_service import category_exists
+from ..services.group_commit import expense_writer
+from ..services.http_cache import conditional_get
+from ..services.search_service import search_expenses
+from ..services.bulk_import_service import iter_lines, iter_rows, import_expenses
+from ..services.currency_service import normalize_currency, resolve_currency
+from ..services.live_service import expense_delta, expense_event, publish_expense_changes
+from ..dependencies import SEARCH_MAX_CANDIDATES, logger
 
 
-router = APIRouter(
-  prefix="/expenses",
-  tags=["expenses"]
-)
-
 router = APIRouter(
   prefix="/expenses",
   tags=["expenses"]
 )
 
 
-@router.get('/', status_code=status.HTTP_200_OK)
-async def read_expenses(db: db_dependency, user: user_dependency, redis_client: redis.Redis = Depends(get_redis)):
-    start_time = time()  # Початок вимірювання часу
+@router.get('/', status_code=status.HTTP_200_OK, response_model=ExpensePageResponse)
+async def read_expenses(request: Request, db: db_dependency, user: user_dependency,
+                        redis_client: redis.Redis = Depends(get_redis),
+                        limit: int = Query(50, ge=1, le=500),
+                        cursor: str | None = None,
+                        category_id: int | None = None,
+                        date_from: date | None = None,
+                        date_to: date | None = None,
+                        format: Literal["json", "ndjson"] = "json"):
     logger.info("Отримання списку витрат")
-    
-    # Генеруємо ключ для кешу
-    cache_key = f"expenses_{user.get('id')}"
-    
-    # Перевіряємо наявність даних у кеші Redis
-    cached_data = await redis_client.get(cache_key)
-    
-    if cached_data:
-        logger.info("✅ Дані взяті з кешу Redis")
-        # Якщо дані є в кеші, парсимо їх і повертаємо
-        expenses = json.loads(cached_data)
-    else:
-        logger.info("⏳ Даних у кеші немає, виконуємо запит до БД")
-        # Якщо даних немає, виконуємо запит до БД
-        expenses = db.query(Expense).filter(Expense.user_id == user.get('id')).all()
-        logger.info(f"Знайдено {len(expenses)} витрат")
-        
-        # Зберігаємо дані в кеш Redis на 60 секунд
-        expenses_data = [{"id": e.id, "amount": e.amount, "description": e.description} for e in expenses]
-        await redis_client.set(cache_key, json.dumps(expenses_data), ex=60)
-        logger.info(f"✅ Додано в кеш Redis на 60 секунд: {len(expenses)} витрат")
-
-    # Вимірювання часу виконання
-    execution_time = time() - start_time
-    logger.info(f"⏳ Час виконання запиту: {execution_time:.4f} секунд")
-
-    return expenses
-
-@router.post("/new", status_code=status.HTTP_201_CREATED)
-async def create_expense(expense: ExpenseCreatedModel, db: db_dependency, user: user_dependency):
-    logger.info(f"Спроба створення витрати: {expense.description}, сума: {expense.amount}")
+    user_id = user.get('id')
+    filters = {"cursor": cursor, "category_id": category_id, "date_from": date_from, "date_to": date_to}
+
+    # Якщо дані користувача не змінювалися з попереднього опитування - 304 без звернення до БД і кешу
+    version, headers, not_modified = await conditional_get(request, redis_client, user_scope(user_id),
+                                                           format, limit, *filters.values())
+    if not_modified:
+        return not_modified
+
+    if format == "ndjson":
+        # Повна історія потоком, без кешу і без limit
+        logger.info("Стрімінг витрат у форматі NDJSON")
+        return StreamingResponse(stream_expenses(user_id, filters, "ndjson"), media_type="application/x-ndjson",
+                                 headers=headers)
+
+    async def load_page(db):
+        page = await get_expenses_page(db, user_id, limit, **filters)
+        logger.info("Знайдено %s витрат", len(page['items']))
+        return page
+
+    # Ключ містить версію даних користувача (її збільшує кожна мутація) і параметри сторінки
+    cache_key = f"expenses_{user_id}_v{version or 0}:{cursor or ''}:{limit}:{category_id}:{date_from}:{date_to}"
+    payload = await expenses_cache.get_or_compute(redis_client, cache_key, load_page, db, ttl=60)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+@router.get('/search', status_code=status.HTTP_200_OK, response_model=ExpenseSearchResponse)
+async def search_user_expenses(db: db_dependency, user: user_dependency,
+                               q: str = Query(..., min_length=1, max_length=200),
+                               limit: int = Query(50, ge=1, le=200),
+                               offset: int = Query(0, ge=0, le=10_000),
+                               category_id: int | None = None,
+                               date_from: date | None = None,
+                               date_to: date | None = None,
+                               sort: Literal["rank", "date"] = "rank"):
+    logger.info("Пошук витрат: %s", q)
+    unfiltered = category_id is None and date_from is None and date_to is None
+    if unfiltered and offset + limit > SEARCH_MAX_CANDIDATES:
+        # Без фільтрів ранжуються лише SEARCH_MAX_CANDIDATES найновіших збігів - глибші сторінки були б порожніми
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"offset + limit must not exceed {SEARCH_MAX_CANDIDATES} without filters")
+    return await search_expenses(db, user.get('id'), q, limit, offset, category_id=category_id,
+                                 date_from=date_from, date_to=date_to, sort=sort)
+
+@router.get('/export', status_code=status.HTTP_200_OK)
+async def export_expenses(user: user_dependency,
+                          format: Literal["csv", "ndjson"] = "csv",
+                          compress: bool = False,
+                          category_id: int | None = None,
+                          date_from: date | None = None,
+                          date_to: date | None = None):
+    logger.info("Експорт витрат у форматі %s, стиснення: %s", format, compress)
+    filters = {"category_id": category_id, "date_from": date_from, "date_to": date_to}
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="expenses.{format}"'}
+
+    body = stream_expenses(user.get('id'), filters, format)
+    if compress:
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+@router.post("/new", status_code=status.HTTP_201_CREATED, response_model=ExpenseDetailResponse)
+async def create_expense(expense: ExpenseCreatedModel, db: db_dependency, user: user_dependency,
+                         redis_client: redis.Redis = Depends(get_redis)):
+    logger.info("Спроба створення витрати: %s, сума: %s", expense.description, expense.amount)
     if not user:
         logger.warning("Користувач не авторизований")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    
-    new_expense = Expense(
-        amount=expense.amount,
-        description=expense.description,
-        category_id=expense.category_id,
-        user_id=user.get('id')
-    )
-    db.add(new_expense)
-    db.commit()
-    db.refresh(new_expense)
-    logger.info(f"Витрата ID {new_expense.id} успішно створена")
+    if not await category_exists(db, redis_client, expense.category_id):
+        logger.warning("Категорія ID %s не знайдена", expense.category_id)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"category {expense.category_id} not found")
+
+    currency = await resolve_currency(db, redis_client, user.get('id'), expense.currency)
+    # Груповий писач об'єднує одночасні створення в одну транзакцію; відповідь повертається після commit
+    new_expense = await expense_writer.submit(
+        lambda db: insert_expense(db, user.get('id'), expense.category_id, expense.amount, currency,
+                                  expense.description))
+    await publish_expense_changes(redis_client, user.get('id'),
+                                  [expense_event("created", new_expense, [expense_delta(new_expense, 1)])])
+    logger.info("Витрата ID %s успішно створена", new_expense.id)
     return new_expense
 
+@router.post("/bulk", status_code=status.HTTP_200_OK)
+async def bulk_create_expenses(request: Request, db: db_dependency, user: user_dependency,
+                               redis_client: redis.Redis = Depends(get_redis),
+                               format: Literal["csv", "ndjson"] | None = None):
+    # Формат береться з параметра або з Content-Type: text/csv чи application/x-ndjson
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        if "csv" in content_type:
+            format = "csv"
+        elif "ndjson" in content_type or "jsonlines" in content_type:
+            format = "ndjson"
+        else:
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                                detail="Use text/csv or application/x-ndjson")
+    logger.info("Масовий імпорт витрат у форматі %s", format)
+
+    rows = iter_rows(iter_lines(request.stream()), format)
+    # Рядки без валюти імпортуються в домашній валюті користувача
+    default_currency = await resolve_currency(db, redis_client, user.get('id'), None)
+    report = await import_expenses(db, user.get('id'), rows, default_currency)
+    await db.commit()
+    if report["inserted"]:
+        # Без дельт: потоки SSE один раз перечитають підсумки замість тисяч окремих подій
+        await publish_expense_changes(redis_client, user.get('id'),
+                                      [{"type": "imported", "expense": None, "count": report["inserted"],
+                                        "deltas": None}])
+    return report
+
 @router.put("/{expense_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def update_expense(expense_id: int, expense: ExpenseCreatedModel, db: db_dependency, user: user_dependency):
-    logger.info(f"Спроба оновлення витрати ID: {expense_id}")
+async def update_expense(expense_id: int, expense: ExpenseCreatedModel, db: db_dependency, user: user_dependency,
+                         redis_client: redis.Redis = Depends(get_redis)):
+    logger.info("Спроба оновлення витрати ID: %s", expense_id)
     if not user:
         logger.warning("Користувач не авторизований")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     
-    exists_expense = db.query(Expense).filter(Expense.id == expense_id, Expense.user_id == user.get('id')).first()
-    if not exists_expense:
-        logger.warning(f"Витрата ID {expense_id} не знайдена")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expense not found")
+    exists_expense = await get_mutable_expense(db, user.get('id'), expense_id)
     
-    exists_expense.amount = expense.amount
-    exists_expense.description = expense.description
-    exists_expense.category_id = expense.category_id
-    db.commit()
-    logger.info(f"Витрата ID {expense_id} оновлена")
+    currency = normalize_currency(expense.currency) if expense.currency else exists_expense.currency
+    before = expense_delta(exists_expense, -1)
+    # Агрегати оновлюються в тій самій транзакції, що й витрата
+    await update_expense_values(db, exists_expense, expense.category_id, expense.amount, currency, expense.description)
+    event = expense_event("updated", exists_expense, [before, expense_delta(exists_expense, 1)])
+    await db.commit()
+    await publish_expense_changes(redis_client, user.get('id'), [event])
+    logger.info("Витрата ID %s оновлена", expense_id)
 
 @router.delete("/{expense_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_expense(expense_id: int, db: db_dependency, user: user_dependency):
-    logger.info(f"Спроба видалення витрати ID: {expense_id}")
+async def delete_expense(expense_id: int, db: db_dependency, user: user_dependency,
+                         redis_client: redis.Redis = Depends(get_redis)):
+    logger.info("Спроба видалення витрати ID: %s", expense_id)
     if not user:
         logger.warning("Користувач не авторизований")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     
-    exists_expense = db.query(Expense).filter(Expense.id == expense_id, Expense.user_id == user.get('id')).first()
-    if not exists_expense:
-        logger.warning(f"Витрата ID {expense_id} не знайдена")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expense not found")
+    exists_expense = await get_mutable_expense(db, user.get('id'), expense_id)
     
-    db.delete(exists_expense)
-    db.commit()
-    logger.info(f"Витрата ID {expense_id} видалена")
\ No newline at end of file
+    event = expense_event("deleted", exists_expense, [expense_delta(exists_expense, -1)])
+    await delete_expense_row(db, exists_expense)
+    await db.commit()
+    await publish_expense_changes(redis_client, user.get('id'), [event])
+    logger.info("Витрата ID %s видалена", expense_id)
\ No newline at end of file
@@ -1,8 +1,17 @@
-from pydantic import BaseModel
-from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from fastapi import APIRouter, HTTPException, Depends
+import redis.asyncio as redis
 from starlette import status
+from sqlalchemy import select
 from ..models.users_model import Users
-from ..services.utils import db_dependency,user_dependency, bcrypt_context
+from ..services.utils import db_dependency,user_dependency
+from ..services.password_service import hash_password, verify_password
+from ..services.redis_client import get_redis
+from ..services.user_service import get_user_profile, invalidate_user_profile
+from ..services.auth_service import revoke_user_tokens
+from ..services.cache_service import bump_version, user_scope
+from ..services.currency_service import normalize_currency
+from ..schemas.user_schemas import UserProfileResponse
 
 router = APIRouter(
     prefix='/user',
@@ -15,22 +24,42 @@ class UserVerification(BaseModel):
     new_password:str
 
 
+class HomeCurrency(BaseModel):
+    currency: str = Field(pattern="^[A-Za-z]{3}$")
 
-@router.get('/', status_code=status.HTTP_200_OK)
-async def get_user(user: user_dependency, db: db_dependency):
+
+
+@router.get('/', status_code=status.HTTP_200_OK, response_model=UserProfileResponse | None)
+async def get_user(user: user_dependency, db: db_dependency, redis_client: redis.Redis = Depends(get_redis)):
     if user is None:
         raise HTTPException(status_code=401, detail='Authentication Failed')
-    return db.query(Users).filter(Users.id == user.get('id')).first()
+    return await get_user_profile(db, redis_client, user.get('id'))
 
 @router.put("/password", status_code=status.HTTP_204_NO_CONTENT)
 async def change_password(user: user_dependency, db: db_dependency,
-                          user_verification: UserVerification):
+                          user_verification: UserVerification, redis_client: redis.Redis = Depends(get_redis)):
     if user is None:
         raise HTTPException(status_code=401, detail='Authentication Failed')
-    user_model = db.query(Users).filter(Users.id == user.get('id')).first()
+    user_model = (await db.execute(select(Users).filter(Users.id == user.get('id')))).scalars().first()
 
-    if not bcrypt_context.verify(user_verification.password, user_model.hashed_password):
+    verified, _ = await verify_password(user_verification.password, user_model.hashed_password)
+    if not verified:
         raise HTTPException(status_code=401, detail='Error on password change')
-    user_model.hashed_password = bcrypt_context.hash(user_verification.new_password)
+    user_model.hashed_password = await hash_password(user_verification.new_password)
     # db.add(user_model)
-    db.commit()
+    await db.commit()
+    await invalidate_user_profile(redis_client, user.get('id'))
+    # Старі токени більше не дійсні - після зміни пароля потрібно увійти знову
+    await revoke_user_tokens(redis_client, user.get('id'))
+
+@router.put("/currency", status_code=status.HTTP_204_NO_CONTENT)
+async def change_home_currency(user: user_dependency, db: db_dependency, home_currency: HomeCurrency,
+                               redis_client: redis.Redis = Depends(get_redis)):
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+    user_model = (await db.execute(select(Users).filter(Users.id == user.get('id')))).scalars().first()
+    user_model.home_currency = normalize_currency(home_currency.currency)
+    await db.commit()
+    await invalidate_user_profile(redis_client, user.get('id'))
+    # Статистика без явної валюти рахується в домашній - її кеш і ETag теж мають змінитися
+    await bump_version(redis_client, user_scope(user.get('id')))
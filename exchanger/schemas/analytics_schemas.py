@@ -1,14 +1,52 @@
 from datetime import date
+from typing import Literal
 from pydantic import BaseModel
 
 class SummaryResponse(BaseModel):
     period: str
     start_date: date
     end_date: date
+    currency: str
     summary: dict
 
 class CategoryStatsResponse(BaseModel):
     period: str
     start_date: date
     end_date: date
-    statistics: list[dict]
\ No newline at end of file
+    currency: str
+    statistics: list[dict]
+
+class TimeseriesResponse(BaseModel):
+    start_date: date
+    end_date: date
+    bucket: Literal["day", "week", "month"]
+    currency: str
+    buckets: list[date]
+    # Цілі, якщо всі витрати у валюті звіту, інакше сконвертовані суми з округленням до копійок
+    totals: list[int | float]
+    category_ids: list[int] | None = None
+    series: list[list[int | float]] | None = None
+
+class DistributionOutlier(BaseModel):
+    id: int
+    created_at: date
+    category_id: int
+    amount: int | float
+
+class DistributionResponse(BaseModel):
+    start_date: date
+    end_date: date
+    currency: str
+    window: int
+    count: int
+    total: int | float
+    mean: float | None = None
+    percentiles: dict[str, float]
+    # Паралельні масиви за днями періоду: сума за день і ковзне середнє за window днів
+    days: list[date]
+    daily_totals: list[int | float]
+    moving_average: list[float]
+    # Понеділок - неділя
+    weekday_totals: list[int | float]
+    weekday_counts: list[int]
+    outliers: list[DistributionOutlier]
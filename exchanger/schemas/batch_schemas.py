@@ -0,0 +1,26 @@
+from typing import Literal
+from pydantic import BaseModel, Field
+
+class BatchOperation(BaseModel):
+  op : Literal["create", "update", "delete"]
+  entity : Literal["expense", "category"]
+  # Для update і delete
+  id : int | None = Field(None, gt=0)
+  # Тіло, як у POST /expenses/new чи /categories/new; перевіряється окремо для кожної операції
+  data : dict | None = None
+
+class BatchRequest(BaseModel):
+  # atomic - все або нічого; independent - кожна операція застосовується або відкочується окремо
+  mode : Literal["atomic", "independent"] = "atomic"
+  operations : list[BatchOperation] = Field(..., min_length=1)
+
+class BatchOperationResult(BaseModel):
+  index : int
+  status : int
+  id : int | None = None
+  detail : str | None = None
+
+class BatchResponse(BaseModel):
+  mode : str
+  committed : bool
+  results : list[BatchOperationResult]
@@ -1,4 +1,8 @@
 from pydantic import BaseModel
 
 class CreateCategory(BaseModel):
-  name: str
\ No newline at end of file
+  name: str
+
+class CategoryResponse(BaseModel):
+  id: int
+  name: str
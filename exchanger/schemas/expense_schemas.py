@@ -1,6 +1,54 @@
-from pydantic import BaseModel
+from datetime import date
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 class ExpenseCreatedModel(BaseModel):
   category_id : int
   amount : int
   description : str
+  # Код ISO 4217; без нього - домашня валюта користувача (при оновленні - поточна валюта витрати)
+  currency : str | None = Field(None, pattern="^[A-Za-z]{3}$")
+
+  @field_validator("currency", mode="before")
+  @classmethod
+  def empty_currency(cls, value):
+    # Порожня клітинка CSV при імпорті - валюта за замовчуванням
+    return value or None
+
+class ExpenseImportModel(ExpenseCreatedModel):
+  # Дата витрати з експорту; без неї - сьогодні
+  created_at : date | None = None
+
+  @field_validator("created_at", mode="before")
+  @classmethod
+  def empty_created_at(cls, value):
+    return value or None
+
+  @field_validator("created_at")
+  @classmethod
+  def not_in_future(cls, value):
+    if value is not None and value > date.today():
+      raise ValueError("date is in the future")
+    return value
+
+class ExpenseResponse(BaseModel):
+  id : int
+  amount : int
+  currency : str
+  description : str
+  category_id : int
+  created_at : date | None = None
+
+class ExpenseDetailResponse(ExpenseResponse):
+  model_config = ConfigDict(from_attributes=True)
+
+  user_id : int
+  updated_at : date | None = None
+
+class ExpensePageResponse(BaseModel):
+  items : list[ExpenseResponse]
+  next_cursor : str | None = None
+
+class ExpenseSearchResponse(BaseModel):
+  items : list[ExpenseResponse]
+  next_offset : int | None = None
+  truncated : bool = False
@@ -1,7 +1,22 @@
-from pydantic import BaseModel
+from datetime import date
+from pydantic import BaseModel, ConfigDict, EmailStr
 
 class CreateUserSchema(BaseModel):
-  email: str
+  # Адреса потрапляє в заголовок листа-підтвердження, тому перевіряється одразу
+  email: EmailStr
   full_name: str
   password: str
   role: str
+
+class UserProfileResponse(BaseModel):
+  # Без hashed_password і verification_token: профіль кешується і віддається клієнту
+  model_config = ConfigDict(from_attributes=True)
+
+  id: int
+  email: str
+  full_name: str
+  role: str
+  is_active: bool | None = None
+  home_currency: str
+  created_at: date | None = None
+  updated_at: date | None = None
@@ -0,0 +1,29 @@
+"""
+Перенесення старих витрат у холодний шар (expenses_archive) з місячними агрегатами.
+Запускається періодично (cron); повторний запуск після збою безпечний.
+
+Запуск:  python -m exchanger.scripts.archive_expenses [--older-than-days 730] [--grace-seconds 120]
+"""
+import argparse
+import asyncio
+
+from ..dependencies import engine, logger, ARCHIVE_AFTER_DAYS, ARCHIVE_GRACE_SECONDS
+from ..services.archive_service import archive_expenses
+from ..services.migrations import apply_migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old expenses into the archive tier")
+    # Менше значення, ніж ARCHIVE_AFTER_DAYS воркерів, дозволить змінити витрату, яка вже копіюється в архів
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--grace-seconds", type=float, default=ARCHIVE_GRACE_SECONDS,
+                        help="скільки чекати перед видаленням перенесених рядків з гарячої таблиці")
+    args = parser.parse_args()
+
+    apply_migrations(engine)
+    report = asyncio.run(archive_expenses(args.older_than_days, args.grace_seconds))
+    logger.info("Архівацію завершено: %s", report)
+
+
+if __name__ == "__main__":
+    main()
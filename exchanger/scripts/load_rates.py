@@ -0,0 +1,34 @@
+"""
+Імпорт курсів валют у таблицю exchange_rates з CSV/JSON файлу або URL.
+Формат: CSV з колонками date,currency,rate або JSON-масив [{"date", "currency", "rate"}];
+rate - скільки одиниць BASE_CURRENCY коштує одиниця currency.
+
+Запуск:  python -m exchanger.scripts.load_rates rates.csv
+"""
+import argparse
+import asyncio
+
+from ..dependencies import engine, AsyncSessionLocal, logger
+from ..services.currency_service import parse_rates, read_rates_source, store_rates
+from ..services.migrations import apply_migrations
+
+
+async def run(source: str):
+    rates = parse_rates(await read_rates_source(source))
+    async with AsyncSessionLocal() as db:
+        stored = await store_rates(db, rates)
+        await db.commit()
+    logger.info("Імпортовано курсів: %s", stored)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load exchange rates")
+    parser.add_argument("source", help="шлях до файлу або URL")
+    args = parser.parse_args()
+
+    apply_migrations(engine)
+    asyncio.run(run(args.source))
+
+
+if __name__ == "__main__":
+    main()
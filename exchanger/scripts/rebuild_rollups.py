@@ -0,0 +1,31 @@
+"""
+Заповнення/перерахунок таблиці expense_daily_rollups з сирих витрат.
+
+Запуск:  python -m exchanger.scripts.rebuild_rollups [--user-id 42]
+"""
+import argparse
+import asyncio
+
+from ..dependencies import engine, AsyncSessionLocal, logger
+from ..services.rollup_service import rebuild_rollups
+from ..services.migrations import apply_migrations
+
+
+async def run(user_id: int | None):
+    async with AsyncSessionLocal() as db:
+        rows = await rebuild_rollups(db, user_id)
+        await db.commit()
+    logger.info("Агрегати перераховано: %s рядків", rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild daily expense rollups")
+    parser.add_argument("--user-id", type=int, default=None, help="перерахувати лише одного користувача")
+    args = parser.parse_args()
+
+    apply_migrations(engine)
+    asyncio.run(run(args.user_id))
+
+
+if __name__ == "__main__":
+    main()
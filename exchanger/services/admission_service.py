@@ -0,0 +1,190 @@
+import asyncio
+import math
+from collections import OrderedDict
+from time import monotonic
+
+import redis.asyncio as redis
+from fastapi import Request, status
+from fastapi.responses import ORJSONResponse
+from redis.exceptions import RedisError
+
+from ..dependencies import (
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_USER_RATE,
+    RATE_LIMIT_USER_BURST,
+    RATE_LIMIT_IP_RATE,
+    RATE_LIMIT_IP_BURST,
+    RATE_LIMIT_MAX_KEYS,
+    RATE_LIMIT_TRUST_FORWARDED,
+    ROUTE_CONCURRENCY_LIMITS,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_BUDGET_MS,
+    logger,
+)
+from .auth_service import decode_token
+from .metrics_service import ADMISSION_REJECTED
+from .redis_client import init_redis_pool, redis_available, mark_redis_unavailable
+
+# Token bucket в Redis: атомарно доливає токени за час, що минув, і забирає один.
+# Повертає, скільки секунд чекати до наступного токена (0 - запит пропускається)
+_REDIS_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    """Відра в пам'яті процесу; найдавніше використані ключі витісняються після maxsize."""
+
+    def __init__(self, rate: float, burst: float, maxsize: int):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str) -> float:
+        """Забирає токен; повертає 0 або кількість секунд до появи наступного токена."""
+        now = monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class ConcurrencyLimiter:
+    """
+    Обмежує кількість одночасних запитів маршруту. Черга обмежена і за довжиною, і за часом:
+    якщо за середнім часом обробки очікування перевищить бюджет, запит відхиляється одразу,
+    а не після того, як простоїть у черзі.
+    """
+
+    def __init__(self, limit: int, max_queue: int, budget: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.budget = budget
+        self._semaphore = asyncio.Semaphore(limit)
+        self._waiting = 0
+        # Ковзне середнє часу обробки одного запиту
+        self._service_time = 0.0
+
+    def expected_wait(self) -> float:
+        return (self._waiting + 1) * self._service_time / self.limit
+
+    async def acquire(self) -> bool:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return True
+        if self._waiting >= self.max_queue or self.expected_wait() > self.budget:
+            return False
+        self._waiting += 1
+        try:
+            # asyncio.timeout скасовує саме очікування: дозвіл або взято (і повернеться через release),
+            # або ні. wait_for у Python 3.11 міг взяти дозвіл у мить тайм-ауту і втратити його
+            async with asyncio.timeout(self.budget):
+                await self._semaphore.acquire()
+            return True
+        except TimeoutError:
+            return False
+        finally:
+            self._waiting -= 1
+
+    def release(self, duration: float):
+        self._service_time = duration if not self._service_time else 0.8 * self._service_time + 0.2 * duration
+        self._semaphore.release()
+
+
+_buckets = {
+    "user": TokenBucket(RATE_LIMIT_USER_RATE, RATE_LIMIT_USER_BURST, RATE_LIMIT_MAX_KEYS),
+    "ip": TokenBucket(RATE_LIMIT_IP_RATE, RATE_LIMIT_IP_BURST, RATE_LIMIT_MAX_KEYS),
+}
+_limiters = {
+    route: ConcurrencyLimiter(limit, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_BUDGET_MS / 1000)
+    for route, limit in ROUTE_CONCURRENCY_LIMITS.items() if limit > 0
+}
+_bucket_script = None
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def request_user_id(request: Request) -> int | None:
+    """Id користувача з Bearer-токена (через кеш claims); невалідний токен - анонімний запит."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return decode_token(token)["id"]
+    except Exception:
+        return None
+
+
+async def _take_token(kind: str, key: str) -> float:
+    bucket = _buckets[kind]
+    if RATE_LIMIT_BACKEND == "redis" and redis_available():
+        global _bucket_script
+        if _bucket_script is None:
+            _bucket_script = redis.Redis(connection_pool=init_redis_pool()).register_script(_REDIS_BUCKET_SCRIPT)
+        try:
+            return float(await _bucket_script(keys=[f"ratelimit:{kind}:{key}"], args=[bucket.rate, bucket.burst]))
+        except RedisError as e:
+            # Без Redis обмежуємо хоча б у межах цього воркера
+            mark_redis_unavailable(e)
+    return bucket.take(key)
+
+
+def _reject(status_code: int, detail: str, retry_after: float, route: str, reason: str) -> ORJSONResponse:
+    ADMISSION_REJECTED.labels(route=route, reason=reason).inc()
+    return ORJSONResponse(status_code=status_code, content={"detail": detail},
+                          headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+async def check_rate_limits(request: Request, route: str) -> ORJSONResponse | None:
+    """Відповідь 429, якщо в користувача чи IP закінчилися токени, інакше None."""
+    checks = [("ip", client_ip(request))]
+    user_id = request_user_id(request)
+    if user_id is not None:
+        checks.append(("user", str(user_id)))
+    for kind, key in checks:
+        wait = await _take_token(kind, key)
+        if wait > 0:
+            logger.warning("Перевищено ліміт запитів (%s %s)", kind, key)
+            return _reject(status.HTTP_429_TOO_MANY_REQUESTS, "Too many requests", wait, route, f"rate_{kind}")
+    return None
+
+
+def get_limiter(route: str | None) -> ConcurrencyLimiter | None:
+    return _limiters.get(route)
+
+
+def overloaded(route: str) -> ORJSONResponse:
+    logger.warning("Маршрут %s перевантажений, запит відхилено", route)
+    return _reject(status.HTTP_503_SERVICE_UNAVAILABLE, "Server overloaded", ADMISSION_QUEUE_BUDGET_MS / 1000,
+                   route, "concurrency")
@@ -0,0 +1,73 @@
+import json
+from collections import Counter
+from datetime import date
+from typing import Any, Awaitable, Callable
+
+import redis.asyncio as redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import BASE_CURRENCY, ANALYTICS_CACHE_TTL, ANALYTICS_LOCAL_CACHE_SIZE, ANALYTICS_LOCAL_CACHE_TTL, logger
+from .cache_service import LocalLRUCache, get_version, user_scope
+from .currency_service import exchange_rates
+from .redis_client import cache_get, cache_set, redis_available
+from .metrics_service import CACHE_REQUESTS
+
+local_cache = LocalLRUCache(ANALYTICS_LOCAL_CACHE_SIZE, ANALYTICS_LOCAL_CACHE_TTL)
+
+# Лічильники звернень: local_hit, redis_hit, miss, bypass (Redis недоступний)
+analytics_cache_stats = Counter()
+
+
+async def get_cached_analytics(redis_client: redis.Redis, db: AsyncSession, kind: str, user_id: int,
+                               period: str, start_date: date, end_date: date,
+                               loader: Callable[[AsyncSession], Awaitable[Any]], version: int | None = None,
+                               currency: str = BASE_CURRENCY):
+    """
+    Результат статистики з кешу. Ключ містить версію даних користувача, яку збільшує
+    кожна зміна його витрат, і версію курсів валют, тому застарілий результат ніколи не повертається.
+    version - уже прочитана викликачем версія, щоб не звертатися до Redis вдруге.
+    """
+    if version is None:
+        version = await get_version(redis_client, user_scope(user_id))
+    if not redis_available():
+        # Без Redis версію не дізнатися, а отже і локальному кешу довіряти не можна
+        analytics_cache_stats["bypass"] += 1
+        CACHE_REQUESTS.labels(cache="analytics", result="bypass").inc()
+        return await loader(db)
+
+    key = f"analytics:{kind}:{user_id}:{period}:{start_date}:{end_date}:{currency}:r{exchange_rates.version}:v{version}"
+    value = local_cache.get(key)
+    if value is not None:
+        analytics_cache_stats["local_hit"] += 1
+        CACHE_REQUESTS.labels(cache="analytics", result="local_hit").inc()
+        return value
+
+    cached = await cache_get(redis_client, key)
+    if cached:
+        analytics_cache_stats["redis_hit"] += 1
+        CACHE_REQUESTS.labels(cache="analytics", result="redis_hit").inc()
+        value = json.loads(cached)
+        local_cache.set(key, value)
+        return value
+
+    analytics_cache_stats["miss"] += 1
+    CACHE_REQUESTS.labels(cache="analytics", result="miss").inc()
+    logger.info("⏳ Статистики %s немає в кеші, рахуємо з БД", kind)
+    value = await loader(db)
+    await cache_set(redis_client, key, json.dumps(value), ex=ANALYTICS_CACHE_TTL)
+    local_cache.set(key, value)
+    return value
+
+
+def get_analytics_cache_stats() -> dict:
+    total = sum(analytics_cache_stats[name] for name in ("local_hit", "redis_hit", "miss"))
+    hits = analytics_cache_stats["local_hit"] + analytics_cache_stats["redis_hit"]
+    return {
+        "local_hit": analytics_cache_stats["local_hit"],
+        "redis_hit": analytics_cache_stats["redis_hit"],
+        "miss": analytics_cache_stats["miss"],
+        "bypass": analytics_cache_stats["bypass"],
+        "hit_ratio": hits / total if total else 0.0,
+        "local_size": len(local_cache),
+        "ttl": ANALYTICS_CACHE_TTL,
+    }
@@ -1,9 +1,17 @@
 from datetime import date,timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from ..models.expense_model import Expense
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, case, union_all
+from ..dependencies import BASE_CURRENCY
+from ..models.expense_archive_model import ArchivedExpense
+from ..models.expense_rollup_model import ExpenseDailyRollup, ExpenseMonthlyRollup
+from .archive_service import archive_boundary
+from .currency_service import exchange_rates
 from fastapi import HTTPException
 
+MAX_TIMESERIES_BUCKETS = 1000
+
+
 def calculate_date_range(period: str):
     today = date.today()
     if period == "day":
@@ -22,29 +30,187 @@ def calculate_date_range(period: str):
         raise HTTPException(status_code=400, detail="Invalid period. Choose from: day, week, month, year.")
     return start_date, end_date
 
-# CRUD-функція для загальної статистики витрат
-def get_expenses_summary_for_user(db: Session, user_id: int, start_date: date, end_date: date):
-    total_amount = (
-        db.query(func.sum(Expense.amount))
-        .filter(
-            Expense.user_id == user_id,
-            Expense.created_at >= start_date,
-            Expense.created_at <= end_date
-        )
-        .scalar()
+# Джерела агрегатів: (користувач, день, категорія, валюта, сума). Гарячі дні - з денних агрегатів,
+# архівні цілі місяці - з місячних, решта архівного діапазону - з самих архівних витрат
+_DAILY = (ExpenseDailyRollup.user_id, ExpenseDailyRollup.day, ExpenseDailyRollup.category_id,
+          ExpenseDailyRollup.currency, ExpenseDailyRollup.total)
+_MONTHLY = (ExpenseMonthlyRollup.user_id, ExpenseMonthlyRollup.month, ExpenseMonthlyRollup.category_id,
+            ExpenseMonthlyRollup.currency, ExpenseMonthlyRollup.total)
+_ARCHIVE = (ArchivedExpense.user_id, ArchivedExpense.created_at, ArchivedExpense.category_id,
+            ArchivedExpense.currency, ArchivedExpense.amount)
+
+
+def _grouped_totals(source: tuple, dialect_name: str, user_id: int, start_date: date, end_date: date,
+                    currency: str, bucket: str | None, by_category: bool, *filters):
+    user, day, category, row_currency, total = source
+    keys = []
+    if bucket is not None:
+        keys.append(_bucket_expression(dialect_name, bucket, day).label("bucket"))
+    if by_category:
+        keys.append(category.label("category_id"))
+    # Суми у валюті звіту не конвертуються, тож для них день не потрібен і вони згортаються в один рядок
+    day_key = case((row_currency == currency, None), else_=day).label("day")
+    return (
+        select(*keys, row_currency.label("currency"), day_key, func.sum(total).label("total"))
+        .filter(user == user_id, day >= start_date, day <= end_date, *filters)
+        .group_by(*keys, row_currency, day_key)
     )
-    return {"total_amount": total_amount or 0.0}
 
-# CRUD-функція для статистики за категоріями
-def get_expenses_by_category_for_user(db: Session, user_id: int, start_date: date, end_date: date):
-    results = (
-        db.query(Expense.category_id, func.sum(Expense.amount).label("total"))
-        .filter(
-            Expense.user_id == user_id,
-            Expense.created_at >= start_date,
-            Expense.created_at <= end_date
-        )
-        .group_by(Expense.category_id)
-        .all()
+
+def _archive_totals(dialect_name: str, user_id: int, start_date: date, end_date: date, currency: str,
+                    bucket: str | None, by_category: bool) -> list:
+    """
+    Запити до холодного шару за [start_date, end_date]. Цілі місяці у валюті звіту беруться з місячних
+    агрегатів (якщо відрізки не дрібніші за місяць); неповні місяці на краях діапазону та суми в інших
+    валютах, яким для конвертації потрібен курс дня, - з архівних витрат.
+    """
+    first_month = start_date if start_date.day == 1 else (start_date.replace(day=1) + timedelta(days=31)).replace(day=1)
+    months_end = (end_date + timedelta(days=1)).replace(day=1)
+    if bucket not in (None, "month") or first_month >= months_end:
+        return [_grouped_totals(_ARCHIVE, dialect_name, user_id, start_date, end_date, currency, bucket, by_category)]
+    last_day = months_end - timedelta(days=1)
+    # Інші валюти за цілі місяці читаються з архіву лише ті, що справді є в місячних агрегатах,
+    # тож у звичайному випадку (усі витрати у валюті звіту) архівні рядки не скануються
+    foreign = (
+        select(ExpenseMonthlyRollup.currency).distinct()
+        .filter(ExpenseMonthlyRollup.user_id == user_id, ExpenseMonthlyRollup.month >= first_month,
+                ExpenseMonthlyRollup.month <= last_day, ExpenseMonthlyRollup.currency != currency)
+    )
+    statements = [
+        _grouped_totals(_MONTHLY, dialect_name, user_id, first_month, last_day, currency, bucket, by_category,
+                        ExpenseMonthlyRollup.currency == currency),
+        _grouped_totals(_ARCHIVE, dialect_name, user_id, first_month, last_day, currency, bucket, by_category,
+                        ArchivedExpense.currency.in_(foreign)),
+    ]
+    if start_date < first_month:
+        statements.append(_grouped_totals(_ARCHIVE, dialect_name, user_id, start_date, first_month - timedelta(days=1),
+                                          currency, bucket, by_category))
+    if months_end <= end_date:
+        statements.append(_grouped_totals(_ARCHIVE, dialect_name, user_id, months_end, end_date, currency, bucket,
+                                          by_category))
+    return statements
+
+
+async def _converted_totals(db: AsyncSession, user_id: int, start_date: date, end_date: date, currency: str,
+                            bucket: str | None = None, by_category: bool = False) -> tuple[list, np.ndarray]:
+    """
+    Суми агрегатів, згруповані за відрізком bucket і/або категорією, валютою і днем, переведені у currency.
+    Архів додається в запит (UNION ALL) лише тоді, коли період починається раніше за межу архіву.
+    Конвертація виконується над масивами всіх груп одразу, а не для кожного рядка окремо.
+    Повертає колонки ключів (списки) і масив сконвертованих сум.
+    """
+    dialect_name = db.bind.dialect.name
+    cutoff = await archive_boundary.get(db)
+    hot_start = max(start_date, cutoff) if cutoff else start_date
+    statements = []
+    if hot_start <= end_date:
+        statements.append(_grouped_totals(_DAILY, dialect_name, user_id, hot_start, end_date, currency, bucket,
+                                          by_category))
+    if cutoff and start_date < cutoff:
+        statements += _archive_totals(dialect_name, user_id, start_date, min(end_date, cutoff - timedelta(days=1)),
+                                      currency, bucket, by_category)
+    key_count = (bucket is not None) + by_category
+    if not statements:
+        return [[] for _ in range(key_count)], np.zeros(0, dtype=np.int64)
+    # Групи з різних шарів можуть збігатися - далі вони однаково підсумовуються bincount
+    statement = statements[0] if len(statements) == 1 else union_all(*statements)
+    rows = (await db.execute(statement)).all()
+    if not rows:
+        return [[] for _ in range(key_count)], np.zeros(0, dtype=np.int64)
+    *key_columns, currencies, days, totals = zip(*rows)
+    converted = exchange_rates.convert(
+        np.array(totals, dtype=np.int64),
+        np.array(currencies),
+        np.array(days, dtype="datetime64[D]"),
+        currency,
     )
-    return [{"category_id": result.category_id, "total": result.total} for result in results]
\ No newline at end of file
+    return [list(column) for column in key_columns], converted
+
+
+def _to_list(values: np.ndarray) -> list:
+    # Без конвертації суми лишаються цілими, сконвертовані округлюються до копійок
+    return values.tolist() if values.dtype.kind == "i" else np.round(values, 2).tolist()
+
+
+def _group_sums(positions: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    sums = np.bincount(positions, weights=values, minlength=size)
+    return sums.astype(np.int64) if values.dtype.kind == "i" else sums
+
+
+# CRUD-функція для загальної статистики витрат.
+# Читає денні агрегати: рік - це не більше 365 рядків на категорію замість усієї історії.
+async def get_expenses_summary_for_user(db: AsyncSession, user_id: int, start_date: date, end_date: date,
+                                        currency: str = BASE_CURRENCY):
+    _, totals = await _converted_totals(db, user_id, start_date, end_date, currency)
+    if not len(totals):
+        return {"total_amount": 0.0}
+    total = totals.sum()
+    return {"total_amount": int(total) if totals.dtype.kind == "i" else round(float(total), 2)}
+
+# CRUD-функція для статистики за категоріями
+async def get_expenses_by_category_for_user(db: AsyncSession, user_id: int, start_date: date, end_date: date,
+                                            currency: str = BASE_CURRENCY):
+    (category_ids,), totals = await _converted_totals(db, user_id, start_date, end_date, currency,
+                                                      by_category=True)
+    categories, positions = np.unique(np.array(category_ids, dtype=np.int64), return_inverse=True)
+    sums = _group_sums(positions, totals, len(categories))
+    return [{"category_id": category_id, "total": total}
+            for category_id, total in zip(categories.tolist(), _to_list(sums))]
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def generate_buckets(start_date: date, end_date: date, bucket: str) -> list[date]:
+    buckets = []
+    current = bucket_start(start_date, bucket)
+    while current <= end_date:
+        buckets.append(current)
+        if bucket == "day":
+            current += timedelta(days=1)
+        elif bucket == "week":
+            current += timedelta(days=7)
+        else:
+            current = (current + timedelta(days=31)).replace(day=1)
+    return buckets
+
+
+def _bucket_expression(dialect_name: str, bucket: str, day=ExpenseDailyRollup.day):
+    # Початок відрізка рахується в SQL, щоб усі відрізки отримати одним GROUP BY
+    if bucket == "day":
+        return day
+    if dialect_name == "postgresql":
+        return func.date_trunc(bucket, day)
+    if bucket == "week":
+        # Найближча неділя (або сама дата), мінус 6 днів = понеділок тижня
+        return func.date(day, "weekday 0", "-6 days")
+    return func.strftime("%Y-%m-01", day)
+
+
+# Часовий ряд за довільний період одним запитом, порожні відрізки заповнюються нулями
+async def get_expenses_timeseries_for_user(db: AsyncSession, user_id: int, start_date: date, end_date: date,
+                                           bucket: str, by_category: bool = False, currency: str = BASE_CURRENCY):
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    buckets = generate_buckets(start_date, end_date, bucket)
+    if len(buckets) > MAX_TIMESERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Too many buckets, maximum is {MAX_TIMESERIES_BUCKETS}")
+
+    key_columns, totals = await _converted_totals(db, user_id, start_date, end_date, currency, bucket, by_category)
+
+    # Номер відрізка для кожної групи - бінарним пошуком по відсортованих початках відрізків
+    bucket_days = np.array(buckets, dtype="datetime64[D]")
+    positions = np.searchsorted(bucket_days, np.array(key_columns[0], dtype="datetime64[D]"))
+    payload = {"buckets": buckets, "totals": _to_list(_group_sums(positions, totals, len(buckets)))}
+    if by_category:
+        categories, category_positions = np.unique(np.array(key_columns[1], dtype=np.int64), return_inverse=True)
+        # Матриця категорія x відрізок однією bincount по зведеному індексу
+        series = _group_sums(category_positions * len(buckets) + positions, totals, len(categories) * len(buckets))
+        payload["category_ids"] = categories.tolist()
+        payload["series"] = _to_list(series.reshape(len(categories), len(buckets)))
+    return payload
@@ -0,0 +1,189 @@
+import asyncio
+from datetime import date, timedelta
+from time import monotonic
+
+from sqlalchemy import Date, cast, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import (AsyncSessionLocal, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_GRACE_SECONDS,
+                            ARCHIVE_STATE_TTL, logger)
+from ..models.expense_model import Expense
+from ..models.expense_archive_model import ArchivedExpense, ExpenseArchiveState
+from ..models.expense_rollup_model import ExpenseDailyRollup, ExpenseMonthlyRollup
+from ..models.users_model import Users
+from .rollup_service import as_day
+
+ARCHIVED_FIELDS = ("id", "user_id", "category_id", "amount", "currency", "description", "created_at", "updated_at")
+
+
+class ArchiveBoundary:
+    """
+    Межа архіву в пам'яті воркера. Перечитується з БД не частіше ніж раз на ttl секунд,
+    тож запити, що не сягають архіву, не платять за неї окремим зверненням до БД.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._cutoff: date | None = None
+        self._loaded_at: float | None = None
+
+    async def get(self, db: AsyncSession) -> date | None:
+        if self._loaded_at is None or monotonic() - self._loaded_at > self.ttl:
+            self.set(await db.scalar(select(ExpenseArchiveState.cutoff).filter(ExpenseArchiveState.id == 1)))
+        return self._cutoff
+
+    def set(self, cutoff: date | None):
+        self._cutoff = cutoff
+        self._loaded_at = monotonic()
+
+
+archive_boundary = ArchiveBoundary(ARCHIVE_STATE_TTL)
+
+
+def archive_cutoff_for(today: date, older_than_days: int = ARCHIVE_AFTER_DAYS) -> date:
+    # Межа завжди на першому числі місяця: архівні місяці цілі, тож місячні агрегати точні
+    return (today - timedelta(days=older_than_days)).replace(day=1)
+
+
+async def is_archived(db: AsyncSession, user_id: int, expense_id: int) -> bool:
+    return await db.scalar(select(ArchivedExpense.id).filter(ArchivedExpense.id == expense_id,
+                                                             ArchivedExpense.user_id == user_id)) is not None
+
+
+async def is_read_only(db: AsyncSession, expense: Expense) -> bool:
+    """
+    Витрата лише для читання, якщо її день уже за межею архіву або поточний запуск архівації
+    скопіював її в архів, а межу ще не опублікував (зміна після копіювання загубилася б).
+    Без архівації межі немає, а архів порожній - усі витрати змінюються як раніше.
+    """
+    cutoff = await archive_boundary.get(db)
+    if cutoff is not None and as_day(expense.created_at) < cutoff:
+        return True
+    return await is_archived(db, expense.user_id, expense.id)
+
+
+def _month_expression(dialect_name: str, day):
+    if dialect_name == "postgresql":
+        return cast(func.date_trunc("month", day), Date)
+    return func.strftime("%Y-%m-01", day)
+
+
+def _period(model, user_id: int, since: date | None, cutoff: date) -> list:
+    filters = [model.user_id == user_id, model.created_at < cutoff]
+    if since is not None:
+        filters.append(model.created_at >= since)
+    return filters
+
+
+async def _copy_chunks(db: AsyncSession, user_id: int, since: date | None, cutoff: date) -> list[tuple]:
+    """
+    Розбиває [since, cutoff) на діапазони днів приблизно по ARCHIVE_BATCH_SIZE витрат за денними агрегатами.
+    Перший діапазон відкритий знизу, останній доходить до cutoff, тож діапазони покривають весь період,
+    навіть якщо агрегати неточні - від них залежить лише розмір порцій.
+    """
+    filters = [ExpenseDailyRollup.user_id == user_id, ExpenseDailyRollup.day < cutoff]
+    if since is not None:
+        filters.append(ExpenseDailyRollup.day >= since)
+    days = (await db.execute(
+        select(ExpenseDailyRollup.day, func.sum(ExpenseDailyRollup.count))
+        .filter(*filters).group_by(ExpenseDailyRollup.day).order_by(ExpenseDailyRollup.day)
+    )).all()
+    chunks = []
+    start, size = since, 0
+    for day, count in days:
+        size += count
+        if size >= ARCHIVE_BATCH_SIZE:
+            chunks.append((start, day + timedelta(days=1)))
+            start, size = day + timedelta(days=1), 0
+    chunks.append((start, cutoff))
+    return chunks
+
+
+async def _archive_user(db: AsyncSession, user_id: int, since: date | None, cutoff: date) -> int:
+    """Копіює витрати користувача з [since, cutoff) в архів і будує для них місячні агрегати."""
+    # Після перерваного запуску в архіві можуть лишитися рядки, ще не захищені межею - копіюємо заново
+    await db.execute(delete(ArchivedExpense).filter(*_period(ArchivedExpense, user_id, since, cutoff)))
+    await db.commit()
+
+    copied = 0
+    columns = [getattr(Expense, field) for field in ARCHIVED_FIELDS]
+    for start, end in await _copy_chunks(db, user_id, since, cutoff):
+        chunk = _period(Expense, user_id, start, end)
+        result = await db.execute(insert(ArchivedExpense).from_select(ARCHIVED_FIELDS, select(*columns).filter(*chunk)))
+        # Кожна порція - окрема коротка транзакція, щоб не тримати блокування запису над SQLite
+        await db.commit()
+        copied += result.rowcount
+
+    month = _month_expression(db.bind.dialect.name, ArchivedExpense.created_at)
+    months = [ExpenseMonthlyRollup.user_id == user_id, ExpenseMonthlyRollup.month < cutoff]
+    if since is not None:
+        months.append(ExpenseMonthlyRollup.month >= since)
+    await db.execute(delete(ExpenseMonthlyRollup).filter(*months))
+    await db.execute(insert(ExpenseMonthlyRollup).from_select(
+        ["user_id", "month", "category_id", "currency", "total", "count"],
+        select(ArchivedExpense.user_id, month, ArchivedExpense.category_id, ArchivedExpense.currency,
+               func.sum(ArchivedExpense.amount), func.count())
+        .filter(*_period(ArchivedExpense, user_id, since, cutoff))
+        .group_by(ArchivedExpense.user_id, month, ArchivedExpense.category_id, ArchivedExpense.currency)
+    ))
+    await db.commit()
+    return copied
+
+
+async def _purge_user(db: AsyncSession, user_id: int, cutoff: date) -> int:
+    """Видаляє з гарячих таблиць витрати до cutoff - лише ті, що вже є в архіві."""
+    purged = 0
+    archived = select(ArchivedExpense.id).filter(ArchivedExpense.id == Expense.id).exists()
+    while True:
+        batch = (
+            select(Expense.id)
+            .filter(Expense.user_id == user_id, Expense.created_at < cutoff, archived)
+            .limit(ARCHIVE_BATCH_SIZE)
+            .correlate(None)
+        )
+        result = await db.execute(delete(Expense).filter(Expense.id.in_(batch)))
+        await db.commit()
+        purged += result.rowcount
+        if result.rowcount < ARCHIVE_BATCH_SIZE:
+            break
+    await db.execute(delete(ExpenseDailyRollup).filter(ExpenseDailyRollup.user_id == user_id,
+                                                       ExpenseDailyRollup.day < cutoff))
+    await db.commit()
+    return purged
+
+
+async def archive_expenses(older_than_days: int = ARCHIVE_AFTER_DAYS,
+                           grace_seconds: float = ARCHIVE_GRACE_SECONDS) -> dict:
+    """
+    Переносить витрати, старші за older_than_days, в expenses_archive у три кроки:
+    1) копіює їх в архів і будує місячні агрегати - гарячі дані поки не змінюються;
+    2) публікує нову межу архіву - відтепер читання до межі йде з архіву;
+    3) через grace_seconds, коли всі воркери перечитали межу, видаляє перенесене з гарячих таблиць.
+    Повторний запуск після збою на будь-якому кроці безпечний.
+    """
+    cutoff = archive_cutoff_for(date.today(), older_than_days)
+    async with AsyncSessionLocal() as db:
+        current = await db.scalar(select(ExpenseArchiveState.cutoff).filter(ExpenseArchiveState.id == 1))
+        user_ids = (await db.scalars(select(Users.id).order_by(Users.id))).all()
+
+    archived = 0
+    if current is None or cutoff > current:
+        for user_id in user_ids:
+            async with AsyncSessionLocal() as db:
+                archived += await _archive_user(db, user_id, current, cutoff)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(ExpenseArchiveState))
+            db.add(ExpenseArchiveState(id=1, cutoff=cutoff))
+            await db.commit()
+        archive_boundary.set(cutoff)
+        logger.info("Межу архіву пересунуто на %s, перенесено витрат: %s", cutoff, archived)
+        await asyncio.sleep(grace_seconds)
+    else:
+        cutoff = current
+
+    purged = 0
+    for user_id in user_ids:
+        async with AsyncSessionLocal() as db:
+            purged += await _purge_user(db, user_id, cutoff)
+    logger.info("З гарячої таблиці видалено архівних витрат: %s", purged)
+    return {"cutoff": cutoff, "archived": archived, "purged": purged}
@@ -1,47 +1,52 @@
 import os
-import smtplib
+import hashlib
+import uuid
+from time import time
 from datetime import datetime,timedelta
 from typing import Annotated
 
 
 from ..models.users_model import Users
 
-from ..dependencies import SECRET_KEY,ALGORITHM,EMAIL_PASSWORD,EMAIL_ADDRESS,logger
+from ..dependencies import SECRET_KEY,ALGORITHM,logger
+from ..dependencies import ACCESS_TOKEN_EXPIRE_MINUTES,TOKEN_CACHE_SIZE,TOKEN_CACHE_TTL
+from .password_service import hash_password, verify_password
+from .cache_service import LocalLRUCache
+from .metrics_service import CACHE_REQUESTS
+from .redis_client import get_redis, redis_available, mark_redis_unavailable
 
 from fastapi import Depends,HTTPException,status
 from fastapi.security import OAuth2PasswordRequestForm,OAuth2PasswordBearer
 
-from passlib.context import CryptContext
-from jose import jwt,JWTError
-from dotenv import load_dotenv
-
-from email.message import EmailMessage
-from starlette.templating import Jinja2Templates
-from jinja2 import Environment, FileSystemLoader
-
-
-load_dotenv()
-
-email_templates_env = Environment(loader=FileSystemLoader("exchanger/templates"))
+from sqlalchemy import select
+import redis.asyncio as redis
+from redis.exceptions import RedisError
 
 
 
 oauth2_bearer=OAuth2PasswordBearer(tokenUrl='auth/token')
 
-bcrypt_context=CryptContext(schemes=['bcrypt'],deprecated='auto')
-
+# Перевірені claims токенів: ключ - sha256 токена, запис живе не довше за exp токена
+token_claims_cache=LocalLRUCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
 
+async def encode_password(password: str) -> str:
+    return await hash_password(password)
 
-def encode_password(password: str) -> str:
-    return bcrypt_context.hash(password)
 
 
 
-
-def authenticate_user(email:str,password:str,db):
-   user=db.query(Users).filter(Users.email==email).first()
-   if not user or not bcrypt_context.verify(password, user.hashed_password):
+async def authenticate_user(email:str,password:str,db):
+   user=(await db.execute(select(Users).filter(Users.email==email))).scalars().first()
+   if not user:
+     return False
+   verified, new_hash = await verify_password(password, user.hashed_password)
+   if not verified:
      return False
+   if new_hash:
+     # Вартість bcrypt змінилася - тихо перезберігаємо хеш
+     user.hashed_password = new_hash
+     await db.commit()
+     logger.info("Хеш пароля користувача %s оновлено", user.email)
    return user
 
 def create_access_token(email: str, id: str,role:str,is_active:bool, expires_delta: timedelta):
@@ -51,43 +56,79 @@ def create_access_token(email: str, id: str,role:str,is_active:bool, expires_del
       'role':role,
       'status':is_active
       }
-   expires=datetime.utcnow() + expires_delta
-   encode.update({'exp':expires})
+   now=datetime.utcnow()
+   # jti робить кожен токен унікальним: токени, видані в ту саму секунду, відкликаються окремо
+   encode.update({'exp':now + expires_delta, 'iat':now, 'jti':uuid.uuid4().hex})
+   # jose імпортується при першому використанні, а не разом із застосунком
+   from jose import jwt
    return jwt.encode(encode,SECRET_KEY,algorithm=ALGORITHM)
 
 
-async def get_current_user(token:Annotated[str,Depends(oauth2_bearer)]):
+def token_hash(token: str) -> str:
+   return hashlib.sha256(token.encode()).hexdigest()
+
+
+def decode_token(token: str) -> dict:
+   """Claims токена; повна перевірка підпису лише при першій появі токена в цьому процесі."""
+   key=token_hash(token)
+   claims=token_claims_cache.get(key)
+   if claims is not None:
+      CACHE_REQUESTS.labels(cache="token", result="hit").inc()
+      return claims
+   CACHE_REQUESTS.labels(cache="token", result="miss").inc()
+   from jose import jwt,JWTError
    try:
       payload=jwt.decode(token,SECRET_KEY,algorithms=[ALGORITHM])
-      email=payload.get('sub')
-      id=payload.get('id')
-      role=payload.get('role')
-      is_active=payload.get('status')
-      if email is None or id is None or is_active is False:
-         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail='Could not validate user')
-      return{'email':email, 'id':id,'user_role':role}
    except JWTError:
       raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail='Token expired')
+   email=payload.get('sub')
+   id=payload.get('id')
+   is_active=payload.get('status')
+   if email is None or id is None or is_active is False:
+      raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail='Could not validate user')
+   # Токени, видані до появи jti, відкликаються за хешем
+   claims={'email':email, 'id':id,'user_role':payload.get('role'),'iat':payload.get('iat',0),
+           'jti':payload.get('jti') or key}
+   token_claims_cache.set(key, claims, ttl=payload['exp'] - time())
+   return claims
+
+
+async def is_token_revoked(redis_client: redis.Redis, claims: dict) -> bool:
+   # Redis недоступний - поводимося як до появи відкликання, тобто пропускаємо
+   if not redis_available():
+      return False
+   try:
+      revoked, revoked_before=await redis_client.mget(f"revoked:{claims['jti']}", f"revoked_user:{claims['id']}")
+   except RedisError as e:
+      mark_redis_unavailable(e)
+      return False
+   # iat має точність до секунди: токен, виданий у секунду відкликання, лишається дійсним,
+   # інакше новий вхід одразу після зміни пароля отримав би вже відкликаний токен
+   return bool(revoked) or (revoked_before is not None and claims['iat'] < int(revoked_before))
+
+
+async def revoke_token(redis_client: redis.Redis, token: str):
+   """Вихід: токен потрапляє у список відкликаних до закінчення свого строку дії."""
+   claims=decode_token(token)
+   try:
+      await redis_client.set(f"revoked:{claims['jti']}", "1", ex=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+   except RedisError as e:
+      mark_redis_unavailable(e)
+      raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,detail='Logout is temporarily unavailable')
 
 
-
-def send_verification_email(email: str, token: str):
-   template = email_templates_env.get_template("email_verify.html")
-   verification_link = f"http://0.0.0.0:80/auth/verify/{token}"
-   html_content = template.render(verification_link=verification_link)
-   msg = EmailMessage()
-   msg['Subject'] = "Email Verify"
-   msg['From'] = EMAIL_ADDRESS
-   msg['To'] = email
-   msg.set_content("This email requires an HTML-compatible email client.") 
-   msg.add_alternative(html_content, subtype="html")
-
-
-   with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-      smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-      smtp.send_message(msg)
-
-
-
+async def revoke_user_tokens(redis_client: redis.Redis, user_id: int):
+   """Відкликає всі токени користувача, видані до поточної секунди (зміна пароля, деактивація)."""
+   token_claims_cache.delete_where(lambda claims: claims['id'] == user_id)
+   try:
+      await redis_client.set(f"revoked_user:{user_id}", str(int(time())), ex=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+   except RedisError as e:
+      mark_redis_unavailable(e)
+      logger.warning("Не вдалося відкликати токени користувача %s: %s", user_id, e)
 
 
+async def get_current_user(token:Annotated[str,Depends(oauth2_bearer)], redis_client: redis.Redis = Depends(get_redis)):
+   claims=decode_token(token)
+   if await is_token_revoked(redis_client, claims):
+      raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail='Token revoked')
+   return{'email':claims['email'], 'id':claims['id'],'user_role':claims['user_role']}
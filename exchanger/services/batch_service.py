@@ -0,0 +1,177 @@
+import redis.asyncio as redis
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import BATCH_MAX_OPERATIONS, logger
+from ..models.category_model import Category
+from ..schemas.batch_schemas import BatchOperation, BatchRequest
+from ..schemas.category_schemas import CreateCategory
+from ..schemas.expense_schemas import ExpenseCreatedModel
+from .bulk_import_service import format_validation_error
+from .cache_service import bump_version, CATEGORIES_SCOPE
+from .currency_service import normalize_currency, resolve_currency
+from .expense_service import delete_expense_row, get_mutable_expense, insert_expense, update_expense_values
+from .live_service import expense_delta, expense_event, publish_expense_changes
+
+
+class _BatchContext:
+    """Стан, спільний для операцій одного пакета: категорії і валюта читаються один раз."""
+
+    def __init__(self, user_id: int, default_currency: str, category_ids: set[int]):
+        self.user_id = user_id
+        self.default_currency = default_currency
+        self.category_ids = category_ids
+
+
+def _validate(model, data: dict | None):
+    try:
+        return model.model_validate(data or {})
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=format_validation_error(e))
+
+
+def _require_id(operation: BatchOperation) -> int:
+    if operation.id is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"id is required for {operation.op}")
+    return operation.id
+
+
+def _check_category(ctx: _BatchContext, category_id: int):
+    if category_id not in ctx.category_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"category {category_id} not found")
+
+
+async def _apply_expense(db: AsyncSession, ctx: _BatchContext, operation: BatchOperation) -> tuple[int, int, dict]:
+    if operation.op == "create":
+        expense = _validate(ExpenseCreatedModel, operation.data)
+        _check_category(ctx, expense.category_id)
+        currency = normalize_currency(expense.currency) if expense.currency else ctx.default_currency
+        new_expense = await insert_expense(db, ctx.user_id, expense.category_id, expense.amount, currency,
+                                           expense.description)
+        return status.HTTP_201_CREATED, new_expense.id, expense_event("created", new_expense,
+                                                                      [expense_delta(new_expense, 1)])
+
+    exists_expense = await get_mutable_expense(db, ctx.user_id, _require_id(operation))
+    before = expense_delta(exists_expense, -1)
+    if operation.op == "update":
+        expense = _validate(ExpenseCreatedModel, operation.data)
+        _check_category(ctx, expense.category_id)
+        currency = normalize_currency(expense.currency) if expense.currency else exists_expense.currency
+        await update_expense_values(db, exists_expense, expense.category_id, expense.amount, currency,
+                                    expense.description)
+        event = expense_event("updated", exists_expense, [before, expense_delta(exists_expense, 1)])
+    else:
+        event = expense_event("deleted", exists_expense, [before])
+        await delete_expense_row(db, exists_expense)
+    await db.flush()
+    return status.HTTP_200_OK, exists_expense.id, event
+
+
+async def _apply_category(db: AsyncSession, ctx: _BatchContext, operation: BatchOperation) -> tuple[int, int, None]:
+    if operation.op == "create":
+        category = _validate(CreateCategory, operation.data)
+        if (await db.execute(select(Category.id).filter(Category.name == category.name))).first():
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Category already exists")
+        new_category = Category(name=category.name, user_id=ctx.user_id)
+        db.add(new_category)
+        await db.flush()
+        ctx.category_ids.add(new_category.id)
+        return status.HTTP_201_CREATED, new_category.id, None
+
+    category_id = _require_id(operation)
+    exists_category = (await db.execute(select(Category).filter(Category.id == category_id,
+                                                                Category.user_id == ctx.user_id))).scalars().first()
+    if not exists_category:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+    if operation.op == "update":
+        exists_category.name = _validate(CreateCategory, operation.data).name
+    else:
+        await db.delete(exists_category)
+    await db.flush()
+    if operation.op == "delete":
+        ctx.category_ids.discard(category_id)
+    return status.HTTP_200_OK, category_id, None
+
+
+async def _apply(db: AsyncSession, ctx: _BatchContext, operation: BatchOperation) -> tuple[int, int, dict | None]:
+    """Повертає (HTTP-код, id, подія для потоків SSE або None)."""
+    try:
+        if operation.entity == "expense":
+            return await _apply_expense(db, ctx, operation)
+        return await _apply_category(db, ctx, operation)
+    except IntegrityError:
+        # Напр. назва категорії, яку одночасно створив інший запит
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Constraint violation")
+
+
+async def _begin(db: AsyncSession):
+    """
+    Для SQLite транзакція починається явним BEGIN IMMEDIATE: pysqlite/aiosqlite самі не починають її
+    до першого запису, і без зовнішньої транзакції RELEASE SAVEPOINT одразу комітить зміни.
+    IMMEDIATE бере блокування запису наперед, тож читання й записи пакета бачать один стан БД.
+    """
+    if db.bind.dialect.name == "sqlite":
+        await db.execute(text("BEGIN IMMEDIATE"))
+
+
+async def run_batch(db: AsyncSession, redis_client: redis.Redis, user_id: int, request: BatchRequest) -> tuple[int, dict]:
+    """
+    Виконує операції по порядку в одній транзакції. atomic: перша помилка відкочує весь пакет,
+    код відповіді - код цієї операції. independent: кожна операція у своєму SAVEPOINT, невдалі
+    відкочуються окремо, решта комітиться. Кеші інвалідуються один раз на пакет.
+    Повертає (HTTP-код, тіло відповіді).
+    """
+    operations = request.operations
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Too many operations, maximum is {BATCH_MAX_OPERATIONS}")
+    atomic = request.mode == "atomic"
+    logger.info("Пакет з %s операцій, режим %s", len(operations), request.mode)
+
+    # Профіль (домашня валюта) читається до початку транзакції і лише якщо він потрібен
+    default_currency = None
+    if any(op.entity == "expense" and op.op == "create" and not (op.data or {}).get("currency") for op in operations):
+        default_currency = await resolve_currency(db, redis_client, user_id, None)
+    await _begin(db)
+    category_ids = set((await db.execute(select(Category.id))).scalars().all())
+    ctx = _BatchContext(user_id, default_currency, category_ids)
+
+    results = []
+    changed = set()
+    events = []
+    for index, operation in enumerate(operations):
+        try:
+            if atomic:
+                status_code, entity_id, event = await _apply(db, ctx, operation)
+            else:
+                async with db.begin_nested():
+                    status_code, entity_id, event = await _apply(db, ctx, operation)
+        except HTTPException as e:
+            logger.warning("Операція %s пакета не виконана: %s", index, e.detail)
+            failed = {"index": index, "status": e.status_code, "id": operation.id, "detail": e.detail}
+            if atomic:
+                await db.rollback()
+                # Решта пакета не застосована: попередні операції відкочено, наступні не виконувались
+                results = [failed if i == index else {"index": i, "status": status.HTTP_424_FAILED_DEPENDENCY,
+                                                      "id": op.id, "detail": "Batch rolled back"}
+                           for i, op in enumerate(operations)]
+                return e.status_code, {"mode": request.mode, "committed": False, "results": results}
+            results.append(failed)
+            continue
+        changed.add(operation.entity)
+        if event is not None:
+            events.append(event)
+        results.append({"index": index, "status": status_code, "id": entity_id, "detail": None})
+
+    await db.commit()
+    if "expense" in changed:
+        # Одна версія і одне повідомлення на весь пакет
+        await publish_expense_changes(redis_client, user_id, events)
+    if "category" in changed:
+        await bump_version(redis_client, CATEGORIES_SCOPE)
+    logger.info("Пакет виконано: успішних операцій %s з %s", sum(result["detail"] is None for result in results),
+                len(operations))
+    return status.HTTP_200_OK, {"mode": request.mode, "committed": True, "results": results}
@@ -0,0 +1,214 @@
+import codecs
+import csv
+import json
+import pickle
+import tempfile
+from collections import defaultdict, deque
+from datetime import date
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import BULK_IMPORT_CHUNK_SIZE, BULK_IMPORT_MAX_ERRORS, logger
+from ..models.category_model import Category
+from ..models.expense_model import Expense
+from ..schemas.expense_schemas import ExpenseImportModel
+from .archive_service import archive_boundary
+from .currency_service import exchange_rates
+from .rollup_service import apply_expense_delta
+
+# Запис CSV з незакритими лапками довший за це число рядків відхиляється, щоб не буферизувати решту тіла
+CSV_MAX_RECORD_LINES = 1000
+# Перевірені рядки до кінця тіла лежать у пам'яті до цього розміру, далі - у тимчасовому файлі
+BULK_IMPORT_SPOOL_MAX_BYTES = 4 * 1024 * 1024
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Розбиває потік байтів тіла запиту на рядки, не читаючи тіло повністю."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+class _LineFeed:
+    """Синхронне джерело рядків для csv.reader, яке поповнюється з асинхронного потоку тіла."""
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def iter_records(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, list[str] | None, str | None]]:
+    """
+    Записи CSV: (номер першого рядка, значення, помилка). Поле в лапках може містити переведення рядка,
+    тому фізичні рядки накопичуються, поки лапки не закриються (їх парна кількість), і лише тоді
+    весь запис читає один спільний csv.reader.
+    """
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    pending = []
+    quotes = 0
+    start = 0
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not pending:
+            if not line.strip():
+                continue
+            start = line_number
+        pending.append(line + "\n")
+        quotes += line.count('"')
+        if quotes % 2:
+            if len(pending) < CSV_MAX_RECORD_LINES:
+                continue
+            yield start, None, f"quoted field is not closed within {CSV_MAX_RECORD_LINES} lines"
+        else:
+            feed.lines.extend(pending)
+            yield start, next(reader), None
+        pending = []
+        quotes = 0
+    if pending:
+        yield start, None, "quoted field is not closed at end of input"
+
+
+async def iter_rows(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """Повертає (номер рядка, дані, помилка розбору). Для CSV перший рядок - заголовок."""
+    if fmt == "csv":
+        header = None
+        async for line_number, values, error in iter_records(lines):
+            if error:
+                yield line_number, None, error
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_number, None, f"expected {len(header)} columns, got {len(values)}"
+                continue
+            yield line_number, dict(zip(header, values)), None
+        return
+
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(data, dict):
+            yield line_number, None, "expected a JSON object"
+            continue
+        yield line_number, data, None
+
+
+def format_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+
+
+async def import_expenses(db: AsyncSession, user_id: int, rows: AsyncIterator[tuple[int, dict | None, str | None]],
+                          default_currency: str, chunk_size: int = BULK_IMPORT_CHUNK_SIZE) -> dict:
+    """
+    Вставляє витрати порціями по chunk_size через executemany в одній транзакції.
+    Поки тіло запиту ще надходить, перевірені порції складаються в тимчасовий файл, і запис у БД
+    починається лише після його кінця: повільний клієнт не тримає блокування запису SQLite.
+    Рядок може мати created_at (напр. з /expenses/export), але не раніше межі архіву: такі дні читаються
+    лише з архіву. Пам'ять обмежена розміром порції, кількістю категорій, днів і BULK_IMPORT_MAX_ERRORS.
+    Commit робить викликач.
+    """
+    category_ids = set((await db.execute(select(Category.id))).scalars().all())
+    currencies = exchange_rates.currencies
+    today = date.today()
+    archive_cutoff = await archive_boundary.get(db)
+    chunk = []
+    inserted = 0
+    failed = 0
+    errors = []
+    # Сума і кількість по (день, категорія, валюта) для денних агрегатів - застосовуються один раз у кінці
+    rollup = defaultdict(lambda: [0, 0])
+
+    def reject(line_number: int, message: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < BULK_IMPORT_MAX_ERRORS:
+            errors.append({"line": line_number, "error": message})
+
+    with tempfile.SpooledTemporaryFile(max_size=BULK_IMPORT_SPOOL_MAX_BYTES) as spool:
+        async for line_number, data, error in rows:
+            if error:
+                reject(line_number, error)
+                continue
+            try:
+                expense = ExpenseImportModel.model_validate(data)
+            except ValidationError as e:
+                reject(line_number, format_validation_error(e))
+                continue
+            if expense.category_id not in category_ids:
+                reject(line_number, f"category {expense.category_id} not found")
+                continue
+            currency = expense.currency.upper() if expense.currency else default_currency
+            if currency not in currencies:
+                reject(line_number, f"unknown currency {expense.currency}")
+                continue
+            day = expense.created_at or today
+            if archive_cutoff is not None and day < archive_cutoff:
+                reject(line_number, f"created_at {day} is before archive cutoff {archive_cutoff}")
+                continue
+
+            chunk.append({
+                "user_id": user_id,
+                "category_id": expense.category_id,
+                "amount": expense.amount,
+                "currency": currency,
+                "description": expense.description,
+                "created_at": day,
+                "updated_at": today,
+            })
+            rollup[day, expense.category_id, currency][0] += expense.amount
+            rollup[day, expense.category_id, currency][1] += 1
+
+            if len(chunk) >= chunk_size:
+                pickle.dump(chunk, spool)
+                chunk = []
+
+        if chunk:
+            pickle.dump(chunk, spool)
+
+        # Тіло прочитано повністю: лише тепер перший INSERT відкриває транзакцію запису
+        spool.seek(0)
+        while True:
+            try:
+                chunk = pickle.load(spool)
+            except EOFError:
+                break
+            await db.execute(insert(Expense), chunk)
+            inserted += len(chunk)
+
+    for (day, category_id, currency), (total, count) in rollup.items():
+        await apply_expense_delta(db, user_id, day, category_id, currency, total, count)
+
+    logger.info("Імпорт витрат: вставлено %s, відхилено %s", inserted, failed)
+    return {
+        "inserted": inserted,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+    }
@@ -0,0 +1,289 @@
+import asyncio
+from collections import OrderedDict
+from time import monotonic, perf_counter, time
+from typing import Any, Awaitable, Callable
+
+import orjson
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import AsyncSessionLocal, logger
+from .redis_client import cache_get, redis_available, mark_redis_unavailable
+from .metrics_service import CACHE_REQUESTS, REDIS_COMMAND_DURATION
+
+# Версії кешу: кожна мутація збільшує версію, тому старі ключі просто перестають читатися
+CATEGORIES_SCOPE = "categories"
+# Канал, яким bump_version повідомляє всі воркери про нову версію області (дані - назва області)
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+LOCK_TTL = 10       # секунд живе блокування перерахунку, якщо власник впав
+LOCK_WAIT = 2.0     # скільки чекати, поки інший воркер перерахує ключ
+LOCK_POLL = 0.02
+
+Loader = Callable[[AsyncSession], Awaitable[Any]]
+
+# Перерахунки, що зараз виконуються в цьому процесі: ключ -> Future з результатом
+_inflight: dict[str, asyncio.Future] = {}
+# Ключі, для яких уже запущене фонове оновлення
+_refreshing: set[str] = set()
+# Посилання на фонові задачі, щоб їх не прибрав збирач сміття
+_background_tasks: set[asyncio.Task] = set()
+# Локальні кеші версій (L1 у tiered_cache): викликаються і для змін, зроблених самим воркером
+_invalidation_hooks: list[Callable[[str], None]] = []
+
+
+class LocalLRUCache:
+    """Обмежений кеш у пам'яті процесу з TTL для кожного запису."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl)), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Any], bool]):
+        for key in [key for key, (_, value) in self._data.items() if predicate(value)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def user_scope(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def profile_scope(user_id: int) -> str:
+    return f"profile:{user_id}"
+
+
+async def get_version(redis_client: redis.Redis, scope: str) -> int:
+    value = await cache_get(redis_client, f"version:{scope}")
+    return int(value) if value else 0
+
+
+def on_invalidate(hook: Callable[[str], None]):
+    _invalidation_hooks.append(hook)
+    return hook
+
+
+def invalidate_local(scope: str):
+    for hook in _invalidation_hooks:
+        hook(scope)
+
+
+async def bump_version(redis_client: redis.Redis, scope: str) -> int | None:
+    """
+    Інвалідує всі ключі області scope. Викликається після commit кожної мутації.
+    Інші воркери дізнаються про нову версію з INVALIDATION_CHANNEL, цей - одразу, не чекаючи
+    власного повідомлення: наступний запит клієнта вже побачить свою зміну.
+    Повертає нову версію або None, якщо Redis недоступний.
+    """
+    try:
+        if not redis_available():
+            return None
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.incr(f"version:{scope}")
+                # Час зміни для Last-Modified: updated_at у БД зберігає лише дату
+                pipe.set(f"modified:{scope}", repr(time()))
+                pipe.publish(INVALIDATION_CHANNEL, scope)
+                version, _, _ = await pipe.execute()
+        except RedisError as e:
+            mark_redis_unavailable(e)
+            return None
+        return int(version)
+    finally:
+        # Після INCR: читання, що почалося раніше, не покладе в L1 стару версію (див. ScopeValidators)
+        invalidate_local(scope)
+
+
+async def get_validators(redis_client: redis.Redis, scope: str) -> tuple[int, float] | None:
+    """Версія і час останньої зміни області scope для ETag і Last-Modified; None, якщо Redis недоступний."""
+    if not redis_available():
+        return None
+    try:
+        version, modified = await redis_client.mget(f"version:{scope}", f"modified:{scope}")
+        if modified is None:
+            # Мітки ще немає (нова область або Redis очищено): нова епоха з поточного часу,
+            # щоб ETag, видані до очищення, не збіглися з новими при тій самій версії
+            modified = repr(time())
+            if not await redis_client.set(f"modified:{scope}", modified, nx=True):
+                modified = await redis_client.get(f"modified:{scope}")
+    except RedisError as e:
+        mark_redis_unavailable(e)
+        return None
+    return int(version or 0), float(modified)
+
+
+async def _acquire_lock(redis_client: redis.Redis, key: str) -> bool:
+    # Без Redis координувати воркери неможливо - рахуємо самі
+    if not redis_available():
+        return True
+    try:
+        return bool(await redis_client.set(f"lock:{key}", "1", nx=True, ex=LOCK_TTL))
+    except RedisError as e:
+        mark_redis_unavailable(e)
+        return True
+
+
+async def _release_lock(redis_client: redis.Redis, key: str):
+    if not redis_available():
+        return
+    try:
+        await redis_client.delete(f"lock:{key}")
+    except RedisError as e:
+        mark_redis_unavailable(e)
+
+
+async def _store(redis_client: redis.Redis, key: str, payload: bytes, ttl: int, soft_ttl: int | None):
+    if not redis_available():
+        return
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.set(key, payload, ex=ttl)
+            if soft_ttl:
+                # Окремий маркер свіжості: коли він зникає, дані ще віддаються, але оновлюються у фоні
+                pipe.set(f"{key}:fresh", "1", ex=soft_ttl)
+            await pipe.execute()
+    except RedisError as e:
+        mark_redis_unavailable(e)
+
+
+async def _wait_for_value(redis_client: redis.Redis, key: str):
+    deadline = monotonic() + LOCK_WAIT
+    while monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL)
+        cached = await cache_get(redis_client, key)
+        if cached:
+            return cached
+    return None
+
+
+async def _recompute(redis_client: redis.Redis, key: str, loader: Loader, db: AsyncSession,
+                     ttl: int, soft_ttl: int | None):
+    if not await _acquire_lock(redis_client, key):
+        # Ключ уже перераховує інший воркер - чекаємо на його результат
+        cached = await _wait_for_value(redis_client, key)
+        if cached:
+            logger.info("✅ Ключ %s перераховано іншим воркером", key)
+            return cached
+        logger.warning("Не дочекалися перерахунку %s, рахуємо самостійно", key)
+        payload = orjson.dumps(await loader(db))
+        await _store(redis_client, key, payload, ttl, soft_ttl)
+        return payload
+    try:
+        logger.info("⏳ Даних у кеші немає, виконуємо запит до БД (%s)", key)
+        payload = orjson.dumps(await loader(db))
+        await _store(redis_client, key, payload, ttl, soft_ttl)
+        return payload
+    finally:
+        await _release_lock(redis_client, key)
+
+
+async def _single_flight(key: str, compute: Callable[[], Awaitable[Any]]):
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        return await asyncio.shield(inflight)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        data = await compute()
+        future.set_result(data)
+        return data
+    except BaseException as e:
+        future.set_exception(e)
+        # Щоб не було попередження "exception was never retrieved", якщо ніхто не чекав
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+def _schedule_refresh(redis_client: redis.Redis, key: str, loader: Loader, ttl: int, soft_ttl: int):
+    if key in _refreshing:
+        return
+    _refreshing.add(key)
+
+    async def refresh():
+        try:
+            if not await _acquire_lock(redis_client, key):
+                return
+            try:
+                # Сесія запиту вже може бути закрита, тому відкриваємо власну
+                async with AsyncSessionLocal() as db:
+                    payload = orjson.dumps(await loader(db))
+                await _store(redis_client, key, payload, ttl, soft_ttl)
+                logger.info("🔄 Ключ %s оновлено у фоні", key)
+            finally:
+                await _release_lock(redis_client, key)
+        except Exception as e:
+            logger.warning("Фонове оновлення %s не вдалося: %s", key, e)
+        finally:
+            _refreshing.discard(key)
+
+    task = asyncio.create_task(refresh())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def get_or_compute(redis_client: redis.Redis, key: str, loader: Loader, db: AsyncSession,
+                         ttl: int, soft_ttl: int | None = None, name: str = "default"):
+    """
+    Повертає готовий JSON (bytes або str з Redis) з кешу або перераховує його через loader(db).
+    Результат віддається клієнту як є, без json.loads і повторного кодування.
+
+    Одночасні промахи по одному ключу перераховуються лише один раз: у межах процесу
+    через спільний Future, між воркерами - через блокування lock:{key} у Redis.
+    Якщо задано soft_ttl, після його спливання клієнт отримує старі дані, а ключ
+    оновлюється у фоні до настання жорсткого ttl. name - мітка кешу в метриках.
+    """
+    if soft_ttl and redis_available():
+        started = perf_counter()
+        try:
+            cached, fresh = await redis_client.mget(key, f"{key}:fresh")
+        except RedisError as e:
+            mark_redis_unavailable(e)
+            cached, fresh = None, None
+        REDIS_COMMAND_DURATION.labels(command="mget").observe(perf_counter() - started)
+        if cached and not fresh:
+            # Застарілий запис рахується лише як stale, а не ще й як hit
+            CACHE_REQUESTS.labels(cache=name, result="stale").inc()
+            _schedule_refresh(redis_client, key, loader, ttl, soft_ttl)
+            return cached
+    else:
+        cached = await cache_get(redis_client, key)
+
+    if cached:
+        CACHE_REQUESTS.labels(cache=name, result="hit").inc()
+        logger.info("✅ Дані взяті з кешу Redis")
+        return cached
+
+    CACHE_REQUESTS.labels(cache=name, result="miss").inc()
+    return await _single_flight(key, lambda: _recompute(redis_client, key, loader, db, ttl, soft_ttl))
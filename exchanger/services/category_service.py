@@ -0,0 +1,67 @@
+import orjson
+import redis.asyncio as redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import AsyncSessionLocal, CACHE_L1_SIZE, CACHE_L1_TTL, logger
+from ..models.category_model import Category
+from .cache_service import CATEGORIES_SCOPE
+from .redis_client import redis_available
+from .tiered_cache import TieredCache, scope_validators
+
+# Гарячий ключ оновлюється у фоні через 60 секунд, але живе до 10 хвилин
+CATEGORIES_TTL = 600
+CATEGORIES_SOFT_TTL = 60
+
+# Список категорій малий і потрібен майже кожному екрану витрат. L1 воркера тримає і готовий JSON
+# для GET /categories/, і множину id для перевірки category_id; обидва читають з Redis той самий ключ
+categories_cache = TieredCache("categories", CACHE_L1_SIZE, CACHE_L1_TTL)
+category_ids_cache = TieredCache("category_ids", CACHE_L1_SIZE, CACHE_L1_TTL)
+
+
+async def load_categories(db: AsyncSession) -> list[dict]:
+    categories = (await db.execute(select(Category))).scalars().all()
+    logger.info("Знайдено %s категорій", len(categories))
+    return [{"id": c.id, "name": c.name} for c in categories]
+
+
+def categories_key(version: int | None) -> str:
+    return f"categories_list_v{version or 0}"
+
+
+def _decode_ids(payload) -> frozenset[int]:
+    return frozenset(category["id"] for category in orjson.loads(payload))
+
+
+async def get_categories_payload(db: AsyncSession, redis_client: redis.Redis, version: int | None):
+    """Готовий JSON списку категорій для версії version (з conditional_get)."""
+    return await categories_cache.get_or_compute(redis_client, categories_key(version), load_categories, db,
+                                                 ttl=CATEGORIES_TTL, soft_ttl=CATEGORIES_SOFT_TTL)
+
+
+async def get_category_ids(db: AsyncSession, redis_client: redis.Redis) -> frozenset[int]:
+    validators = await scope_validators.get(redis_client, CATEGORIES_SCOPE)
+    version = validators[0] if validators else None
+    return await category_ids_cache.get_or_compute(redis_client, categories_key(version), load_categories, db,
+                                                   ttl=CATEGORIES_TTL, soft_ttl=CATEGORIES_SOFT_TTL,
+                                                   decode=_decode_ids)
+
+
+async def category_exists(db: AsyncSession, redis_client: redis.Redis, category_id: int) -> bool:
+    """
+    Перевірка category_id з L1 без звернень до Redis і БД. Відсутній id перевіряється в БД:
+    категорію могли щойно створити на іншому воркері, і інвалідація сюди ще не дійшла.
+    Без Redis читається один рядок, а не весь список.
+    """
+    if redis_available() and category_id in await get_category_ids(db, redis_client):
+        return True
+    return (await db.execute(select(Category.id).filter(Category.id == category_id))).first() is not None
+
+
+async def warm_categories(redis_client: redis.Redis):
+    """Завантажує категорії в Redis і L1 воркера до першого запиту."""
+    async with AsyncSessionLocal() as db:
+        category_ids = await get_category_ids(db, redis_client)
+        validators = await scope_validators.get(redis_client, CATEGORIES_SCOPE)
+        await get_categories_payload(db, redis_client, validators[0] if validators else None)
+    logger.info("Категорії завантажено в кеш: %s", len(category_ids))
@@ -0,0 +1,215 @@
+import asyncio
+import csv
+import io
+from datetime import date
+from hashlib import blake2b
+from pathlib import Path
+
+import numpy as np
+import orjson
+import redis.asyncio as redis
+from fastapi import HTTPException, status
+from sqlalchemy import inspect, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import AsyncSessionLocal, BASE_CURRENCY, EXCHANGE_RATES_SOURCE, logger
+from ..models.exchange_rate_model import ExchangeRate
+from ..models.expense_rollup_model import ExpenseDailyRollup
+from .rollup_service import build_rollups_statement
+from .user_service import get_user_profile
+
+RATES_CHUNK_SIZE = 1000
+
+
+class ExchangeRateTable:
+    """
+    Курси в пам'яті процесу: для кожної валюти відсортований масив днів і масив курсів до базової валюти.
+    Курс на дату - останній відомий на цю дату (as-of); шукається np.searchsorted одразу для всього масиву днів.
+    """
+
+    def __init__(self, base: str):
+        self.base = base
+        self.version = "0"
+        self._tables: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+    def load(self, rows):
+        """rows - (currency, day, rate), відсортовані за валютою і датою. Таблиця замінюється цілком."""
+        grouped: dict[str, tuple[list, list]] = {}
+        for currency, day, rate in rows:
+            days, rates = grouped.setdefault(currency, ([], []))
+            days.append(day)
+            rates.append(rate)
+        tables = {
+            currency: (np.array(days, dtype="datetime64[D]"), np.array(rates, dtype=np.float64))
+            for currency, (days, rates) in grouped.items()
+        }
+        # Версія курсів входить у ключі кешу і ETag статистики: нові курси - нова відповідь
+        digest = blake2b(digest_size=6)
+        for currency in sorted(tables):
+            days, rates = tables[currency]
+            digest.update(currency.encode())
+            digest.update(days.tobytes())
+            digest.update(rates.tobytes())
+        self._tables = tables
+        self.version = digest.hexdigest()
+
+    @property
+    def currencies(self) -> set[str]:
+        return {self.base, *self._tables}
+
+    def asof(self, currency: str, days: np.ndarray) -> np.ndarray:
+        if currency == self.base:
+            return np.ones(len(days))
+        table = self._tables.get(currency)
+        if table is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail=f"No exchange rates for {currency}")
+        known_days, rates = table
+        # Індекс останнього курсу не пізніше дня; дні до першого відомого курсу беруть перший курс
+        positions = np.searchsorted(known_days, days, side="right") - 1
+        return rates[np.clip(positions, 0, None)]
+
+    def convert(self, amounts: np.ndarray, currencies: np.ndarray, days: np.ndarray, target: str) -> np.ndarray:
+        """
+        Переводить суми у валюту target за курсом їхнього дня. Якщо всі суми вже в target,
+        масив повертається без змін (цілочисельним).
+        """
+        codes, inverse = np.unique(currencies, return_inverse=True)
+        if len(codes) == 1 and codes[0] == target:
+            return amounts
+        factors = np.ones(len(amounts))
+        # Цикл лише за валютами (їх одиниці), всередині - пошук курсів для всіх днів валюти одразу
+        for position, currency in enumerate(codes.tolist()):
+            if currency == target:
+                continue
+            mask = inverse == position
+            factors[mask] = self.asof(currency, days[mask]) / self.asof(target, days[mask])
+        return amounts * factors
+
+
+exchange_rates = ExchangeRateTable(BASE_CURRENCY)
+
+
+def normalize_currency(code: str) -> str:
+    currency = code.strip().upper()
+    if currency not in exchange_rates.currencies:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown currency {code}")
+    return currency
+
+
+async def resolve_currency(db: AsyncSession, redis_client: redis.Redis, user_id: int, currency: str | None) -> str:
+    """Явно задана валюта або валюта користувача з профілю (профіль кешується)."""
+    if currency:
+        return normalize_currency(currency)
+    profile = await get_user_profile(db, redis_client, user_id)
+    return profile["home_currency"] if profile else BASE_CURRENCY
+
+
+def parse_rates(content: str) -> list[dict]:
+    """CSV з колонками date,currency,rate або JSON-масив об'єктів з тими самими ключами."""
+    stripped = content.lstrip()
+    records = orjson.loads(stripped) if stripped.startswith("[") else csv.DictReader(io.StringIO(content))
+    rates = []
+    for record in records:
+        currency = str(record["currency"]).strip().upper()
+        rate = float(record["rate"])
+        if currency == BASE_CURRENCY or rate <= 0:
+            continue
+        rates.append({"currency": currency, "day": date.fromisoformat(str(record["date"]).strip()), "rate": rate})
+    return rates
+
+
+async def read_rates_source(source: str) -> str:
+    if source.startswith(("http://", "https://")):
+        # httpx потрібен лише для джерела-URL, тому не імпортується разом із застосунком
+        import httpx
+
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.get(source)
+                response.raise_for_status()
+                return response.text
+        except httpx.HTTPError as e:
+            raise OSError(str(e)) from e
+    return await asyncio.to_thread(Path(source).read_text, encoding="utf-8")
+
+
+async def store_rates(db: AsyncSession, rates: list[dict]) -> int:
+    """Вставляє або оновлює курси порціями; commit робить викликач."""
+    upsert = (postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert)(ExchangeRate)
+    upsert = upsert.on_conflict_do_update(index_elements=[ExchangeRate.currency, ExchangeRate.day],
+                                          set_={"rate": upsert.excluded.rate})
+    for start in range(0, len(rates), RATES_CHUNK_SIZE):
+        await db.execute(upsert, rates[start:start + RATES_CHUNK_SIZE])
+    return len(rates)
+
+
+async def load_exchange_rates(db: AsyncSession):
+    rows = (await db.execute(
+        select(ExchangeRate.currency, ExchangeRate.day, ExchangeRate.rate).order_by(ExchangeRate.currency, ExchangeRate.day)
+    )).all()
+    exchange_rates.load(rows)
+    logger.info("Завантажено курсів валют: %s (%s валют)", len(rows), len(exchange_rates.currencies) - 1)
+
+
+async def refresh_exchange_rates(source: str = EXCHANGE_RATES_SOURCE):
+    """Імпортує курси з джерела (якщо задане) і перечитує всю таблицю курсів у пам'ять."""
+    async with AsyncSessionLocal() as db:
+        if source:
+            try:
+                stored = await store_rates(db, parse_rates(await read_rates_source(source)))
+                await db.commit()
+                logger.info("Курси валют з %s оновлено: %s записів", source, stored)
+            except (OSError, KeyError, ValueError) as e:
+                await db.rollback()
+                logger.warning("Не вдалося оновити курси з %s: %s", source, e)
+        await load_exchange_rates(db)
+
+
+class ExchangeRateRefresher:
+    """Періодично оновлює курси: кожен воркер тримає власну копію таблиці в пам'яті."""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+
+    async def run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await refresh_exchange_rates()
+            except Exception as e:
+                logger.warning("Фонове оновлення курсів не вдалося: %s", e)
+
+    def start(self, interval: float):
+        self._task = asyncio.create_task(self.run(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+rates_refresher = ExchangeRateRefresher()
+
+
+def ensure_currency_schema(conn: Connection):
+    """
+    Додає колонки валют у таблиці, створені до їх появи (create_all наявні таблиці не змінює).
+    Денні агрегати без валюти перебудовуються з expenses, бо змінився їхній первинний ключ.
+    """
+    inspector = inspect(conn)
+    for table, column in (("expenses", "currency"), ("users", "home_currency")):
+        if column not in {info["name"] for info in inspector.get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} VARCHAR(3) NOT NULL DEFAULT '{BASE_CURRENCY}'"))
+            logger.info("Додано колонку %s.%s", table, column)
+    if "currency" not in {info["name"] for info in inspector.get_columns(ExpenseDailyRollup.__tablename__)}:
+        ExpenseDailyRollup.__table__.drop(conn)
+        ExpenseDailyRollup.__table__.create(conn)
+        conn.execute(build_rollups_statement())
+        logger.info("Денні агрегати перебудовано з валютами")
@@ -0,0 +1,179 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import DISTRIBUTION_CACHE_SIZE, DISTRIBUTION_CACHE_TTL, logger
+from ..models.expense_model import Expense
+from ..models.expense_archive_model import ArchivedExpense
+from .archive_service import archive_boundary
+from .cache_service import LocalLRUCache
+from .currency_service import exchange_rates
+from .metrics_service import CACHE_REQUESTS
+
+MAX_DISTRIBUTION_DAYS = 1000
+PERCENTILES = (25, 50, 75, 90, 99)
+OUTLIERS_LIMIT = 10
+SNAPSHOT_BATCH_SIZE = 50_000
+# 1970-01-01 - четвер, тож день тижня (0 - понеділок) = (дні від епохи + 3) % 7
+EPOCH_WEEKDAY = 3
+
+
+@dataclass(frozen=True)
+class ExpenseSnapshot:
+    """Колонки всіх витрат користувача, впорядковані за датою; суми вже у валюті currency."""
+    currency: str
+    ids: np.ndarray
+    days: np.ndarray
+    category_ids: np.ndarray
+    amounts: np.ndarray
+
+    @property
+    def converted(self) -> bool:
+        return self.amounts.dtype.kind == "f"
+
+
+# Знімки в пам'яті процесу; ключ містить версію даних користувача і версію курсів
+snapshot_cache = LocalLRUCache(DISTRIBUTION_CACHE_SIZE, DISTRIBUTION_CACHE_TTL)
+
+
+def _epoch_days(dialect_name: str, day=Expense.created_at):
+    # Дата як ціле число днів від 1970-01-01: NumPy перетворює його на datetime64 без розбору рядків
+    if dialect_name == "postgresql":
+        return cast(day - date(1970, 1, 1), Integer)
+    return cast(func.julianday(day) - 2440587.5, Integer)
+
+
+def _snapshot_query(dialect_name: str, model, user_id: int, *filters):
+    return (
+        select(model.id, _epoch_days(dialect_name, model.created_at), model.category_id, model.amount, model.currency)
+        .filter(model.user_id == user_id, *filters)
+        .order_by(model.created_at, model.id)
+        .execution_options(yield_per=SNAPSHOT_BATCH_SIZE)
+    )
+
+
+async def _snapshot_rows(db: AsyncSession, user_id: int):
+    # Архівні витрати старші за гарячі, тож архів, прочитаний першим, зберігає порядок за датою
+    dialect_name = db.bind.dialect.name
+    cutoff = await archive_boundary.get(db)
+    if cutoff is None:
+        queries = [_snapshot_query(dialect_name, Expense, user_id)]
+    else:
+        queries = [_snapshot_query(dialect_name, ArchivedExpense, user_id, ArchivedExpense.created_at < cutoff),
+                   _snapshot_query(dialect_name, Expense, user_id, Expense.created_at >= cutoff)]
+    for query in queries:
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield rows
+
+
+async def load_snapshot(db: AsyncSession, user_id: int, currency: str) -> ExpenseSnapshot:
+    """
+    Витрати користувача (гарячі й архівні), прочитані порціями по SNAPSHOT_BATCH_SIZE:
+    у пам'яті одночасно лише одна порція рядків, решта вже в масивах NumPy.
+    """
+    columns = ([], [], [], [])
+    async for rows in _snapshot_rows(db, user_id):
+        ids, days, category_ids, amounts, currencies = zip(*rows)
+        days = np.array(days, dtype=np.int64).astype("datetime64[D]")
+        amounts = np.array(amounts, dtype=np.int64)
+        # Зазвичай усі витрати в одній валюті - тоді рядки валют у масив не переводяться
+        if set(currencies) - {currency}:
+            amounts = exchange_rates.convert(amounts, np.array(currencies), days, currency)
+        for column, values in zip(columns, (np.array(ids, dtype=np.int64), days,
+                                            np.array(category_ids, dtype=np.int64), amounts)):
+            column.append(values)
+    if not columns[0]:
+        return ExpenseSnapshot(currency, np.zeros(0, dtype=np.int64), np.zeros(0, dtype="datetime64[D]"),
+                               np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    # Якщо хоч одну порцію сконвертовано, concatenate приводить усі суми до float
+    return ExpenseSnapshot(currency, *(np.concatenate(column) for column in columns))
+
+
+async def get_snapshot(db: AsyncSession, user_id: int, currency: str, version: int | None) -> ExpenseSnapshot:
+    """
+    Знімок з кешу процесу за версією даних користувача. Без версії (Redis недоступний)
+    знімок не кешується, бо неможливо дізнатися, чи він ще актуальний.
+    """
+    if version is None:
+        CACHE_REQUESTS.labels(cache="distribution", result="bypass").inc()
+        return await load_snapshot(db, user_id, currency)
+    key = f"{user_id}:{currency}:r{exchange_rates.version}:v{version}"
+    snapshot = snapshot_cache.get(key)
+    if snapshot is not None:
+        CACHE_REQUESTS.labels(cache="distribution", result="hit").inc()
+        return snapshot
+    CACHE_REQUESTS.labels(cache="distribution", result="miss").inc()
+    snapshot = await load_snapshot(db, user_id, currency)
+    logger.info("Знімок витрат користувача %s завантажено: %s рядків", user_id, len(snapshot.ids))
+    snapshot_cache.set(key, snapshot)
+    return snapshot
+
+
+def _values(values: np.ndarray, converted: bool) -> list:
+    # Без конвертації суми лишаються цілими, сконвертовані округлюються до копійок
+    return np.round(values, 2).tolist() if converted else values.astype(np.int64).tolist()
+
+
+def compute_distribution(snapshot: ExpenseSnapshot, start_date: date, end_date: date,
+                         category_id: int | None = None, window: int = 7) -> dict:
+    """Перцентилі, ковзне середнє за днями, профіль за днями тижня і викиди за період - над масивами знімка."""
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    day_count = (end_date - start_date).days + 1
+    if day_count > MAX_DISTRIBUTION_DAYS:
+        raise HTTPException(status_code=400, detail=f"Too many days, maximum is {MAX_DISTRIBUTION_DAYS}")
+
+    # Знімок відсортований за датою, тож період - це суцільний зріз, знайдений бінарним пошуком
+    first, last = np.searchsorted(snapshot.days, np.array([start_date, end_date + timedelta(days=1)],
+                                                          dtype="datetime64[D]"))
+    ids = snapshot.ids[first:last]
+    days = snapshot.days[first:last]
+    amounts = snapshot.amounts[first:last]
+    category_ids = snapshot.category_ids[first:last]
+    if category_id is not None:
+        mask = category_ids == category_id
+        ids, days, amounts, category_ids = ids[mask], days[mask], amounts[mask], category_ids[mask]
+
+    converted = snapshot.converted
+    offsets = (days - np.datetime64(start_date, "D")).astype(np.int64)
+    daily_totals = np.bincount(offsets, weights=amounts, minlength=day_count)
+    # Ковзне середнє за window днів через кумулятивну суму; перші дні усереднюються за наявною історією
+    cumulative = np.cumsum(daily_totals)
+    shifted = np.concatenate((np.zeros(window), cumulative[:-window])) if window < day_count else np.zeros(day_count)
+    moving_average = (cumulative - shifted) / np.minimum(np.arange(1, day_count + 1), window)
+
+    weekdays = (days.astype(np.int64) + EPOCH_WEEKDAY) % 7
+    payload = {
+        "count": int(len(amounts)),
+        "total": _values(amounts.sum(keepdims=True), converted)[0],
+        "days": [start_date + timedelta(days=offset) for offset in range(day_count)],
+        "daily_totals": _values(daily_totals, converted),
+        "moving_average": np.round(moving_average, 2).tolist(),
+        "weekday_totals": _values(np.bincount(weekdays, weights=amounts, minlength=7), converted),
+        "weekday_counts": np.bincount(weekdays, minlength=7).tolist(),
+        "mean": None,
+        "percentiles": {},
+        "outliers": [],
+    }
+    if not len(amounts):
+        return payload
+
+    quantiles = np.percentile(amounts, PERCENTILES)
+    payload["mean"] = round(float(amounts.mean()), 2)
+    payload["percentiles"] = {f"p{p}": round(float(value), 2) for p, value in zip(PERCENTILES, quantiles)}
+    # Викиди за правилом IQR: більше за p75 + 1.5 * (p75 - p25); повертаються найбільші
+    p25, p75 = quantiles[0], quantiles[2]
+    outliers = np.flatnonzero(amounts > p75 + 1.5 * (p75 - p25))
+    outliers = outliers[np.argsort(amounts[outliers], kind="stable")[::-1][:OUTLIERS_LIMIT]]
+    payload["outliers"] = [
+        {"id": expense_id, "created_at": day, "category_id": category, "amount": amount}
+        for expense_id, day, category, amount in zip(
+            ids[outliers].tolist(), days[outliers].tolist(), category_ids[outliers].tolist(),
+            _values(amounts[outliers], converted))
+    ]
+    return payload
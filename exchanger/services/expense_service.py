@@ -0,0 +1,197 @@
+import base64
+import csv
+import io
+import json
+import zlib
+from datetime import date
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import AsyncSessionLocal, CACHE_L1_SIZE, CACHE_L1_TTL, logger
+from ..models.expense_model import Expense
+from ..models.expense_archive_model import ArchivedExpense
+from .archive_service import archive_boundary, is_archived, is_read_only
+from .rollup_service import apply_expense_delta
+from .tiered_cache import TieredCache
+
+
+def expense_columns(model=Expense) -> tuple:
+    return model.id, model.amount, model.currency, model.description, model.category_id, model.created_at
+
+
+# Стовпці, які віддає список витрат (без завантаження ORM-об'єктів)
+EXPENSE_COLUMNS = expense_columns(Expense)
+
+STREAM_BATCH_SIZE = 1000
+
+# Сторінки списку витрат (готовий JSON) у L1 воркера перед Redis; ключ містить версію даних користувача
+expenses_cache = TieredCache("expenses", CACHE_L1_SIZE, CACHE_L1_TTL)
+
+
+def encode_cursor(created_at: date, expense_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), expense_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[date, int]:
+    try:
+        created_at, expense_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(created_at), int(expense_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def expense_to_dict(row) -> dict:
+    return {
+        "id": row.id,
+        "amount": row.amount,
+        "currency": row.currency,
+        "description": row.description,
+        "category_id": row.category_id,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+async def insert_expense(db: AsyncSession, user_id: int, category_id: int, amount: int, currency: str,
+                         description: str) -> Expense:
+    """Додає витрату і оновлює денний агрегат у поточній транзакції; commit робить викликач."""
+    # Дати задаються явно, щоб об'єкт не треба було перечитувати після commit
+    today = date.today()
+    new_expense = Expense(amount=amount, currency=currency, description=description, category_id=category_id,
+                          user_id=user_id, created_at=today, updated_at=today)
+    db.add(new_expense)
+    await db.flush()
+    await apply_expense_delta(db, user_id, today, category_id, currency, amount, 1)
+    return new_expense
+
+
+async def get_mutable_expense(db: AsyncSession, user_id: int, expense_id: int) -> Expense:
+    exists_expense = (await db.execute(select(Expense).filter(Expense.id == expense_id, Expense.user_id == user_id))).scalars().first()
+    # Архівні витрати (і вже скопійовані в архів поточним запуском) лише для читання
+    if (exists_expense and await is_read_only(db, exists_expense)) or \
+            (not exists_expense and await is_archived(db, user_id, expense_id)):
+        logger.warning("Витрата ID %s в архіві", expense_id)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Archived expenses are read-only")
+    if not exists_expense:
+        logger.warning("Витрата ID %s не знайдена", expense_id)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expense not found")
+    return exists_expense
+
+
+async def update_expense_values(db: AsyncSession, expense: Expense, category_id: int, amount: int, currency: str,
+                                description: str):
+    """Змінює витрату і денні агрегати в поточній транзакції; commit робить викликач."""
+    # Старе значення віднімаємо з агрегатів, нове додаємо
+    await apply_expense_delta(db, expense.user_id, expense.created_at, expense.category_id, expense.currency,
+                              -expense.amount, -1)
+    expense.amount = amount
+    expense.currency = currency
+    expense.description = description
+    expense.category_id = category_id
+    await apply_expense_delta(db, expense.user_id, expense.created_at, expense.category_id, expense.currency,
+                              expense.amount, 1)
+
+
+async def delete_expense_row(db: AsyncSession, expense: Expense):
+    """Видаляє витрату і віднімає її з денних агрегатів; commit робить викликач."""
+    await apply_expense_delta(db, expense.user_id, expense.created_at, expense.category_id, expense.currency,
+                              -expense.amount, -1)
+    await db.delete(expense)
+
+
+def build_expenses_query(user_id: int, cursor: str | None = None, category_id: int | None = None,
+                         date_from: date | None = None, date_to: date | None = None, model=Expense):
+    """Запит витрат від нових до старих; курсор - (created_at, id) останнього рядка попередньої сторінки."""
+    query = select(*expense_columns(model)).filter(model.user_id == user_id)
+    if category_id is not None:
+        query = query.filter(model.category_id == category_id)
+    if date_from is not None:
+        query = query.filter(model.created_at >= date_from)
+    if date_to is not None:
+        query = query.filter(model.created_at <= date_to)
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.created_at < cursor_date,
+            and_(model.created_at == cursor_date, model.id < cursor_id),
+        ))
+    return query.order_by(model.created_at.desc(), model.id.desc())
+
+
+async def build_tiered_queries(db: AsyncSession, user_id: int, **filters) -> list:
+    """
+    Запити до гарячої таблиці й архіву в порядку від нових витрат до старих. Архівний запит додається,
+    лише якщо діапазон сягає межі архіву; усі архівні витрати старші за гарячі, тож курсор спільний.
+    """
+    cutoff = await archive_boundary.get(db)
+    if cutoff is None:
+        return [build_expenses_query(user_id, **filters)]
+    queries = []
+    date_from, date_to = filters.get("date_from"), filters.get("date_to")
+    if date_to is None or date_to >= cutoff:
+        # До видалення перенесених рядків вони є в обох таблицях - гаряча читається лише від межі
+        queries.append(build_expenses_query(user_id, **filters).filter(Expense.created_at >= cutoff))
+    if date_from is None or date_from < cutoff:
+        queries.append(build_expenses_query(user_id, model=ArchivedExpense, **filters)
+                       .filter(ArchivedExpense.created_at < cutoff))
+    return queries
+
+
+async def get_expenses_page(db: AsyncSession, user_id: int, limit: int, **filters) -> dict:
+    # Беремо на один рядок більше, щоб знати, чи є наступна сторінка; архів читається,
+    # лише якщо гарячих рядків не вистачило на сторінку
+    rows = []
+    for query in await build_tiered_queries(db, user_id, **filters):
+        rows += (await db.execute(query.limit(limit + 1 - len(rows)))).all()
+        if len(rows) > limit:
+            break
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return {"items": [expense_to_dict(row) for row in rows], "next_cursor": next_cursor}
+
+
+EXPORT_FIELDS = ("id", "amount", "currency", "description", "category_id", "created_at")
+
+
+def _format_ndjson(rows) -> str:
+    return "".join(json.dumps(expense_to_dict(row)) + "\n" for row in rows)
+
+
+def _format_csv(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows((row.id, row.amount, row.currency, row.description, row.category_id, row.created_at)
+                     for row in rows)
+    return buffer.getvalue()
+
+
+async def stream_expenses(user_id: int, filters: dict, fmt: str = "ndjson"):
+    """
+    Генератор рядків NDJSON або CSV. Рядки читаються порціями по STREAM_BATCH_SIZE
+    (серверний курсор для Postgres), і кожна порція одразу віддається клієнту,
+    тому в пам'яті ніколи не тримається весь результат. Після гарячих витрат ідуть архівні.
+    Сесія відкривається тут, бо сесія запиту закривається ще до початку стрімінгу.
+    """
+    if fmt == "csv":
+        yield _format_csv([], header=True)
+    async with AsyncSessionLocal() as db:
+        for query in await build_tiered_queries(db, user_id, **filters):
+            result = await db.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield _format_csv(rows) if fmt == "csv" else _format_ndjson(rows)
+
+
+async def gzip_stream(chunks):
+    """Стискає потік на льоту у формат gzip."""
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk.encode())
+        if compressed:
+            yield compressed
+    yield compressor.flush()
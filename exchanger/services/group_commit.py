@@ -0,0 +1,101 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import AsyncSessionLocal, GROUP_COMMIT_WINDOW_MS, GROUP_COMMIT_MAX_BATCH, logger
+from .metrics_service import GROUP_COMMIT_BATCH_SIZE
+
+WriteOp = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class GroupCommitWriter:
+    """
+    Один писач, який об'єднує дрібні записи, що надійшли протягом window секунд,
+    в одну транзакцію: замість fsync на кожен запит - один commit на пачку.
+    Кожен submit отримує свій результат або свою помилку, як і при окремому commit:
+    якщо пачка не записалася, записи повторюються поодинці.
+    """
+
+    def __init__(self, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def submit(self, op: WriteOp):
+        """Виконує op(db) і повертає її результат після commit."""
+        if not self.running:
+            # Писач не запущений (поза lifespan або вимкнений) - звичайна окрема транзакція
+            async with AsyncSessionLocal() as db:
+                result = await op(db)
+                await db.commit()
+                return result
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((op, future))
+        return await future
+
+    async def _commit(self, batch: list[tuple[WriteOp, asyncio.Future]]):
+        try:
+            async with AsyncSessionLocal() as db:
+                results = [await op(db) for op, _ in batch]
+                await db.commit()
+        except Exception as e:
+            if len(batch) == 1:
+                future = batch[0][1]
+                if not future.done():
+                    future.set_exception(e)
+                return
+            logger.warning("Групова транзакція з %s записів не вдалася (%r), записуємо поодинці", len(batch), e)
+            for item in batch:
+                await self._commit([item])
+            return
+        GROUP_COMMIT_BATCH_SIZE.observe(len(batch))
+        for (_, future), result in zip(batch, results):
+            # Клієнт міг відключитися, поки пачка записувалася
+            if not future.done():
+                future.set_result(result)
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            if self._queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.window)
+            stopping = False
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._commit(batch)
+            if stopping:
+                return
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Груповий писач запущено: вікно %.1f мс, до %s записів", self.window * 1000, self.max_batch)
+
+    async def stop(self):
+        """Дописує все, що вже в черзі, і зупиняє писача."""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+        # Записи, що встигли потрапити в чергу після сигналу зупинки
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                await self._commit([item])
+
+
+expense_writer = GroupCommitWriter(GROUP_COMMIT_WINDOW_MS / 1000, GROUP_COMMIT_MAX_BATCH)
@@ -0,0 +1,53 @@
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+
+import redis.asyncio as redis
+from fastapi import Request, status
+from fastapi.responses import Response
+
+from .tiered_cache import scope_validators
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(":".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    # If-None-Match має пріоритет над If-Modified-Since (RFC 9110, 13.2.2)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def conditional_get(request: Request, redis_client: redis.Redis, scope: str,
+                          *variant) -> tuple[int | None, dict, Response | None]:
+    """
+    Умовний GET за версією даних області scope. Повертає (версію, заголовки валідаторів, відповідь 304).
+    Відповідь 304 не None, якщо клієнт уже має актуальну копію - тоді ні БД, ні кеш даних не потрібні.
+    variant - усе, від чого ще залежить тіло відповіді (параметри запиту, межі періоду).
+    Без Redis версія невідома, тому заголовки не видаються і запит обробляється повністю.
+    Версія береться з L1 воркера, тож на 304 не потрібен навіть Redis.
+    """
+    validators = await scope_validators.get(redis_client, scope)
+    if validators is None:
+        return None, {}, None
+    version, last_modified = validators
+    etag = make_etag(scope, version, last_modified, *variant)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        # Клієнт може зберігати відповідь, але має перевіряти її при кожному запиті
+        "Cache-Control": "private, no-cache",
+    }
+    if is_not_modified(request, etag, last_modified):
+        return version, headers, Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return version, headers, None
@@ -0,0 +1,260 @@
+import asyncio
+from datetime import date
+from time import monotonic
+from typing import AsyncIterator
+
+import numpy as np
+import orjson
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from ..dependencies import AsyncSessionLocal, SSE_BUFFER_SIZE, SSE_HEARTBEAT_SECONDS, SSE_RESYNC_SECONDS, logger
+from .analytics_service import calculate_date_range, get_expenses_summary_for_user
+from .cache_service import bump_version, get_version, user_scope
+from .currency_service import exchange_rates, resolve_currency
+from .expense_service import expense_to_dict
+from .metrics_service import SSE_BUFFER_OVERFLOWS, SSE_CONNECTIONS, SSE_EVENTS
+from .pubsub_service import subscriber
+from .redis_client import mark_redis_unavailable
+from .rollup_service import as_day
+
+# Канал подій користувача; воркер підписується на всі одним PSUBSCRIBE
+CHANNEL_PREFIX = "live:user:"
+# Скільки разів перечитати підсумки, якщо під час читання дані змінилися
+LOAD_ATTEMPTS = 3
+
+
+def expense_delta(expense, sign: int) -> list:
+    """Зміна денного агрегату від витрати: [день, категорія, валюта, сума, кількість]; sign=-1 - відняти."""
+    return [as_day(expense.created_at).isoformat(), expense.category_id, expense.currency, sign * expense.amount, sign]
+
+
+def expense_event(kind: str, expense, deltas: list | None) -> dict:
+    """Подія зміни витрати; знімок береться до commit, поки об'єкт ще в сесії."""
+    return {"type": kind, "expense": expense_to_dict(expense), "deltas": deltas}
+
+
+async def publish_expense_changes(redis_client: redis.Redis, user_id: int, events: list[dict]):
+    """
+    Після commit: інвалідує кеш користувача (одна нова версія на всі події) і публікує події
+    для SSE-з'єднань усіх воркерів. Подія з deltas=None змушує з'єднання перечитати підсумки.
+    Без Redis події доходять лише до з'єднань цього воркера.
+    """
+    version = await bump_version(redis_client, user_scope(user_id))
+    message = {"version": version, "events": events}
+    if version is not None:
+        try:
+            await redis_client.publish(f"{CHANNEL_PREFIX}{user_id}", orjson.dumps(message))
+            return
+        except RedisError as e:
+            mark_redis_unavailable(e)
+    live_hub.dispatch(user_id, message)
+
+
+class LiveListener:
+    """Одне SSE-з'єднання: обмежена черга повідомлень і прапорець, що підсумки треба перечитати."""
+
+    def __init__(self, user_id: int, buffer_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(buffer_size)
+        self.stale = False
+        self.closed = False
+
+    def push(self, message: dict | None):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Повільний клієнт: буфер не росте, пропущені події заміняє повний перерахунок підсумків
+            if not self.stale:
+                SSE_BUFFER_OVERFLOWS.inc()
+            self.stale = True
+
+    def mark_stale(self):
+        self.stale = True
+        self.push(None)
+
+    def close(self):
+        self.closed = True
+        self.push(None)
+
+    def drain(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.stale = False
+
+
+class LiveHub:
+    """
+    Розсилає повідомлення pub/sub SSE-з'єднанням цього воркера. Підписка Redis одна на процес
+    (спільна з інвалідацією кешів), скільки б не було з'єднань; повідомлення декодується один раз
+    і лише тоді, коли в цьому воркері є з'єднання користувача. Після розриву підписки всі з'єднання
+    перечитують підсумки.
+    """
+
+    def __init__(self, buffer_size: int):
+        self.buffer_size = buffer_size
+        self.connections = 0
+        self._listeners: dict[int, set[LiveListener]] = {}
+
+    def subscribe(self, user_id: int) -> LiveListener:
+        listener = LiveListener(user_id, self.buffer_size)
+        self._listeners.setdefault(user_id, set()).add(listener)
+        self.connections += 1
+        SSE_CONNECTIONS.inc()
+        return listener
+
+    def unsubscribe(self, listener: LiveListener):
+        listeners = self._listeners.get(listener.user_id)
+        if listeners is None or listener not in listeners:
+            return
+        listeners.discard(listener)
+        if not listeners:
+            del self._listeners[listener.user_id]
+        self.connections -= 1
+        SSE_CONNECTIONS.dec()
+
+    def dispatch(self, user_id: int, message: dict):
+        for listener in self._listeners.get(user_id, ()):
+            listener.push(message)
+
+    def _mark_all_stale(self):
+        for listeners in self._listeners.values():
+            for listener in listeners:
+                listener.mark_stale()
+
+    def _on_message(self, channel: str, data: str):
+        user_id = int(channel[len(CHANNEL_PREFIX):])
+        if user_id in self._listeners:
+            self.dispatch(user_id, orjson.loads(data))
+
+    def start(self):
+        """Реєструє канали у спільній підписці воркера; викликається до subscriber.start()."""
+        # Події, опубліковані до підписки (або під час розриву), загублені - з'єднання перечитують підсумки
+        subscriber.psubscribe(f"{CHANNEL_PREFIX}*", self._on_message, on_reset=self._mark_all_stale)
+        logger.info("Розсилку живих оновлень запущено")
+
+    def stop(self):
+        """Закриває всі потоки, щоб сервер не чекав їх при зупинці."""
+        for listeners in self._listeners.values():
+            for listener in listeners:
+                listener.close()
+
+
+live_hub = LiveHub(SSE_BUFFER_SIZE)
+
+
+class PeriodTotals:
+    """
+    Підсумок витрат користувача за період (day/week/month/year) для одного потоку.
+    Після першого читання агрегатів оновлюється дельтами з подій: кожна подія несе версію даних
+    користувача, тож уже враховані події пропускаються, а пропуск версії означає повний перерахунок.
+    """
+
+    def __init__(self, user_id: int, period: str, currency: str | None):
+        self.user_id = user_id
+        self.period = period
+        self.requested_currency = currency
+        self.currency: str | None = None
+        self.start_date: date | None = None
+        self.end_date: date | None = None
+        self.total: int | float = 0
+        self.version: int | None = None
+        self.loaded_at = 0.0
+        self.dirty = False
+
+    async def load(self, redis_client: redis.Redis):
+        async with AsyncSessionLocal() as db:
+            for _ in range(LOAD_ATTEMPTS):
+                version = await get_version(redis_client, user_scope(self.user_id))
+                self.start_date, self.end_date = calculate_date_range(self.period)
+                self.currency = await resolve_currency(db, redis_client, self.user_id, self.requested_currency)
+                summary = await get_expenses_summary_for_user(db, self.user_id, self.start_date, self.end_date,
+                                                              self.currency)
+                # Версія не змінилася за час читання - підсумок відповідає саме їй
+                if await get_version(redis_client, user_scope(self.user_id)) == version:
+                    break
+        self.total = summary["total_amount"]
+        self.version = version
+        self.loaded_at = monotonic()
+        self.dirty = False
+
+    def needs_reload(self) -> bool:
+        # Новий день, тиждень чи місяць; або підсумок давно оновлюється лише дельтами
+        return (calculate_date_range(self.period) != (self.start_date, self.end_date) or
+                (self.dirty and monotonic() - self.loaded_at > SSE_RESYNC_SECONDS))
+
+    def apply(self, message: dict) -> bool | None:
+        """Додає дельти повідомлення. False - вже враховано, None - потрібен повний перерахунок."""
+        version = message["version"]
+        if version is not None and self.version is not None:
+            if version <= self.version:
+                return False
+            if version != self.version + 1:
+                return None
+        if version is not None:
+            self.version = version
+        deltas = []
+        for event in message["events"]:
+            if event["deltas"] is None:
+                return None
+            deltas += event["deltas"]
+        start, end = self.start_date.isoformat(), self.end_date.isoformat()
+        deltas = [delta for delta in deltas if start <= delta[0] <= end]
+        if deltas:
+            days, _, currencies, amounts, _ = zip(*deltas)
+            converted = exchange_rates.convert(np.array(amounts, dtype=np.int64), np.array(currencies),
+                                               np.array(days, dtype="datetime64[D]"), self.currency).sum()
+            self.total += int(converted) if converted.dtype.kind == "i" else float(converted)
+            self.dirty = True
+        return True
+
+    def payload(self) -> dict:
+        total = self.total if isinstance(self.total, int) else round(self.total, 2)
+        return {"period": self.period, "start_date": self.start_date, "end_date": self.end_date,
+                "currency": self.currency, "summary": {"total_amount": total}}
+
+
+def _sse(event: str, data: dict, version: int | None) -> bytes:
+    SSE_EVENTS.labels(event=event).inc()
+    event_id = b"" if version is None else b"id: %d\n" % version
+    return b"event: " + event.encode() + b"\n" + event_id + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+async def live_stream(redis_client: redis.Redis, user_id: int, period: str,
+                      currency: str | None) -> AsyncIterator[bytes]:
+    """
+    Потік SSE: спершу підсумок періоду, далі події змін витрат і оновлені підсумки.
+    Слухач реєструється до першого читання підсумків, тож зміни під час читання не губляться.
+    Поки змін немає, раз на SSE_HEARTBEAT_SECONDS надсилається коментар, щоб проксі не закрили з'єднання.
+    """
+    listener = live_hub.subscribe(user_id)
+    totals = PeriodTotals(user_id, period, currency)
+    try:
+        await totals.load(redis_client)
+        yield b"retry: 5000\n\n" + _sse("summary", totals.payload(), totals.version)
+        while not listener.closed:
+            try:
+                message = await asyncio.wait_for(listener.queue.get(), SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                message = None
+            if listener.closed:
+                break
+            if listener.stale or totals.needs_reload():
+                listener.drain()
+                await totals.load(redis_client)
+                yield _sse("summary", totals.payload(), totals.version)
+                continue
+            if message is None:
+                yield b": ping\n\n"
+                continue
+            applied = totals.apply(message)
+            if applied is None:
+                await totals.load(redis_client)
+            elif not applied:
+                continue
+            for event in message["events"]:
+                yield _sse("expense", {key: value for key, value in event.items() if key != "deltas"},
+                           message["version"])
+            yield _sse("summary", totals.payload(), totals.version)
+    finally:
+        live_hub.unsubscribe(listener)
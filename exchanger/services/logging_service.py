@@ -0,0 +1,147 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Контекст поточного запиту. Заповнюється в middleware і копіюється в задачі, які створює запит
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+route_var: ContextVar[str | None] = ContextVar("route", default=None)
+# Чи потрапив запит у вибірку: якщо ні, INFO/DEBUG-записи цього запиту відкидаються
+sampled_var: ContextVar[bool] = ContextVar("sampled", default=True)
+
+ACCESS_LOGGER = "access"
+
+_listener: QueueListener | None = None
+_sample_rates: dict[str, float] = {}
+_route_levels: dict[str, int] = {}
+_default_sample_rate = 1.0
+
+# Стандартні атрибути LogRecord, які не потрапляють у JSON як додаткові поля
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Один JSON-рядок на запис; поля з extra={...} додаються як є."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and value is not None:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Працює в потоці, що логує (до черги): додає request_id і route, застосовує
+    рівень маршруту і вибірку. Попередження та помилки не відкидаються ніколи.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        route = route_var.get()
+        record.request_id = request_id_var.get()
+        record.route = route
+        if record.levelno >= logging.WARNING:
+            return True
+        if route is not None and record.levelno < _route_levels.get(route, logging.NOTSET):
+            return False
+        return sampled_var.get()
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Не форматує запис у потоці запиту - це робить JsonFormatter у потоці слухача."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_route_mapping(value: str, cast) -> dict:
+    """Розбирає рядок виду "/categories/=0.01,/expenses/=0.1"."""
+    mapping = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, setting = item.rpartition("=")
+        mapping[route] = cast(setting)
+    return mapping
+
+
+def setup_logging(level: str = "INFO", log_format: str = "json", default_sample_rate: float = 1.0,
+                  sample_rates: dict[str, float] | None = None, route_levels: dict[str, str] | None = None):
+    """
+    Логи пишуться в чергу, а форматування і запис у stdout виконує окремий потік QueueListener,
+    тому запит не чекає на stdout.
+    """
+    global _listener, _default_sample_rate, _sample_rates, _route_levels
+    _default_sample_rate = default_sample_rate
+    _sample_rates = dict(sample_rates or {})
+    _route_levels = {route: logging.getLevelName(name.upper()) for route, name in (route_levels or {}).items()}
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level.upper())
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Дописує все, що лишилося в черзі."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def should_sample(route: str | None) -> bool:
+    rate = _sample_rates.get(route, _default_sample_rate)
+    return rate >= 1.0 or random.random() < rate
+
+
+def bind_request_context(request_id: str, route: str | None) -> tuple:
+    return (
+        request_id_var.set(request_id),
+        route_var.set(route),
+        sampled_var.set(should_sample(route)),
+    )
+
+
+def reset_request_context(tokens: tuple):
+    request_id_token, route_token, sampled_token = tokens
+    request_id_var.reset(request_id_token)
+    route_var.reset(route_token)
+    sampled_var.reset(sampled_token)
+
+
+def log_request(method: str, route: str | None, status: int, duration: float, error: str | None = None):
+    """Один запис доступу на запит. Помилки сервера завжди, клієнтські - як WARNING, решта - за вибіркою."""
+    level = logging.ERROR if status >= 500 else logging.WARNING if status >= 400 else logging.INFO
+    logging.getLogger(ACCESS_LOGGER).log(
+        level,
+        "%s %s %s",
+        method, route, status,
+        extra={"method": method, "status": status, "duration_ms": round(duration * 1000, 2), "error": error},
+    )
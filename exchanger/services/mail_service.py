@@ -0,0 +1,278 @@
+import asyncio
+import json
+import os
+import smtplib
+import uuid
+from email.message import EmailMessage
+from time import time
+from typing import TYPE_CHECKING
+
+import redis.asyncio as redis
+from fastapi import BackgroundTasks
+from redis.exceptions import RedisError
+
+from ..dependencies import (
+    EMAIL_ADDRESS,
+    EMAIL_PASSWORD,
+    SMTP_HOST,
+    SMTP_PORT,
+    SMTP_USE_SSL,
+    SMTP_TIMEOUT,
+    APP_BASE_URL,
+    REDIS_URL,
+    MAIL_BATCH_SIZE,
+    MAIL_MAX_RETRIES,
+    MAIL_RETRY_BACKOFF,
+    MAIL_WORKER_TTL,
+    logger,
+)
+from .redis_client import redis_available, mark_redis_unavailable
+
+if TYPE_CHECKING:
+    from jinja2 import Template
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
+
+# Черга листів у Redis (AOF робить її стійкою до перезапуску), відкладені повтори і листи, що вичерпали спроби
+MAIL_QUEUE_KEY = "mail:queue"
+MAIL_RETRY_KEY = "mail:retry"
+MAIL_DEAD_KEY = "mail:dead"
+# Листи, які воркер забрав і ще надсилає: зникають звідси лише після відправки або переносу в повтори.
+# Список воркера, чий heartbeat прострочено (воркер упав), інші воркери повертають у чергу
+MAIL_PROCESSING_PREFIX = "mail:processing:"
+MAIL_HEARTBEAT_PREFIX = "mail:heartbeat:"
+MAIL_WORKERS_KEY = "mail:workers"
+
+_verification_template: "Template | None" = None
+
+
+def get_verification_template() -> "Template":
+    """Шаблон компілюється один раз на процес - під час прогріву воркера; Jinja імпортується тоді ж."""
+    global _verification_template
+    if _verification_template is None:
+        from jinja2 import Environment, FileSystemLoader
+
+        _verification_template = Environment(loader=FileSystemLoader(TEMPLATES_DIR)).get_template("email_verify.html")
+    return _verification_template
+
+
+def build_verification_message(email: str, token: str) -> dict:
+    verification_link = f"{APP_BASE_URL}/auth/verify/{token}"
+    return {
+        "to": email,
+        "subject": "Email Verify",
+        "html": get_verification_template().render(verification_link=verification_link),
+        "attempts": 0,
+    }
+
+
+def _to_email_message(message: dict) -> EmailMessage:
+    msg = EmailMessage()
+    msg['Subject'] = message["subject"]
+    msg['From'] = EMAIL_ADDRESS
+    msg['To'] = message["to"]
+    msg.set_content("This email requires an HTML-compatible email client.")
+    msg.add_alternative(message["html"], subtype="html")
+    return msg
+
+
+def _open_smtp() -> smtplib.SMTP:
+    smtp_class = smtplib.SMTP_SSL if SMTP_USE_SSL else smtplib.SMTP
+    smtp = smtp_class(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    if EMAIL_ADDRESS and EMAIL_PASSWORD:
+        smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+    return smtp
+
+
+def send_message_now(message: dict):
+    """Пряме надсилання одного листа - запасний шлях, коли черга недоступна."""
+    with _open_smtp() as smtp:
+        smtp.send_message(_to_email_message(message))
+
+
+def send_verification_email(email: str, token: str):
+    send_message_now(build_verification_message(email, token))
+
+
+async def enqueue_email(redis_client: redis.Redis, message: dict, background_tasks: BackgroundTasks):
+    if redis_available():
+        try:
+            await redis_client.rpush(MAIL_QUEUE_KEY, json.dumps(message))
+            return
+        except RedisError as e:
+            mark_redis_unavailable(e)
+    logger.warning("Черга листів недоступна, надсилаємо лист %s напряму", message['to'])
+    background_tasks.add_task(send_message_now, message)
+
+
+async def enqueue_verification_email(redis_client: redis.Redis, email: str, token: str,
+                                     background_tasks: BackgroundTasks):
+    await enqueue_email(redis_client, build_verification_message(email, token), background_tasks)
+
+
+class MailDispatcher:
+    """
+    Забирає листи з черги пачками і надсилає їх через одне постійне SMTP-з'єднання.
+    Блокуючий smtplib працює в окремому потоці, тому event loop не блокується.
+    Невдалі листи повертаються в чергу з експоненційною затримкою.
+    Лист переходить з черги в список processing воркера атомарно (BLMOVE/LMOVE), тож збій між
+    читанням і відправкою його не губить: після перезапуску він повертається в чергу і
+    надсилається ще раз (доставка щонайменше один раз).
+    """
+
+    def __init__(self):
+        self._smtp: smtplib.SMTP | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self.worker_id = uuid.uuid4().hex
+
+    @property
+    def processing_key(self) -> str:
+        return f"{MAIL_PROCESSING_PREFIX}{self.worker_id}"
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except (smtplib.SMTPException, OSError):
+                logger.info("SMTP-з'єднання втрачено, перепідключаємося")
+                self._close()
+        self._smtp = _open_smtp()
+        return self._smtp
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def _send_batch(self, messages: list[dict]) -> dict[int, str]:
+        """Помилки відправки за індексом листа в пачці."""
+        failures = {}
+        for index, message in enumerate(messages):
+            try:
+                try:
+                    self._connection().send_message(_to_email_message(message))
+                except smtplib.SMTPServerDisconnected:
+                    # Сервер закрив з'єднання між NOOP і відправкою - одна спроба з новим з'єднанням
+                    self._close()
+                    self._connection().send_message(_to_email_message(message))
+            except (smtplib.SMTPException, OSError) as e:
+                failures[index] = str(e)
+            except Exception as e:
+                # Лист, який не вдається навіть зібрати (напр. перенесення рядка в адресі), не має зупиняти
+                # диспетчер: він іде в повтори і врешті в mail:dead, як і решта невдалих
+                logger.error("Лист %s не сформовано: %r", message.get('to'), e)
+                failures[index] = f"{type(e).__name__}: {e}"
+        return failures
+
+    def _schedule_retry(self, pipe: redis.client.Pipeline, message: dict, error: str):
+        message["attempts"] = message.get("attempts", 0) + 1
+        message["error"] = error
+        if message["attempts"] > MAIL_MAX_RETRIES:
+            logger.error("Лист %s не надіслано після %s повторів: %s", message['to'], MAIL_MAX_RETRIES, error)
+            pipe.rpush(MAIL_DEAD_KEY, json.dumps(message))
+            return
+        delay = MAIL_RETRY_BACKOFF * 2 ** (message["attempts"] - 1)
+        logger.warning("Лист %s не надіслано (%s), повтор через %.0f с", message['to'], error, delay)
+        pipe.zadd(MAIL_RETRY_KEY, {json.dumps(message): time() + delay})
+
+    async def _take_batch(self, client: redis.Redis) -> list[str]:
+        first = await client.blmove(MAIL_QUEUE_KEY, self.processing_key, 1, "LEFT", "RIGHT")
+        if first is None:
+            return []
+        pipe = client.pipeline(transaction=False)
+        for _ in range(MAIL_BATCH_SIZE - 1):
+            pipe.lmove(MAIL_QUEUE_KEY, self.processing_key, "LEFT", "RIGHT")
+        return [first] + [raw for raw in await pipe.execute() if raw is not None]
+
+    async def _finish_batch(self, client: redis.Redis, batch: list[str], failures: dict[int, str]):
+        # Повтор і видалення з processing - в одній транзакції, щоб лист не зник і не задвоївся
+        pipe = client.pipeline(transaction=True)
+        for index, raw in enumerate(batch):
+            if index in failures:
+                self._schedule_retry(pipe, json.loads(raw), failures[index])
+            pipe.lrem(self.processing_key, 1, raw)
+        await pipe.execute()
+
+    async def _heartbeat(self, client: redis.Redis):
+        pipe = client.pipeline(transaction=False)
+        pipe.sadd(MAIL_WORKERS_KEY, self.worker_id)
+        pipe.set(f"{MAIL_HEARTBEAT_PREFIX}{self.worker_id}", "1", ex=MAIL_WORKER_TTL)
+        await pipe.execute()
+
+    async def _requeue(self, client: redis.Redis, worker_id: str) -> int:
+        """Повертає в початок черги листи з processing воркера. LMOVE атомарний, тож лист забирає один воркер."""
+        requeued = 0
+        while await client.lmove(f"{MAIL_PROCESSING_PREFIX}{worker_id}", MAIL_QUEUE_KEY, "RIGHT", "LEFT"):
+            requeued += 1
+        if requeued:
+            logger.warning("Повернуто в чергу листів воркера %s: %s", worker_id, requeued)
+        return requeued
+
+    async def _requeue_orphans(self, client: redis.Redis):
+        for worker_id in await client.smembers(MAIL_WORKERS_KEY):
+            if worker_id == self.worker_id or await client.exists(f"{MAIL_HEARTBEAT_PREFIX}{worker_id}"):
+                continue
+            await self._requeue(client, worker_id)
+            await client.srem(MAIL_WORKERS_KEY, worker_id)
+
+    async def _promote_due_retries(self, client: redis.Redis):
+        for raw in await client.zrangebyscore(MAIL_RETRY_KEY, 0, time()):
+            # ZREM повертає 1 лише одному воркеру, тож лист не потрапить у чергу двічі
+            if await client.zrem(MAIL_RETRY_KEY, raw):
+                await client.rpush(MAIL_QUEUE_KEY, raw)
+
+    async def run(self):
+        # Окремий клієнт без socket_timeout пулу застосунку, бо BLMOVE чекає довше
+        client = redis.from_url(REDIS_URL, decode_responses=True)
+        logger.info("Диспетчер листів %s запущено", self.worker_id)
+        orphans_checked_at = 0.0
+        try:
+            while not self._stopping:
+                try:
+                    await self._heartbeat(client)
+                    # Листи воркерів, що впали, - при старті і далі раз на MAIL_WORKER_TTL
+                    if time() - orphans_checked_at >= MAIL_WORKER_TTL:
+                        await self._requeue_orphans(client)
+                        orphans_checked_at = time()
+                    await self._promote_due_retries(client)
+                    batch = await self._take_batch(client)
+                    if not batch:
+                        continue
+                    messages = [json.loads(raw) for raw in batch]
+                    failures = await asyncio.to_thread(self._send_batch, messages)
+                    logger.info("Надіслано листів: %s з %s", len(messages) - len(failures), len(messages))
+                    await self._finish_batch(client, batch, failures)
+                except RedisError as e:
+                    logger.warning("Диспетчер листів: Redis недоступний (%s)", e)
+                    await asyncio.sleep(MAIL_RETRY_BACKOFF)
+        finally:
+            await asyncio.to_thread(self._close)
+            try:
+                # Незавершена пачка (зупинка посеред відправки) повертається в чергу одразу
+                await self._requeue(client, self.worker_id)
+                await client.srem(MAIL_WORKERS_KEY, self.worker_id)
+                await client.delete(f"{MAIL_HEARTBEAT_PREFIX}{self.worker_id}")
+            except RedisError as e:
+                logger.warning("Диспетчер листів: не вдалося повернути незавершені листи (%s)", e)
+            await client.aclose()
+
+    def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self._stopping = True
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+            self._task = None
+
+
+mail_dispatcher = MailDispatcher()
@@ -0,0 +1,93 @@
+import os
+from contextvars import ContextVar
+from time import perf_counter
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    REGISTRY,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Мітка route - завжди шаблон маршруту (/expenses/{expense_id}), а не сирий URL
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being processed", ["method", "route"],
+    multiprocess_mode="livesum",
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ["route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "Number of SQL statements per HTTP request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50),
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by result", ["cache", "result"])
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds", "Redis command latency", ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+BCRYPT_DURATION = Histogram(
+    "bcrypt_duration_seconds", "bcrypt hash/verify time including pool queue wait", ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1, 2, 5),
+)
+ADMISSION_REJECTED = Counter("admission_rejected_total", "Requests shed by rate limits or concurrency limits",
+                             ["route", "reason"])
+GROUP_COMMIT_BATCH_SIZE = Histogram(
+    "group_commit_batch_size", "Writes merged into one transaction by the group-commit writer",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+SSE_CONNECTIONS = Gauge("sse_connections", "Open server-sent events streams", multiprocess_mode="livesum")
+SSE_EVENTS = Counter("sse_events_total", "Events sent to server-sent events streams", ["event"])
+SSE_BUFFER_OVERFLOWS = Counter("sse_buffer_overflows_total", "Streams that fell behind and were resynchronized")
+
+# Лічильник запитів до БД поточного HTTP-запиту; заповнюється подіями engine
+request_db_stats: ContextVar[dict | None] = ContextVar("request_db_stats", default=None)
+
+
+def instrument_engine(engine: Engine):
+    """Підписується на події курсора, щоб рахувати кількість і тривалість SQL-запитів."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = perf_counter() - conn.info["query_start"].pop()
+        stats = request_db_stats.get()
+        route = stats["route"] if stats is not None else "background"
+        DB_QUERY_DURATION.labels(route=route).observe(duration)
+        if stats is not None:
+            stats["queries"] += 1
+
+
+def begin_request(method: str, route: str):
+    REQUESTS_IN_PROGRESS.labels(method=method, route=route).inc()
+    return request_db_stats.set({"route": route, "queries": 0})
+
+
+def end_request(method: str, route: str, status: int, duration: float, token):
+    REQUESTS_IN_PROGRESS.labels(method=method, route=route).dec()
+    REQUEST_LATENCY.labels(method=method, route=route, status=str(status)).observe(duration)
+    DB_QUERIES_PER_REQUEST.labels(route=route).observe(request_db_stats.get()["queries"])
+    request_db_stats.reset(token)
+
+
+def metrics_payload() -> tuple[bytes, str]:
+    # Кілька воркерів uvicorn: метрики збираються з PROMETHEUS_MULTIPROC_DIR
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,89 @@
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, func, insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from ..dependencies import Base, logger
+# Моделі імпортуються заради реєстрації таблиць для create_all
+from ..models import (category_model, exchange_rate_model, expense_archive_model, expense_model,  # noqa: F401
+                      expense_rollup_model, users_model)
+from ..models.expense_rollup_model import ExpenseDailyRollup
+from .currency_service import ensure_currency_schema
+from .rollup_service import build_rollups_statement
+from .search_service import ensure_archive_search_index, ensure_search_index
+
+# Ключ pg_advisory_xact_lock: міграції Postgres виконує один воркер, решта чекають
+MIGRATION_LOCK_KEY = 7_310_024
+
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False, server_default=func.current_timestamp()),
+)
+
+
+def _create_tables(conn: Connection):
+    Base.metadata.create_all(conn)
+
+
+def _expenses_index_and_rollups(conn: Connection):
+    """
+    create_all не змінює наявні таблиці: у базі зі схеми до пагінації й агрегатів немає індексу
+    keyset-пагінації, а таблиця денних агрегатів створена порожньою. Агрегати перераховуються повністю,
+    тож крок коректний і для бази, де вони вже велися.
+    """
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_expenses_user_created_id ON expenses (user_id, created_at, id)"))
+    conn.execute(delete(ExpenseDailyRollup))
+    conn.execute(build_rollups_statement())
+
+
+# Версії схеми по порядку. Нова зміна (індекс, колонка) додається в кінець з наступним номером;
+# застосовані номери записуються в schema_migrations, тож кожна зміна виконується один раз.
+# Перші версії ідемпотентні: для бази, створеної до появи міграцій, вони лише записуються.
+# Зміни наявних таблиць (індекси, колонки, дані) - лише окремими версіями, не через create_all
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "create tables", _create_tables),
+    (2, "currency columns", ensure_currency_schema),
+    (3, "expenses full-text index", ensure_search_index),
+    (4, "archived expenses full-text index", ensure_archive_search_index),
+    (5, "expenses keyset index and daily rollups backfill", _expenses_index_and_rollups),
+]
+
+
+def _applied_versions(conn: Connection) -> set[int]:
+    if not inspect(conn).has_table(schema_migrations.name):
+        return set()
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def _lock(conn: Connection):
+    """
+    Блокування на час міграцій, щоб воркери, що стартують одночасно, не застосували їх двічі.
+    SQLite: BEGIN IMMEDIATE бере блокування запису (pysqlite сам не починає транзакцію перед DDL).
+    """
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+def apply_migrations(engine: Engine) -> list[int]:
+    """Застосовує відсутні версії схеми в одній транзакції. Повертає номери застосованих версій."""
+    versions = {version for version, _, _ in MIGRATIONS}
+    with engine.connect() as conn:
+        # Звичайний старт воркера: схема актуальна, блокування не потрібне
+        if versions <= _applied_versions(conn):
+            return []
+        conn.rollback()
+        _lock(conn)
+        # Поки чекали на блокування, міграції міг застосувати інший воркер
+        applied = _applied_versions(conn)
+        schema_migrations.create(conn, checkfirst=True)
+        pending = [(version, name, migrate) for version, name, migrate in MIGRATIONS if version not in applied]
+        for version, name, migrate in pending:
+            migrate(conn)
+            conn.execute(insert(schema_migrations).values(version=version, name=name))
+            logger.info("Застосовано міграцію схеми %s: %s", version, name)
+        conn.commit()
+    return [version for version, _, _ in pending]
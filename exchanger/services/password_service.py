@@ -0,0 +1,73 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from fastapi import HTTPException, status
+
+from ..dependencies import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE, logger
+from .metrics_service import BCRYPT_DURATION
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+_bcrypt_context: "CryptContext | None" = None
+# bcrypt звільняє GIL, тому потоків достатньо; розмір пулу обмежує одночасне навантаження на CPU
+_executor: ThreadPoolExecutor | None = None
+_pending = 0
+
+
+def get_bcrypt_context() -> "CryptContext":
+    """passlib імпортується під час прогріву воркера або першого хешування, а не разом із застосунком."""
+    global _bcrypt_context
+    if _bcrypt_context is None:
+        from passlib.context import CryptContext
+
+        _bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=BCRYPT_ROUNDS)
+    return _bcrypt_context
+
+
+def warm_password_hasher():
+    """Вибір бекенду bcrypt (імпорт і самоперевірка) до першого входу, а не в ньому."""
+    get_bcrypt_context().handler("bcrypt").get_backend()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    return _executor
+
+
+async def _run(operation: str, func, *args):
+    """Виконує func у пулі bcrypt. Якщо черга переповнена - одразу 503, а не очікування."""
+    global _pending
+    if _pending >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        logger.warning("Черга bcrypt переповнена (%s), запит відхилено", _pending)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Server is busy, try again later",
+                            headers={"Retry-After": "1"})
+    _pending += 1
+    try:
+        with BCRYPT_DURATION.labels(operation=operation).time():
+            return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run("hash", get_bcrypt_context().hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Повертає (чи збігається пароль, новий хеш або None).
+    Новий хеш з'являється, коли збережений створено з іншою вартістю, ніж BCRYPT_ROUNDS.
+    """
+    return await _run("verify", get_bcrypt_context().verify_and_update, password, hashed_password)
+
+
+def shutdown_password_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
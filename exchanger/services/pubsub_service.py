@@ -0,0 +1,101 @@
+import asyncio
+from typing import Callable
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from ..dependencies import REDIS_RETRY_AFTER, logger
+from .redis_client import init_redis_pool, mark_redis_unavailable, redis_available
+
+# Обробник повідомлення: (канал, дані)
+Handler = Callable[[str, str], None]
+
+
+class RedisSubscriber:
+    """
+    Одне pub/sub-з'єднання воркера на всі канали (живі оновлення SSE, інвалідація L1 кешів).
+    Канали реєструються до start(). Коли після (пере)підключення Redis підтвердив усі підписки,
+    викликаються обробники on_reset: повідомлення, опубліковані під час розриву, загублені.
+    Поки підписки немає, connected=False.
+    """
+
+    def __init__(self):
+        self.connected = False
+        self._channels: dict[str, Handler] = {}
+        self._patterns: dict[str, Handler] = {}
+        self._on_reset: list[Callable[[], None]] = []
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, channel: str, handler: Handler, on_reset: Callable[[], None] | None = None):
+        self._channels[channel] = handler
+        if on_reset is not None:
+            self._on_reset.append(on_reset)
+
+    def psubscribe(self, pattern: str, handler: Handler, on_reset: Callable[[], None] | None = None):
+        self._patterns[pattern] = handler
+        if on_reset is not None:
+            self._on_reset.append(on_reset)
+
+    def _dispatch(self, message: dict):
+        if message["type"] == "pmessage":
+            handler = self._patterns.get(message["pattern"])
+        else:
+            handler = self._channels.get(message["channel"])
+        if handler is None:
+            return
+        try:
+            handler(message["channel"], message["data"])
+        except Exception as e:
+            logger.warning("Не вдалося обробити повідомлення з каналу %s: %s", message["channel"], e)
+
+    async def _listen(self):
+        pubsub = redis.Redis(connection_pool=init_redis_pool()).pubsub()
+        try:
+            if self._channels:
+                await pubsub.subscribe(*self._channels)
+            if self._patterns:
+                await pubsub.psubscribe(*self._patterns)
+            pending = len(self._channels) + len(self._patterns)
+            while True:
+                # Таймаут на читання, а не socket_timeout пулу: тиша в каналі - не помилка
+                message = await pubsub.get_message(timeout=1.0)
+                if message is None:
+                    continue
+                if message["type"] in ("subscribe", "psubscribe"):
+                    pending -= 1
+                    if pending == 0:
+                        for reset in self._on_reset:
+                            reset()
+                        self.connected = True
+                        logger.info("Підписку Redis pub/sub встановлено")
+                    continue
+                self._dispatch(message)
+        finally:
+            self.connected = False
+            await pubsub.aclose()
+
+    async def _run(self):
+        while True:
+            if not redis_available():
+                await asyncio.sleep(REDIS_RETRY_AFTER)
+                continue
+            try:
+                await self._listen()
+            except (RedisError, OSError) as e:
+                mark_redis_unavailable(e)
+
+    def start(self):
+        if self._task is None and (self._channels or self._patterns):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+subscriber = RedisSubscriber()
@@ -0,0 +1,183 @@
+import json
+import logging
+from collections import OrderedDict
+from contextvars import ContextVar
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("service.sql")
+
+# План запитуємо лише для DML/SELECT: PRAGMA, BEGIN, DDL тощо EXPLAIN не приймає
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+_LOG_STATEMENT_LENGTH = 500
+
+
+def _explain_statement(dialect_name: str, statement: str) -> str:
+    # EXPLAIN без ANALYZE лише будує план і не виконує запит (зокрема INSERT/DELETE)
+    if dialect_name == "postgresql":
+        return f"EXPLAIN {statement}"
+    return f"EXPLAIN QUERY PLAN {statement}"
+
+
+def is_full_scan(plan: list[str]) -> bool:
+    """Чи читає план усю таблицю без індексу (SQLite: "SCAN expenses", Postgres: "Seq Scan on ...")."""
+    for line in plan:
+        line = line.strip()
+        if "Seq Scan" in line:
+            return True
+        if line.startswith("SCAN ") and " USING " not in line and "VIRTUAL TABLE" not in line \
+                and "CONSTANT ROW" not in line:
+            return True
+    return False
+
+
+def _shorten(statement: str) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= _LOG_STATEMENT_LENGTH else statement[:_LOG_STATEMENT_LENGTH] + "..."
+
+
+class QueryProfiler:
+    """
+    Профайлер SQL на подіях engine. Для кожного HTTP-запиту рахує кількість і час SQL-запитів,
+    позначає однакові запити, що повторюються в межах одного HTTP-запиту (N+1), логує повільні
+    запити разом з планом виконання і накопичує звіт за шаблонами маршрутів.
+    План береться лише для повільних запитів, один раз на запит, і зберігається для max_plans
+    останніх із них: швидкі запити не платять за додатковий EXPLAIN.
+    """
+
+    def __init__(self, slow_query_ms: float = 100, n_plus_one_threshold: int = 5, max_plans: int = 256):
+        self.slow_query_ms = slow_query_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.max_plans = max_plans
+        self.enabled = False
+        self._current: ContextVar[dict | None] = ContextVar("sql_profile", default=None)
+        self._routes: dict[str, dict] = {}
+        self._plans: OrderedDict[str, list[str]] = OrderedDict()
+
+    def instrument(self, engine: Engine):
+        self.enabled = True
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("profiler_start", []).append(perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            duration_ms = (perf_counter() - conn.info["profiler_start"].pop()) * 1000
+            self._record(conn, statement, parameters, executemany, duration_ms)
+
+    def _route_stats(self, route: str) -> dict:
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = self._routes[route] = {"requests": 0, "queries": 0, "max_queries": 0, "duration_ms": 0.0,
+                                           "n_plus_one_requests": 0, "statements": {}}
+        return stats
+
+    def _explain(self, conn, statement: str, parameters, executemany: bool) -> list[str]:
+        plan = self._plans.get(statement)
+        if plan is not None:
+            self._plans.move_to_end(statement)
+            return plan
+        plan = []
+        if not executemany and statement.lstrip()[:6].upper().startswith(_EXPLAINABLE):
+            # Окремий курсор того самого з'єднання: результат основного запиту не зачіпається
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.execute(_explain_statement(conn.dialect.name, statement), parameters)
+                plan = [str(row[-1]) for row in cursor.fetchall()]
+            except Exception as e:
+                logger.debug("Не вдалося отримати план запиту: %s", e)
+            finally:
+                cursor.close()
+        self._plans[statement] = plan
+        while len(self._plans) > self.max_plans:
+            self._plans.popitem(last=False)
+        return plan
+
+    def _record(self, conn, statement: str, parameters, executemany: bool, duration_ms: float):
+        profile = self._current.get()
+        route = profile["route"] if profile is not None else "background"
+        statement_stats = self._route_stats(route)["statements"].setdefault(
+            statement, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "slow": 0, "n_plus_one": 0})
+        statement_stats["count"] += 1
+        statement_stats["total_ms"] += duration_ms
+        statement_stats["max_ms"] = max(statement_stats["max_ms"], duration_ms)
+
+        if profile is not None:
+            profile["queries"] += 1
+            profile["duration_ms"] += duration_ms
+            repeats = profile["statements"][statement] = profile["statements"].get(statement, 0) + 1
+            # Попередження один раз на запит, коли кількість повторів досягає порогу
+            if repeats == self.n_plus_one_threshold:
+                statement_stats["n_plus_one"] += 1
+                profile["n_plus_one"] = True
+                logger.warning("Можливий N+1 у %s: %s однакових SQL-запитів: %s", route, repeats, _shorten(statement))
+
+        if duration_ms >= self.slow_query_ms:
+            statement_stats["slow"] += 1
+            plan = self._explain(conn, statement, parameters, executemany)
+            logger.warning("Повільний SQL-запит у %s: %.1f мс: %s; план: %s", route, duration_ms, _shorten(statement),
+                           " | ".join(plan) or "-")
+
+    def begin_request(self, route: str):
+        if not self.enabled:
+            return None
+        return self._current.set({"route": route, "queries": 0, "duration_ms": 0.0, "statements": {},
+                                  "n_plus_one": False})
+
+    def end_request(self, token):
+        if token is None:
+            return
+        profile = self._current.get()
+        self._current.reset(token)
+        stats = self._route_stats(profile["route"])
+        stats["requests"] += 1
+        stats["queries"] += profile["queries"]
+        stats["max_queries"] = max(stats["max_queries"], profile["queries"])
+        stats["duration_ms"] += profile["duration_ms"]
+        stats["n_plus_one_requests"] += profile["n_plus_one"]
+
+    def reset(self):
+        self._routes.clear()
+
+    def report(self) -> dict:
+        """
+        Звіт за маршрутами: запити від найдорожчих за сумарним часом, з позначками. План і full_scan є лише
+        для запитів, що бували повільними і ще не витіснені з кешу планів.
+        """
+        routes = {}
+        for route, stats in sorted(self._routes.items()):
+            requests = stats["requests"]
+            statements = []
+            for statement, statement_stats in sorted(stats["statements"].items(), key=lambda item: -item[1]["total_ms"]):
+                plan = self._plans.get(statement, [])
+                statements.append({
+                    "sql": " ".join(statement.split()),
+                    "count": statement_stats["count"],
+                    "per_request": round(statement_stats["count"] / requests, 2) if requests else None,
+                    "total_ms": round(statement_stats["total_ms"], 2),
+                    "avg_ms": round(statement_stats["total_ms"] / statement_stats["count"], 3),
+                    "max_ms": round(statement_stats["max_ms"], 2),
+                    "slow": statement_stats["slow"],
+                    "n_plus_one": statement_stats["n_plus_one"],
+                    "full_scan": is_full_scan(plan),
+                    "plan": plan,
+                })
+            routes[route] = {
+                "requests": requests,
+                "queries": stats["queries"],
+                "queries_per_request": round(stats["queries"] / requests, 2) if requests else None,
+                "max_queries_per_request": stats["max_queries"],
+                "db_ms_per_request": round(stats["duration_ms"] / requests, 3) if requests else None,
+                "n_plus_one_requests": stats["n_plus_one_requests"],
+                "statements": statements,
+            }
+        return {"slow_query_ms": self.slow_query_ms, "n_plus_one_threshold": self.n_plus_one_threshold,
+                "routes": routes}
+
+    def dump_report(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+        logger.info("Звіт профайлера SQL записано у %s", path)
@@ -1,4 +1,85 @@
+from time import monotonic, perf_counter
+
 import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from ..dependencies import (
+    REDIS_URL,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_SOCKET_TIMEOUT,
+    REDIS_SOCKET_CONNECT_TIMEOUT,
+    REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_RETRY_AFTER,
+    logger,
+)
+from .metrics_service import REDIS_COMMAND_DURATION
+
+# Один пул з'єднань на весь застосунок, створюється в lifespan
+redis_pool: redis.ConnectionPool | None = None
+
+# Поки monotonic() < _unavailable_until, Redis вважається недоступним і кеш пропускається
+_unavailable_until = 0.0
+
+
+def init_redis_pool() -> redis.ConnectionPool:
+    global redis_pool
+    if redis_pool is None:
+        redis_pool = redis.ConnectionPool.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        )
+        logger.info("Створено пул Redis: max_connections=%s", REDIS_MAX_CONNECTIONS)
+    return redis_pool
+
+
+async def close_redis_pool():
+    global redis_pool
+    if redis_pool is not None:
+        await redis_pool.aclose()
+        redis_pool = None
+        logger.info("Пул Redis закрито")
+
 
 async def get_redis():
-    return redis.from_url("redis://redis:6379", decode_responses=True)
+    # Клієнт лише обгортає спільний пул, тому створювати його на кожен запит дешево
+    return redis.Redis(connection_pool=init_redis_pool())
+
+
+def redis_available() -> bool:
+    return monotonic() >= _unavailable_until
+
+
+def mark_redis_unavailable(exc: Exception):
+    global _unavailable_until
+    _unavailable_until = monotonic() + REDIS_RETRY_AFTER
+    logger.warning("Redis недоступний (%s), працюємо без кешу %s с", exc, REDIS_RETRY_AFTER)
+
+
+async def cache_get(redis_client: redis.Redis, key: str):
+    """Повертає значення з кешу або None, якщо ключа немає чи Redis недоступний."""
+    if not redis_available():
+        return None
+    started = perf_counter()
+    try:
+        return await redis_client.get(key)
+    except RedisError as e:
+        mark_redis_unavailable(e)
+        return None
+    finally:
+        REDIS_COMMAND_DURATION.labels(command="get").observe(perf_counter() - started)
+
+
+async def cache_set(redis_client: redis.Redis, key: str, value: str, ex: int):
+    if not redis_available():
+        return
+    started = perf_counter()
+    try:
+        await redis_client.set(key, value, ex=ex)
+    except RedisError as e:
+        mark_redis_unavailable(e)
+    finally:
+        REDIS_COMMAND_DURATION.labels(command="set").observe(perf_counter() - started)
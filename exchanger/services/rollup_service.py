@@ -0,0 +1,72 @@
+from datetime import date, datetime
+
+from sqlalchemy import select, delete, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.expense_model import Expense
+from ..models.expense_rollup_model import ExpenseDailyRollup
+
+
+def as_day(value) -> date:
+    # created_at заповнюється datetime.now, але в таблиці зберігається лише дата
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _upsert(dialect_name: str):
+    return postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+
+
+async def apply_expense_delta(db: AsyncSession, user_id: int, day, category_id: int, currency: str,
+                              amount: int, count: int):
+    """
+    Додає amount/count до рядка (user_id, day, category_id, currency) у тій самій транзакції, що й зміна витрати.
+    Для видалення передаються від'ємні значення.
+    """
+    day = as_day(day)
+    upsert = _upsert(db.bind.dialect.name)(ExpenseDailyRollup).values(
+        user_id=user_id, day=day, category_id=category_id, currency=currency, total=amount, count=count
+    )
+    await db.execute(upsert.on_conflict_do_update(
+        index_elements=[ExpenseDailyRollup.user_id, ExpenseDailyRollup.day, ExpenseDailyRollup.category_id,
+                        ExpenseDailyRollup.currency],
+        set_={
+            "total": ExpenseDailyRollup.total + upsert.excluded.total,
+            "count": ExpenseDailyRollup.count + upsert.excluded.count,
+        },
+    ))
+    if count < 0:
+        await db.execute(delete(ExpenseDailyRollup).filter(
+            ExpenseDailyRollup.user_id == user_id,
+            ExpenseDailyRollup.day == day,
+            ExpenseDailyRollup.category_id == category_id,
+            ExpenseDailyRollup.currency == currency,
+            ExpenseDailyRollup.count <= 0,
+        ))
+
+
+def build_rollups_statement(user_id: int | None = None):
+    """INSERT ... SELECT, що рахує агрегати з таблиці expenses (всі або одного користувача)."""
+    # date() - на випадок дат, збережених разом із часом (старі бази SQLite)
+    day = func.date(Expense.created_at)
+    source = (
+        select(Expense.user_id, day, Expense.category_id, Expense.currency, func.sum(Expense.amount), func.count())
+        .group_by(Expense.user_id, day, Expense.category_id, Expense.currency)
+    )
+    if user_id is not None:
+        source = source.filter(Expense.user_id == user_id)
+    return insert(ExpenseDailyRollup).from_select(["user_id", "day", "category_id", "currency", "total", "count"], source)
+
+
+async def rebuild_rollups(db: AsyncSession, user_id: int | None = None) -> int:
+    """Перераховує агрегати з таблиці expenses одним INSERT ... SELECT. Повертає кількість рядків."""
+    clear = delete(ExpenseDailyRollup)
+    if user_id is not None:
+        clear = clear.filter(ExpenseDailyRollup.user_id == user_id)
+
+    await db.execute(clear)
+    await db.execute(build_rollups_statement(user_id))
+    rows = select(func.count()).select_from(ExpenseDailyRollup)
+    if user_id is not None:
+        rows = rows.filter(ExpenseDailyRollup.user_id == user_id)
+    return await db.scalar(rows)
@@ -0,0 +1,181 @@
+import re
+from datetime import date
+
+from fastapi import HTTPException, status
+from sqlalchemy import Float, Integer, and_, literal, select, text, union_all
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import SEARCH_MAX_CANDIDATES, logger
+from ..models.expense_model import Expense
+from ..models.expense_archive_model import ArchivedExpense
+from .archive_service import archive_boundary
+from .expense_service import EXPENSE_COLUMNS, expense_columns, expense_to_dict
+
+FTS_TABLE = "expenses_fts"
+ARCHIVE_FTS_TABLE = "expenses_archive_fts"
+
+
+def _fts_ddl(fts_table: str, source_table: str) -> tuple[str, ...]:
+    """
+    Індекс з зовнішнім вмістом: текст зберігається лише в source_table, FTS5 тримає тільки інвертований індекс.
+    Колонка owner ("u42") індексується як окреме слово, тож фільтр за користувачем виконується всередині
+    FTS5 перетином списків документів, а не після пошуку по всій таблиці.
+    Тригери оновлюють індекс у тій самій транзакції, що й зміну витрати (зокрема масовий імпорт і архівацію)
+    """
+    return (
+        f"""CREATE VIEW IF NOT EXISTS {fts_table}_source AS
+            SELECT id, description, 'u' || user_id AS owner FROM {source_table}""",
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            description, owner, content='{fts_table}_source', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {source_table} BEGIN
+            INSERT INTO {fts_table}(rowid, description, owner) VALUES (new.id, new.description, 'u' || new.user_id);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {source_table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, description, owner)
+            VALUES ('delete', old.id, old.description, 'u' || old.user_id);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF description, user_id ON {source_table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, description, owner)
+            VALUES ('delete', old.id, old.description, 'u' || old.user_id);
+            INSERT INTO {fts_table}(rowid, description, owner) VALUES (new.id, new.description, 'u' || new.user_id);
+        END""",
+    )
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_QUERY_TERMS = 8
+
+
+def _ensure_fts(conn: Connection, fts_table: str, source_table: str):
+    """Створює FTS5-індекс і тригери; для наявної бази один раз індексує всі рядки source_table."""
+    if conn.dialect.name != "sqlite":
+        return
+    exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": fts_table}).first()
+    for statement in _fts_ddl(fts_table, source_table):
+        conn.execute(text(statement))
+    if not exists:
+        conn.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+        logger.info("Створено повнотекстовий індекс %s", source_table)
+
+
+def ensure_search_index(conn: Connection):
+    _ensure_fts(conn, FTS_TABLE, Expense.__tablename__)
+
+
+def ensure_archive_search_index(conn: Connection):
+    # Архівні витрати шукаються так само: перенесення в архів додає їх в окремий індекс тригером
+    _ensure_fts(conn, ARCHIVE_FTS_TABLE, ArchivedExpense.__tablename__)
+
+
+def search_terms(q: str) -> list[str]:
+    terms = _TOKEN_RE.findall(q.lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty search query")
+    return terms
+
+
+def fts_query(user_id: int, terms: list[str]) -> str:
+    # Останнє слово - префікс, бо його ще дописують ("rent mar" знайде "rent march"); слова поєднуються
+    # через AND. Лапки роблять слово літералом, тож синтаксис FTS5 (OR, NEAR, *) з запиту не інтерпретується
+    words = [f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*']
+    return f'owner : "u{int(user_id)}" AND description : ({" ".join(words)})'
+
+
+def _tier_filters(model, user_id: int, category_id: int | None, date_from: date | None,
+                  date_to: date | None) -> list:
+    filters = [model.user_id == user_id]
+    if category_id is not None:
+        filters.append(model.category_id == category_id)
+    if date_from is not None:
+        filters.append(model.created_at >= date_from)
+    if date_to is not None:
+        filters.append(model.created_at <= date_to)
+    return filters
+
+
+async def search_tiers(db: AsyncSession, date_from: date | None, date_to: date | None) -> list[tuple]:
+    """
+    (модель, FTS-таблиця, додатковий фільтр) для гарячої таблиці й архіву - як у build_tiered_queries:
+    архів, лише якщо діапазон сягає межі; гаряча таблиця читається від межі, бо до видалення
+    перенесені рядки є в обох таблицях.
+    """
+    cutoff = await archive_boundary.get(db)
+    if cutoff is None:
+        return [(Expense, FTS_TABLE, None)]
+    tiers = []
+    if date_to is None or date_to >= cutoff:
+        tiers.append((Expense, FTS_TABLE, Expense.created_at >= cutoff))
+    if date_from is None or date_from < cutoff:
+        tiers.append((ArchivedExpense, ARCHIVE_FTS_TABLE, ArchivedExpense.created_at < cutoff))
+    return tiers
+
+
+async def search_expenses(db: AsyncSession, user_id: int, q: str, limit: int, offset: int = 0,
+                          category_id: int | None = None, date_from: date | None = None,
+                          date_to: date | None = None, sort: str = "rank") -> dict:
+    """
+    Пошук витрат користувача за описом у гарячій таблиці й архіві. sort=rank - за релевантністю (bm25),
+    date - від нових до старих. Без фільтрів за категорією і датою видача обмежена SEARCH_MAX_CANDIDATES
+    найновішими збігами кожного шару, і truncated показує, що збігів могло бути більше. Поза SQLite FTS5
+    недоступний, тому виконується звичайний ILIKE за кожним словом.
+    """
+    terms = search_terms(q)
+    unfiltered = category_id is None and date_from is None and date_to is None
+    tiers = await search_tiers(db, date_from, date_to)
+
+    # Беремо на один рядок більше, щоб знати, чи є наступна сторінка
+    page_size, page_offset = limit + 1, offset
+    params = {}
+    queries = []
+    for model, fts_table, tier_filter in tiers:
+        filters = _tier_filters(model, user_id, category_id, date_from, date_to)
+        if tier_filter is not None:
+            filters.append(tier_filter)
+        if db.bind.dialect.name == "sqlite":
+            params["query"] = fts_query(user_id, terms)
+            # Релевантність рахується лише за описом: вага колонки owner - 0. bm25 на першому виклику
+            # підраховує частоту кожного слова по всьому індексу, тому для sort=date він не викликається
+            rank_sql = f"bm25({fts_table}, 1.0, 0.0)" if sort == "rank" else "0"
+            fts_sql = f"SELECT rowid AS id, {rank_sql} AS rank FROM {fts_table} WHERE {fts_table} MATCH :query"
+            if unfiltered:
+                # Без додаткових фільтрів FTS5 віддає збіги від найновішого rowid і зупиняється на
+                # SEARCH_MAX_CANDIDATES: сортування і читання з таблиці обмежені ними, і частий термін
+                # не змушує сортувати всю історію користувача. matched - скільки кандидатів відібрано,
+                # з нього видно, чи впирається шар у межу
+                fts_sql = (f"SELECT id, rank, count(*) OVER () AS matched FROM ("
+                           f"{fts_sql} ORDER BY rowid DESC LIMIT :candidates)")
+                params["candidates"] = SEARCH_MAX_CANDIDATES
+                if sort == "rank" and len(tiers) == 1:
+                    # Сторінка відбирається всередині FTS5, і з таблиці читаються лише її рядки
+                    fts_sql = (f"SELECT id, rank, matched FROM ({fts_sql}) "
+                               f"ORDER BY rank, id LIMIT :page_size OFFSET :page_offset")
+                    params.update(page_size=page_size, page_offset=page_offset)
+                    page_offset = 0
+            else:
+                fts_sql = f"SELECT id, rank, 0 AS matched FROM ({fts_sql})"
+            fts = text(fts_sql).columns(id=model.id.type, rank=Float, matched=Integer).subquery(f"{fts_table}_match")
+            queries.append(select(*expense_columns(model), fts.c.rank, fts.c.matched)
+                           .join(fts, fts.c.id == model.id).filter(*filters))
+        else:
+            filters.extend(model.description.ilike(f"%{term}%") for term in terms)
+            queries.append(select(*expense_columns(model), literal(0.0).label("rank"), literal(0).label("matched"))
+                           .filter(and_(*filters)))
+
+    if len(queries) == 1:
+        query, found = queries[0], queries[0].selected_columns
+    else:
+        # Обидва шари - одна видача: сортування і сторінка рахуються над об'єднанням
+        found = union_all(*queries).subquery("found").c
+        query = select(*(found[column.key] for column in EXPENSE_COLUMNS), found.rank, found.matched)
+    # Поза SQLite релевантності немає - лише від нових до старих
+    query = query.order_by(found.rank, found.id) if sort == "rank" and db.bind.dialect.name == "sqlite" else \
+        query.order_by(found.created_at.desc(), found.id.desc())
+
+    rows = (await db.execute(query.limit(page_size).offset(page_offset), params)).all()
+    # Без фільтрів сторінки за межею кандидатів не видаються, тож і посилання на них немає
+    has_next = len(rows) > limit and not (unfiltered and offset + 2 * limit > SEARCH_MAX_CANDIDATES)
+    next_offset = offset + limit if has_next else None
+    truncated = any(row.matched >= SEARCH_MAX_CANDIDATES for row in rows)
+    return {"items": [expense_to_dict(row) for row in rows[:limit]], "next_offset": next_offset, "truncated": truncated}
@@ -0,0 +1,53 @@
+import asyncio
+from time import perf_counter
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from sqlalchemy import text
+
+from ..dependencies import async_engine, STARTUP_WARM_CONNECTIONS, logger
+from .category_service import warm_categories
+from .mail_service import get_verification_template
+from .password_service import warm_password_hasher
+from .redis_client import mark_redis_unavailable, redis_available
+
+
+async def warm_database_pool(connections: int):
+    """Відкриває з'єднання пулу наперед (PRAGMA SQLite, рукостискання Postgres), поки запитів ще немає."""
+    async def ping():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # Одночасно, інакше пул віддаватиме одне й те саме з'єднання
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
+
+async def warm_redis_pool(redis_client: redis.Redis, connections: int):
+    if not redis_available():
+        return
+    try:
+        await asyncio.gather(*(redis_client.ping() for _ in range(connections)))
+    except RedisError as e:
+        mark_redis_unavailable(e)
+
+
+async def warm_up(redis_client: redis.Redis):
+    """
+    Усе, що інакше зробив би перший запит воркера: з'єднання БД і Redis, категорії в кеші,
+    шаблон листа, бекенд bcrypt. Помилка кроку не зупиняє старт, а лише логується.
+    """
+    steps = {
+        "db_pool": lambda: warm_database_pool(STARTUP_WARM_CONNECTIONS),
+        "redis_pool": lambda: warm_redis_pool(redis_client, STARTUP_WARM_CONNECTIONS),
+        "categories": lambda: warm_categories(redis_client),
+        "email_template": lambda: asyncio.to_thread(get_verification_template),
+        "bcrypt": lambda: asyncio.to_thread(warm_password_hasher),
+    }
+    for name, step in steps.items():
+        started = perf_counter()
+        try:
+            await step()
+        except Exception as e:
+            logger.warning("Прогрів %s не вдався: %s", name, e)
+            continue
+        logger.info("Прогрів %s: %.1f мс", name, (perf_counter() - started) * 1000)
@@ -0,0 +1,126 @@
+from collections import Counter
+from typing import Any, Callable
+
+import redis.asyncio as redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import CACHE_L1_TTL, CACHE_L1_VALIDATORS_SIZE
+from .cache_service import (INVALIDATION_CHANNEL, Loader, LocalLRUCache, get_or_compute, get_validators,
+                            on_invalidate)
+from .metrics_service import CACHE_REQUESTS
+from .pubsub_service import subscriber
+from .redis_client import redis_available
+
+# Усі дворівневі кеші процесу - для статистики
+_caches: list["TieredCache"] = []
+
+
+class TieredCache:
+    """
+    Дворівневий кеш: L1 - LRU з TTL у пам'яті воркера, L2 - Redis через cache_service.get_or_compute
+    (блокування перерахунку, фонове оновлення). Ключі містять версію області, тож запис L1 не застаріває:
+    після зміни даних читається вже інший ключ, а старий витісняє LRU. Без Redis версія невідома,
+    тому L1 пропускається. Лічильники: l1_hit, l2_hit, miss (рахував loader), bypass.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.local = LocalLRUCache(maxsize, ttl)
+        self.stats = Counter()
+        _caches.append(self)
+
+    def _count(self, result: str):
+        self.stats[result] += 1
+        CACHE_REQUESTS.labels(cache=self.name, result=result).inc()
+
+    async def get_or_compute(self, redis_client: redis.Redis, key: str, loader: Loader, db: AsyncSession,
+                             ttl: int, soft_ttl: int | None = None, decode: Callable[[Any], Any] | None = None):
+        """
+        Значення з L1, інакше з Redis або loader(db). Без decode в L1 лежить готовий JSON відповіді;
+        decode перетворює JSON на об'єкт (напр. frozenset id), і в L1 зберігається вже він.
+        """
+        if not redis_available():
+            self._count("bypass")
+            payload = await get_or_compute(redis_client, key, loader, db, ttl, soft_ttl, name=self.name)
+            return decode(payload) if decode else payload
+        value = self.local.get(key)
+        if value is not None:
+            self._count("l1_hit")
+            return value
+
+        computed = False
+
+        async def counting_loader(session: AsyncSession):
+            nonlocal computed
+            computed = True
+            return await loader(session)
+
+        payload = await get_or_compute(redis_client, key, counting_loader, db, ttl, soft_ttl, name=self.name)
+        self._count("miss" if computed else "l2_hit")
+        value = decode(payload) if decode else payload
+        # У L1 не довше за soft_ttl, щоб фонове оновлення ключа в Redis доходило і до воркерів
+        self.local.set(key, value, ttl=soft_ttl or ttl)
+        return value
+
+    def get_stats(self) -> dict:
+        l1_hit, l2_hit, miss = self.stats["l1_hit"], self.stats["l2_hit"], self.stats["miss"]
+        lookups = l1_hit + l2_hit + miss
+        return {
+            "l1_hit": l1_hit,
+            "l2_hit": l2_hit,
+            "miss": miss,
+            "bypass": self.stats["bypass"],
+            "l1_hit_ratio": l1_hit / lookups if lookups else 0.0,
+            # Частка звернень до Redis, на які він відповів без перерахунку
+            "l2_hit_ratio": l2_hit / (l2_hit + miss) if l2_hit + miss else 0.0,
+            "hit_ratio": (l1_hit + l2_hit) / lookups if lookups else 0.0,
+            "l1_size": len(self.local),
+        }
+
+
+class ScopeValidators(TieredCache):
+    """
+    Версія і час зміни області (get_validators) в L1. Їх змінює bump_version будь-якого воркера, тому L1
+    використовується лише поки жива підписка на INVALIDATION_CHANNEL; після перепідключення він очищається.
+    Інші воркери отримують нову версію із затримкою доставки pub/sub (мілісекунди), воркер, що змінив дані, - одразу.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        super().__init__(name, maxsize, ttl)
+        # Збільшується при кожній інвалідації: відповідь Redis, отримана під час інвалідації, в L1 не кладеться
+        self._generation = 0
+
+    def invalidate(self, scope: str):
+        self._generation += 1
+        self.local.delete(scope)
+
+    def clear(self):
+        self._generation += 1
+        self.local.clear()
+
+    async def get(self, redis_client: redis.Redis, scope: str) -> tuple[int, float] | None:
+        if not (subscriber.connected and redis_available()):
+            self._count("bypass")
+            return await get_validators(redis_client, scope)
+        validators = self.local.get(scope)
+        if validators is not None:
+            self._count("l1_hit")
+            return validators
+        generation = self._generation
+        validators = await get_validators(redis_client, scope)
+        if validators is None:
+            return None
+        self._count("l2_hit")
+        if generation == self._generation:
+            self.local.set(scope, validators)
+        return validators
+
+
+scope_validators = ScopeValidators("validators", CACHE_L1_VALIDATORS_SIZE, CACHE_L1_TTL)
+on_invalidate(scope_validators.invalidate)
+subscriber.subscribe(INVALIDATION_CHANNEL, lambda channel, scope: scope_validators.invalidate(scope),
+                     on_reset=scope_validators.clear)
+
+
+def get_tiered_cache_stats() -> dict:
+    return {cache.name: cache.get_stats() for cache in _caches}
@@ -0,0 +1,37 @@
+import redis.asyncio as redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import USER_PROFILE_CACHE_SIZE, USER_PROFILE_CACHE_TTL
+from ..models.users_model import Users
+from ..schemas.user_schemas import UserProfileResponse
+from .cache_service import LocalLRUCache, get_version, bump_version, profile_scope
+from .redis_client import redis_available
+from .metrics_service import CACHE_REQUESTS
+
+# Ключ містить версію профілю з Redis, тож зміна на будь-якому воркері інвалідує кеш усіх воркерів
+profile_cache = LocalLRUCache(USER_PROFILE_CACHE_SIZE, USER_PROFILE_CACHE_TTL)
+
+
+async def get_user_profile(db: AsyncSession, redis_client: redis.Redis, user_id: int) -> dict | None:
+    version = await get_version(redis_client, profile_scope(user_id))
+    key = f"{user_id}:v{version}"
+    if redis_available():
+        profile = profile_cache.get(key)
+        if profile is not None:
+            CACHE_REQUESTS.labels(cache="profile", result="hit").inc()
+            return profile
+    CACHE_REQUESTS.labels(cache="profile", result="miss").inc()
+
+    user = (await db.execute(select(Users).filter(Users.id == user_id))).scalars().first()
+    if user is None:
+        return None
+    profile = UserProfileResponse.model_validate(user).model_dump()
+    if redis_available():
+        profile_cache.set(key, profile)
+    return profile
+
+
+async def invalidate_user_profile(redis_client: redis.Redis, user_id: int):
+    """Викликається після зміни пароля чи верифікації."""
+    await bump_version(redis_client, profile_scope(user_id))
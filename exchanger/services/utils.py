@@ -1,23 +1,15 @@
 
-from ..dependencies import SessionLocal
+from ..dependencies import AsyncSessionLocal
 from typing import Annotated
 from fastapi import Depends
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..services.auth_service import get_current_user
 
-def get_db():
-  db= SessionLocal()
-  try:
+async def get_db():
+  async with AsyncSessionLocal() as db:
     yield db
-  finally:
-    db.close()
 
-db_dependency=Annotated[Session,Depends(get_db)]
+db_dependency=Annotated[AsyncSession,Depends(get_db)]
 
 
 user_dependency=Annotated[dict,Depends(get_current_user)]
-
-
-
-bcrypt_context=CryptContext(schemes=['bcrypt'],deprecated='auto')
\ No newline at end of file
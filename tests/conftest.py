@@ -0,0 +1,83 @@
+"""
+Застосунок запускається в процесі через ASGI-транспорт httpx, з lifespan (міграції, прогрів).
+База - SQLite у тимчасовій теці, Redis - fakeredis, пошта не надсилається.
+"""
+import os
+import tempfile
+import uuid
+
+# Конфігурація читається під час імпорту exchanger.dependencies, тому задається до нього
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='exchanger-tests-'), 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["SECRET_KEY"] = "test-secret-key"
+os.environ["ALGORITHM"] = "HS256"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["MAIL_DISPATCHER_ENABLED"] = "false"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["LOG_LEVEL"] = "WARNING"
+
+import fakeredis  # noqa: E402
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+import redis.asyncio as redis  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from exchanger.dependencies import AsyncSessionLocal  # noqa: E402
+from exchanger.main import app  # noqa: E402
+from exchanger.models.category_model import Category  # noqa: E402
+from exchanger.models.users_model import Users  # noqa: E402
+from exchanger.services import redis_client  # noqa: E402
+
+PASSWORD = "test-password"
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def started_app():
+    redis_client.redis_pool = redis.ConnectionPool(
+        connection_class=fakeredis.aioredis.FakeConnection, server=fakeredis.FakeServer(), decode_responses=True,
+    )
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+@pytest.fixture
+async def client(started_app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=started_app), base_url="http://test") as client:
+        yield client
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str = PASSWORD) -> httpx.Response:
+    return await client.post("/auth/token", data={"username": email, "password": password})
+
+
+def auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+async def user(client):
+    """Новий користувач, зареєстрований і підтверджений через API: (email, токен)."""
+    email = f"{uuid.uuid4().hex}@test.example.com"
+    response = await client.post("/auth/register", json={"email": email, "full_name": "Test User",
+                                                         "password": PASSWORD, "role": "user"})
+    assert response.status_code == 201
+    async with AsyncSessionLocal() as db:
+        token = await db.scalar(select(Users.verification_token).filter(Users.email == email))
+    assert (await client.get(f"/auth/verify/{token}")).status_code == 200
+    response = await login(client, email)
+    assert response.status_code == 200
+    return email, response.json()["access_token"]
+
+
+@pytest.fixture
+async def category_id(started_app) -> int:
+    async with AsyncSessionLocal() as db:
+        category = Category(name=f"category {uuid.uuid4().hex}", user_id=None)
+        db.add(category)
+        await db.commit()
+        return category.id
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from exchanger.services import admission_service
+from exchanger.services.admission_service import ConcurrencyLimiter, TokenBucket, check_rate_limits
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_limiter_rejects_after_budget_and_keeps_permits():
+    limiter = ConcurrencyLimiter(limit=1, max_queue=10, budget=0.01)
+    assert await limiter.acquire()
+    assert not await limiter.acquire()
+    limiter.release(0.0)
+
+    async def request():
+        if await limiter.acquire():
+            await asyncio.sleep(0.002)
+            limiter.release(0.002)
+
+    # Черга постійно впирається в бюджет: жоден дозвіл не має загубитися
+    for _ in range(50):
+        await asyncio.gather(*(request() for _ in range(10)))
+    assert limiter._semaphore._value == 1
+    assert limiter._waiting == 0
+
+
+def make_request(ip: str, token: str | None = None) -> Request:
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "method": "GET", "path": "/expenses/", "headers": headers, "client": (ip, 1234)})
+
+
+def test_token_bucket_allows_burst_then_reports_wait():
+    bucket = TokenBucket(rate=10, burst=3, maxsize=2)
+    assert [bucket.take("a") for _ in range(3)] == [0, 0, 0]
+    assert bucket.take("a") == pytest.approx(0.1, abs=0.01)
+    # Інші ключі мають власні відра; найдавніший ключ витісняється після maxsize
+    assert bucket.take("b") == 0 and bucket.take("c") == 0
+    assert list(bucket._buckets) == ["b", "c"]
+
+
+async def test_user_over_limit_gets_429_while_others_pass(user, monkeypatch):
+    _, token = user
+    monkeypatch.setattr(admission_service, "RATE_LIMIT_BACKEND", "local")
+    monkeypatch.setitem(admission_service._buckets, "user", TokenBucket(rate=0.5, burst=2, maxsize=100))
+    monkeypatch.setitem(admission_service._buckets, "ip", TokenBucket(rate=100, burst=100, maxsize=100))
+
+    assert await check_rate_limits(make_request("10.0.0.1", token), "expenses") is None
+    # Той самий користувач з іншої адреси витрачає те саме відро
+    assert await check_rate_limits(make_request("10.0.0.2", token), "expenses") is None
+    response = await check_rate_limits(make_request("10.0.0.3", token), "expenses")
+    assert response.status_code == 429 and response.headers["Retry-After"] == "2"
+
+    # Анонімний запит обмежується лише своїм IP
+    assert await check_rate_limits(make_request("10.0.0.1"), "expenses") is None
@@ -0,0 +1,79 @@
+from datetime import date, timedelta
+
+import pytest
+
+from exchanger.services.archive_service import archive_boundary, archive_cutoff_for, archive_expenses
+
+from conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+
+async def import_expenses(client, token: str, rows: list[str]) -> dict:
+    body = "category_id,amount,description,created_at\n" + "\n".join(rows) + "\n"
+    response = await client.post("/expenses/bulk", content=body, headers={**auth(token), "Content-Type": "text/csv"})
+    assert response.status_code == 200
+    return response.json()
+
+
+async def find_id(client, token: str, description: str) -> int:
+    response = await client.get("/expenses/search", params={"q": description}, headers=auth(token))
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert len(items) == 1 and description in items[0]["description"]
+    return items[0]["id"]
+
+
+async def test_search_and_update_across_archive_cutoff(client, user, category_id):
+    _, token = user
+    cutoff = archive_cutoff_for(date.today())
+    old_day = cutoff - timedelta(days=40)
+    recent_day = date.today() - timedelta(days=3)
+    report = await import_expenses(client, token, [f"{category_id},100,home wardrobe oak,{old_day}",
+                                                   f"{category_id},200,home fridge steel,{recent_day}",
+                                                   f"{category_id},300,home sofa velvet,{old_day}"])
+    assert report["inserted"] == 3
+    old_id = await find_id(client, token, "wardrobe oak")
+    recent_id = await find_id(client, token, "fridge steel")
+    sofa_id = await find_id(client, token, "sofa velvet")
+
+    # Поки архівація не запускалася, старі витрати змінюються як звичайні
+    response = await client.put(f"/expenses/{old_id}", headers=auth(token),
+                                json={"category_id": category_id, "amount": 150, "description": "home wardrobe oak"})
+    assert response.status_code == 204
+
+    result = await archive_expenses(grace_seconds=0)
+    assert result["cutoff"] == cutoff == archive_boundary._cutoff
+    assert result["purged"] >= 2
+
+    # Пошук бачить обидва шари; фільтр за датою до межі читає лише архів
+    assert await find_id(client, token, "wardrobe oak") == old_id
+    assert await find_id(client, token, "fridge steel") == recent_id
+    response = await client.get("/expenses/search", params={"q": "oak", "date_to": cutoff - timedelta(days=1)},
+                                headers=auth(token))
+    assert [item["id"] for item in response.json()["items"]] == [old_id]
+    response = await client.get("/expenses/search", params={"q": "steel", "date_from": cutoff},
+                                headers=auth(token))
+    assert [item["id"] for item in response.json()["items"]] == [recent_id]
+    response = await client.get("/expenses/search", params={"q": "home", "sort": "date"}, headers=auth(token))
+    assert [item["id"] for item in response.json()["items"]] == [recent_id, sofa_id, old_id]
+    response = await client.get("/expenses/search", params={"q": "home", "limit": 2}, headers=auth(token))
+    assert len(response.json()["items"]) == 2 and response.json()["next_offset"] == 2
+
+    # Архівні витрати лише для читання, гарячі - як раніше
+    response = await client.put(f"/expenses/{old_id}", headers=auth(token),
+                                json={"category_id": category_id, "amount": 1, "description": "home wardrobe oak"})
+    assert response.status_code == 409
+    assert (await client.delete(f"/expenses/{sofa_id}", headers=auth(token))).status_code == 409
+    response = await client.put(f"/expenses/{recent_id}", headers=auth(token),
+                                json={"category_id": category_id, "amount": 250, "description": "home fridge steel"})
+    assert response.status_code == 204
+
+    response = await client.get("/expenses/", headers=auth(token))
+    amounts = {item["id"]: item["amount"] for item in response.json()["items"]}
+    assert amounts == {recent_id: 250, old_id: 150, sofa_id: 300}
+
+    # Дні до межі читаються лише з архіву, тож імпорт у них відхиляється
+    report = await import_expenses(client, token, [f"{category_id},5,late,{old_day}"])
+    assert report["inserted"] == 0
+    assert "archive cutoff" in report["errors"][0]["error"]
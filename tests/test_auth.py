@@ -0,0 +1,53 @@
+import asyncio
+from time import time
+
+import pytest
+
+from conftest import PASSWORD, auth, login
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_login_right_after_password_change(client, user):
+    email, old_token = user
+    # iat має точність до секунди: старий токен має бути виданий у попередню секунду
+    await asyncio.sleep(1 - time() % 1)
+    response = await client.put("/user/password", headers=auth(old_token),
+                                json={"password": PASSWORD, "new_password": "new-password"})
+    assert response.status_code == 204
+
+    # Новий токен видано в ту саму секунду, що й відкликання, - він дійсний
+    response = await login(client, email, "new-password")
+    assert response.status_code == 200
+    new_token = response.json()["access_token"]
+    assert (await client.get("/user/", headers=auth(new_token))).status_code == 200
+
+    response = await client.get("/user/", headers=auth(old_token))
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token revoked"}
+    assert (await login(client, email)).status_code == 401
+
+
+async def test_logout_then_relogin(client, user):
+    email, token = user
+    assert (await client.post("/auth/logout", headers=auth(token))).status_code == 204
+    assert (await client.get("/user/", headers=auth(token))).status_code == 401
+
+    # Токени з однієї секунди відрізняються jti, тож новий вхід не отримує відкликаний токен
+    response = await login(client, email)
+    assert response.status_code == 200
+    new_token = response.json()["access_token"]
+    assert new_token != token
+    assert (await client.get("/user/", headers=auth(new_token))).status_code == 200
+
+
+async def test_profile_has_no_credentials(client, user):
+    email, token = user
+    for _ in range(2):
+        # Другий запит віддає профіль з кешу
+        response = await client.get("/user/", headers=auth(token))
+        assert response.status_code == 200
+        profile = response.json()
+        assert profile["email"] == email
+        assert "hashed_password" not in profile
+        assert "verification_token" not in profile
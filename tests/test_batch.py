@@ -0,0 +1,43 @@
+import pytest
+
+from conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+
+def create(category_id: int, amount: int) -> dict:
+    return {"op": "create", "entity": "expense",
+            "data": {"category_id": category_id, "amount": amount, "description": f"batch {amount}"}}
+
+
+async def expense_amounts(client, token: str) -> list[int]:
+    response = await client.get("/expenses/", headers=auth(token))
+    return sorted(item["amount"] for item in response.json()["items"])
+
+
+async def test_atomic_batch_rolls_back_on_failure(client, user, category_id):
+    _, token = user
+    response = await client.post("/batch", headers=auth(token), json={
+        "mode": "atomic",
+        "operations": [create(category_id, 10), create(999_999, 20), create(category_id, 30)],
+    })
+    assert response.status_code == 400
+    body = response.json()
+    assert body["committed"] is False
+    assert [result["status"] for result in body["results"]] == [424, 400, 424]
+    assert body["results"][1]["detail"] == "category 999999 not found"
+    assert await expense_amounts(client, token) == []
+
+
+async def test_independent_batch_commits_successful_operations(client, user, category_id):
+    _, token = user
+    response = await client.post("/batch", headers=auth(token), json={
+        "mode": "independent",
+        "operations": [create(category_id, 10), create(999_999, 20), create(category_id, 30),
+                       {"op": "delete", "entity": "expense", "id": 999_999}],
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["committed"] is True
+    assert [result["status"] for result in body["results"]] == [201, 400, 201, 404]
+    assert await expense_amounts(client, token) == [10, 30]
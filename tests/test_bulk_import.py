@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from exchanger.dependencies import AsyncSessionLocal, BASE_CURRENCY
+from exchanger.models.users_model import Users
+from exchanger.services.bulk_import_service import import_expenses
+
+from conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_csv_import_keeps_quoted_newlines_and_dates(client, user, category_id):
+    _, token = user
+    day = date.today() - timedelta(days=10)
+    future = date.today() + timedelta(days=1)
+    body = (
+        "category_id,amount,description,created_at\r\n"
+        f'{category_id},100,"two\r\nlines, ""quoted""",{day}\r\n'
+        f"{category_id},200,today,\r\n"
+        f"{category_id},300,future,{future}\r\n"
+        f"{category_id},400,short\r\n"
+    )
+    response = await client.post("/expenses/bulk", content=body, headers={**auth(token), "Content-Type": "text/csv"})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["inserted"] == 2
+    assert [error["line"] for error in report["errors"]] == [5, 6]
+
+    response = await client.get("/expenses/", headers=auth(token))
+    items = {item["amount"]: item for item in response.json()["items"]}
+    assert items[100]["description"] == 'two\nlines, "quoted"'
+    assert items[100]["created_at"] == day.isoformat()
+    assert items[200]["created_at"] == date.today().isoformat()
+
+    # Денні агрегати рахуються за днем кожної витрати
+    response = await client.get("/statistics/timeseries", headers=auth(token),
+                                params={"start": day.isoformat(), "end": date.today().isoformat()})
+    assert response.status_code == 200
+    totals = dict(zip(response.json()["buckets"], response.json()["totals"]))
+    assert totals[day.isoformat()] == 100
+    assert totals[date.today().isoformat()] == 200
+
+
+async def test_import_does_not_write_while_the_body_streams(started_app, user, category_id):
+    email, _ = user
+    async with AsyncSessionLocal() as db:
+        user_id = (await db.execute(select(Users.id).where(Users.email == email))).scalar_one()
+        raw = await (await db.connection()).get_raw_connection()
+        in_transaction = []
+
+        async def rows():
+            for line_number in range(1, 8):
+                yield line_number, {"category_id": category_id, "amount": line_number, "description": "streamed"}, None
+                # Порції по 2 рядки вже набралися, але транзакція запису ще не відкрита
+                in_transaction.append(raw.driver_connection.in_transaction)
+
+        report = await import_expenses(db, user_id, rows(), BASE_CURRENCY, chunk_size=2)
+        assert report["inserted"] == 7
+        assert not any(in_transaction) and raw.driver_connection.in_transaction
+        await db.rollback()
@@ -0,0 +1,35 @@
+import asyncio
+import uuid
+
+import pytest
+from prometheus_client import REGISTRY
+
+from exchanger.services.cache_service import get_or_compute
+from exchanger.services.redis_client import get_redis
+
+pytestmark = pytest.mark.anyio
+
+
+def cache_requests(name: str, result: str) -> float:
+    return REGISTRY.get_sample_value("cache_requests_total", {"cache": name, "result": result}) or 0
+
+
+async def test_stale_read_is_counted_once_and_refreshed(started_app):
+    redis_client = await get_redis()
+    key, name = f"test:{uuid.uuid4().hex}", f"test-{uuid.uuid4().hex}"
+    await redis_client.set(key, b'{"version":1}')
+
+    async def loader(db):
+        return {"version": 2}
+
+    # Значення є, але :fresh уже сплив - клієнт отримує старі дані, перерахунок іде у фоні
+    assert await get_or_compute(redis_client, key, loader, None, ttl=60, soft_ttl=10, name=name) == '{"version":1}'
+    assert cache_requests(name, "stale") == 1
+    assert cache_requests(name, "hit") == 0 and cache_requests(name, "miss") == 0
+
+    for _ in range(50):
+        if await redis_client.get(f"{key}:fresh"):
+            break
+        await asyncio.sleep(0.01)
+    assert await get_or_compute(redis_client, key, loader, None, ttl=60, soft_ttl=10, name=name) == '{"version":2}'
+    assert cache_requests(name, "hit") == 1 and cache_requests(name, "stale") == 1
@@ -0,0 +1,38 @@
+import pytest
+
+from conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_expenses_not_modified_until_write(client, user, category_id):
+    _, token = user
+    response = await client.get("/expenses/", headers=auth(token))
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = await client.get("/expenses/", headers={**auth(token), "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = await client.post("/expenses/new", headers=auth(token),
+                                 json={"category_id": category_id, "amount": 42, "description": "coffee"})
+    assert response.status_code == 201
+
+    response = await client.get("/expenses/", headers={**auth(token), "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [item["amount"] for item in response.json()["items"]] == [42]
+
+
+async def test_categories_not_modified_until_write(client, user):
+    _, token = user
+    response = await client.get("/categories/")
+    etag = response.headers["etag"]
+    assert (await client.get("/categories/", headers={"If-None-Match": etag})).status_code == 304
+
+    response = await client.post("/categories/new", headers=auth(token), json={"name": f"etag {token[-12:]}"})
+    assert response.status_code == 201
+    response = await client.get("/categories/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert f"etag {token[-12:]}" in [category["name"] for category in response.json()]
@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+
+import pytest
+
+from exchanger.dependencies import AsyncSessionLocal, BASE_CURRENCY
+from exchanger.services.currency_service import load_exchange_rates, store_rates
+
+from conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_timeseries_converts_each_day_at_its_rate(client, user, category_id):
+    _, token = user
+    today = date.today()
+    async with AsyncSessionLocal() as db:
+        await store_rates(db, [{"currency": "USD", "day": today - timedelta(days=5), "rate": 40.0},
+                               {"currency": "USD", "day": today - timedelta(days=2), "rate": 50.0}])
+        await db.commit()
+        await load_exchange_rates(db)
+
+    rows = [f"{category_id},10,usd early,USD,{today - timedelta(days=5)}",
+            f"{category_id},10,usd middle,USD,{today - timedelta(days=3)}",
+            f"{category_id},10,usd late,USD,{today - timedelta(days=1)}",
+            f"{category_id},100,local late,{BASE_CURRENCY},{today - timedelta(days=1)}"]
+    body = "category_id,amount,description,currency,created_at\n" + "\n".join(rows) + "\n"
+    response = await client.post("/expenses/bulk", content=body, headers={**auth(token), "Content-Type": "text/csv"})
+    assert response.json()["inserted"] == 4
+
+    async def timeseries(currency: str) -> dict:
+        response = await client.get("/statistics/timeseries", headers=auth(token), params={
+            "start": (today - timedelta(days=5)).isoformat(), "end": today.isoformat(), "currency": currency})
+        assert response.status_code == 200 and response.json()["currency"] == currency
+        return dict(zip(response.json()["buckets"], response.json()["totals"]))
+
+    # Курс дня - останній відомий на цей день: до нового курсу діє попередній
+    totals = await timeseries(BASE_CURRENCY)
+    assert totals[(today - timedelta(days=5)).isoformat()] == 400
+    assert totals[(today - timedelta(days=3)).isoformat()] == 400
+    assert totals[(today - timedelta(days=1)).isoformat()] == 600
+    totals = await timeseries("USD")
+    assert totals[(today - timedelta(days=5)).isoformat()] == 10
+    assert totals[(today - timedelta(days=1)).isoformat()] == 12
+
+    response = await client.get("/statistics/timeseries", headers=auth(token), params={
+        "start": today.isoformat(), "end": today.isoformat(), "currency": "XYZ"})
+    assert response.status_code == 400
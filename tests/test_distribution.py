@@ -0,0 +1,62 @@
+import random
+import statistics
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from exchanger.services.distribution_service import PERCENTILES, ExpenseSnapshot, compute_distribution
+
+
+def make_snapshot(expenses: list[tuple[int, date, int, int]]) -> ExpenseSnapshot:
+    ids, days, category_ids, amounts = zip(*expenses)
+    return ExpenseSnapshot("UAH", np.array(ids, dtype=np.int64), np.array(days, dtype="datetime64[D]"),
+                           np.array(category_ids, dtype=np.int64), np.array(amounts, dtype=np.int64))
+
+
+def reference(expenses, start: date, end: date, category_id: int | None, window: int) -> dict:
+    """Ті самі показники простим Python, без NumPy."""
+    selected = [e for e in expenses if start <= e[1] <= end and (category_id is None or e[2] == category_id)]
+    amounts = [e[3] for e in selected]
+    day_count = (end - start).days + 1
+    daily = [sum(e[3] for e in selected if (e[1] - start).days == offset) for offset in range(day_count)]
+    moving = [sum(daily[max(0, i - window + 1):i + 1]) / min(i + 1, window) for i in range(day_count)]
+    quantiles = statistics.quantiles(amounts, n=100, method="inclusive")
+    p25, p75 = quantiles[24], quantiles[74]
+    outliers = sorted((e for e in selected if e[3] > p75 + 1.5 * (p75 - p25)), key=lambda e: e[3], reverse=True)
+    return {
+        "count": len(amounts),
+        "total": sum(amounts),
+        "daily_totals": daily,
+        "moving_average": [round(value, 2) for value in moving],
+        "weekday_totals": [sum(e[3] for e in selected if e[1].weekday() == weekday) for weekday in range(7)],
+        "weekday_counts": [sum(1 for e in selected if e[1].weekday() == weekday) for weekday in range(7)],
+        "mean": round(statistics.fmean(amounts), 2),
+        "percentiles": {f"p{p}": round(quantiles[p - 1], 2) for p in PERCENTILES},
+        "outlier_ids": [e[0] for e in outliers[:10]],
+    }
+
+
+@pytest.mark.parametrize("category_id, window", [(None, 7), (2, 30), (None, 1)])
+def test_distribution_matches_plain_python(category_id, window):
+    rng = random.Random(42)
+    first_day = date(2024, 1, 1)
+    # Різні суми, щоб порядок викидів не залежав від розв'язання рівних значень
+    amounts = rng.sample(range(100, 100_000), 600) + [500_000, 750_000, 900_000]
+    expenses = sorted(((expense_id, first_day + timedelta(days=rng.randrange(120)), rng.choice((1, 2, 3)), amount)
+                       for expense_id, amount in enumerate(amounts, start=1)), key=lambda e: (e[1], e[0]))
+    start, end = first_day + timedelta(days=10), first_day + timedelta(days=99)
+
+    result = compute_distribution(make_snapshot(expenses), start, end, category_id, window)
+    expected = reference(expenses, start, end, category_id, window)
+
+    assert result["days"] == [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    assert [outlier["id"] for outlier in result.pop("outliers")] == expected.pop("outlier_ids")
+    assert {key: result[key] for key in expected} == expected
+
+
+def test_empty_period_has_no_percentiles():
+    snapshot = make_snapshot([(1, date(2024, 1, 1), 1, 100)])
+    result = compute_distribution(snapshot, date(2024, 2, 1), date(2024, 2, 3))
+    assert result["count"] == 0 and result["mean"] is None and result["percentiles"] == {}
+    assert result["daily_totals"] == [0, 0, 0]
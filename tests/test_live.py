@@ -0,0 +1,53 @@
+import asyncio
+
+import orjson
+import pytest
+from sqlalchemy import select
+
+from exchanger.dependencies import AsyncSessionLocal
+from exchanger.models.users_model import Users
+from exchanger.services.live_service import live_hub, live_stream
+from exchanger.services.redis_client import get_redis
+
+from conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+
+def parse_event(chunk: bytes) -> tuple[str, dict]:
+    fields = dict(line.split(": ", 1) for line in chunk.decode().splitlines() if ": " in line)
+    return fields["event"], orjson.loads(fields["data"])
+
+
+async def next_event(stream) -> tuple[str, dict]:
+    return parse_event(await asyncio.wait_for(anext(stream), 5))
+
+
+async def test_stream_delivers_expense_events_and_updated_totals(client, user, category_id):
+    email, token = user
+    async with AsyncSessionLocal() as db:
+        user_id = (await db.execute(select(Users.id).where(Users.email == email))).scalar_one()
+    connections = live_hub.connections
+    stream = live_stream(await get_redis(), user_id, "month", None)
+    try:
+        event, data = await next_event(stream)
+        assert event == "summary" and data["summary"]["total_amount"] == 0
+        assert live_hub.connections == connections + 1
+
+        # Зміна, зроблена через API, доходить через pub/sub: спершу сама подія, потім новий підсумок
+        response = await client.post("/expenses/new", headers=auth(token),
+                                     json={"category_id": category_id, "amount": 250, "description": "live"})
+        assert response.status_code == 201
+        event, data = await next_event(stream)
+        assert event == "expense" and data["type"] == "created" and data["expense"]["amount"] == 250
+        event, data = await next_event(stream)
+        assert event == "summary" and data["summary"]["total_amount"] == 250
+
+        response = await client.delete(f"/expenses/{response.json()['id']}", headers=auth(token))
+        assert response.status_code == 204
+        assert (await next_event(stream))[0] == "expense"
+        event, data = await next_event(stream)
+        assert event == "summary" and data["summary"]["total_amount"] == 0
+    finally:
+        await stream.aclose()
+    assert live_hub.connections == connections
@@ -0,0 +1,79 @@
+import json
+
+import fakeredis
+import pytest
+
+from exchanger.services.mail_service import (MAIL_HEARTBEAT_PREFIX, MAIL_PROCESSING_PREFIX, MAIL_QUEUE_KEY,
+                                             MAIL_RETRY_KEY, MAIL_WORKERS_KEY, MailDispatcher)
+
+pytestmark = pytest.mark.anyio
+
+
+def message(to: str) -> str:
+    return json.dumps({"to": to, "subject": "s", "html": "h", "attempts": 0})
+
+
+@pytest.fixture
+async def redis_client():
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    yield client
+    await client.aclose()
+
+
+async def test_batch_stays_in_processing_until_finished(redis_client):
+    await redis_client.rpush(MAIL_QUEUE_KEY, message("a"), message("b"))
+    dispatcher = MailDispatcher()
+    batch = await dispatcher._take_batch(redis_client)
+    assert [json.loads(raw)["to"] for raw in batch] == ["a", "b"]
+    # Між вибором і відправкою листи лежать у processing воркера, а не лише в пам'яті
+    assert await redis_client.llen(MAIL_QUEUE_KEY) == 0
+    assert await redis_client.lrange(dispatcher.processing_key, 0, -1) == batch
+
+    await dispatcher._finish_batch(redis_client, batch, {1: "refused"})
+    assert await redis_client.llen(dispatcher.processing_key) == 0
+    retries = await redis_client.zrange(MAIL_RETRY_KEY, 0, -1)
+    assert [json.loads(raw)["to"] for raw in retries] == ["b"]
+
+
+async def test_processing_of_dead_worker_is_requeued(redis_client):
+    await redis_client.sadd(MAIL_WORKERS_KEY, "crashed", "alive")
+    await redis_client.rpush(f"{MAIL_PROCESSING_PREFIX}crashed", message("lost"))
+    await redis_client.rpush(f"{MAIL_PROCESSING_PREFIX}alive", message("sending"))
+    await redis_client.set(f"{MAIL_HEARTBEAT_PREFIX}alive", "1")
+    await redis_client.rpush(MAIL_QUEUE_KEY, message("next"))
+
+    await MailDispatcher()._requeue_orphans(redis_client)
+    queue = [json.loads(raw)["to"] for raw in await redis_client.lrange(MAIL_QUEUE_KEY, 0, -1)]
+    assert queue == ["lost", "next"]
+    assert await redis_client.llen(f"{MAIL_PROCESSING_PREFIX}alive") == 1
+    assert await redis_client.smembers(MAIL_WORKERS_KEY) == {"alive"}
+
+
+async def test_message_that_cannot_be_built_goes_to_retry_not_crash(redis_client):
+    dispatcher = MailDispatcher()
+    sent = []
+
+    class FakeSMTP:
+        def noop(self):
+            pass
+
+        def send_message(self, msg):
+            sent.append(msg["To"])
+
+    dispatcher._smtp = FakeSMTP()
+    bad = json.loads(message("a@b.c\nBcc: x@y.z"))
+    failures = dispatcher._send_batch([bad, json.loads(message("ok@example.com"))])
+    assert list(failures) == [0]
+    assert sent == ["ok@example.com"]
+
+    raw = json.dumps(bad)
+    await redis_client.rpush(dispatcher.processing_key, raw)
+    await dispatcher._finish_batch(redis_client, [raw], failures)
+    assert await redis_client.llen(dispatcher.processing_key) == 0
+    assert await redis_client.zcard(MAIL_RETRY_KEY) == 1
+
+
+async def test_register_rejects_address_with_header_injection(client):
+    response = await client.post("/auth/register", json={"email": "a@b.c\nBcc: x@y.z", "full_name": "X",
+                                                         "password": "secret", "role": "user"})
+    assert response.status_code == 422
@@ -0,0 +1,42 @@
+import sqlite3
+
+from sqlalchemy import create_engine, inspect
+
+from exchanger.services.migrations import MIGRATIONS, apply_migrations
+
+# Схема бази до цієї серії змін: без валюти, індексу keyset-пагінації і агрегатів
+BASELINE_SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL UNIQUE, hashed_password VARCHAR NOT NULL,
+                    full_name VARCHAR NOT NULL, role VARCHAR NOT NULL, is_active BOOLEAN,
+                    verification_token VARCHAR, created_at DATE, updated_at DATE);
+CREATE TABLE categories (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL UNIQUE, user_id INTEGER,
+                         created_at DATE, updated_at DATE);
+CREATE TABLE expenses (id INTEGER PRIMARY KEY, user_id INTEGER, category_id INTEGER NOT NULL,
+                       amount INTEGER NOT NULL, description VARCHAR NOT NULL, created_at DATE, updated_at DATE);
+CREATE INDEX ix_expenses_id ON expenses (id);
+"""
+
+
+def test_baseline_database_gets_index_and_rollups(tmp_path):
+    path = tmp_path / "baseline.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany("INSERT INTO expenses (user_id, category_id, amount, description, created_at) VALUES (?, ?, ?, ?, ?)",
+                     [(1, 1, 100, "a", "2024-03-01"), (1, 1, 50, "b", "2024-03-01"), (1, 2, 7, "c", "2024-03-02"),
+                      (2, 1, 9, "d", "2024-03-01")])
+    conn.commit()
+    conn.close()
+
+    engine = create_engine(f"sqlite:///{path}")
+    assert apply_migrations(engine) == [version for version, _, _ in MIGRATIONS]
+    assert "ix_expenses_user_created_id" in {index["name"] for index in inspect(engine).get_indexes("expenses")}
+
+    conn = sqlite3.connect(path)
+    rollups = conn.execute("SELECT user_id, day, category_id, currency, total, count FROM expense_daily_rollups "
+                           "ORDER BY user_id, day, category_id").fetchall()
+    conn.close()
+    assert rollups == [(1, "2024-03-01", 1, "UAH", 150, 2), (1, "2024-03-02", 2, "UAH", 7, 1),
+                       (2, "2024-03-01", 1, "UAH", 9, 1)]
+    # Повторний старт нічого не застосовує
+    assert apply_migrations(engine) == []
+    engine.dispose()
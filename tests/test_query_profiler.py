@@ -0,0 +1,28 @@
+from sqlalchemy import create_engine, text
+
+from exchanger.services.query_profiler import QueryProfiler
+
+
+def run_queries(profiler: QueryProfiler):
+    engine = create_engine("sqlite://")
+    profiler.instrument(engine)
+    with engine.connect() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        for column in ("id", "name", "id, name"):
+            conn.execute(text(f"SELECT {column} FROM items WHERE name = :name"), {"name": "x"})
+
+
+def test_fast_queries_are_not_explained():
+    profiler = QueryProfiler(slow_query_ms=10_000)
+    run_queries(profiler)
+    assert len(profiler._plans) == 0
+    statements = profiler.report()["routes"]["background"]["statements"]
+    assert len(statements) == 4 and all(statement["plan"] == [] for statement in statements)
+
+
+def test_slow_query_plans_are_bounded():
+    profiler = QueryProfiler(slow_query_ms=0, max_plans=2)
+    run_queries(profiler)
+    assert list(profiler._plans) == ["SELECT name FROM items WHERE name = ?", "SELECT id, name FROM items WHERE name = ?"]
+    report = profiler.report()["routes"]["background"]["statements"]
+    assert any(statement["full_scan"] for statement in report)
@@ -0,0 +1,72 @@
+import uuid
+
+import pytest
+
+from exchanger.dependencies import AsyncSessionLocal
+from exchanger.models.category_model import Category
+from exchanger.routers import expenses as expenses_router
+from exchanger.services import search_service
+
+from conftest import auth
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def other_category_id(started_app) -> int:
+    async with AsyncSessionLocal() as db:
+        category = Category(name=f"category {uuid.uuid4().hex}", user_id=None)
+        db.add(category)
+        await db.commit()
+        return category.id
+
+
+async def import_expenses(client, token: str, rows: list[str]) -> None:
+    body = "category_id,amount,description\n" + "\n".join(rows) + "\n"
+    response = await client.post("/expenses/bulk", content=body, headers={**auth(token), "Content-Type": "text/csv"})
+    assert response.status_code == 200 and response.json()["inserted"] == len(rows)
+
+
+async def search(client, token: str, **params) -> dict:
+    response = await client.get("/expenses/search", params=params, headers=auth(token))
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_search_ranks_by_relevance_and_filters_by_category(client, user, category_id, other_category_id):
+    _, token = user
+    await import_expenses(client, token, [f"{category_id},10,coffee beans and a long list of other groceries",
+                                          f"{other_category_id},20,coffee coffee",
+                                          f"{category_id},30,tea leaves"])
+
+    # Опис, де слово трапляється частіше і який коротший, іде першим
+    found = await search(client, token, q="coffee")
+    assert [item["description"] for item in found["items"]] == \
+           ["coffee coffee", "coffee beans and a long list of other groceries"]
+    assert found["truncated"] is False
+
+    # Префікс останнього слова теж збігається, а фільтр за категорією відсікає інші
+    found = await search(client, token, q="cof", category_id=category_id)
+    assert [item["amount"] for item in found["items"]] == [10]
+    found = await search(client, token, q="coffee grocer")
+    assert [item["amount"] for item in found["items"]] == [10]
+
+
+async def test_search_without_filters_reports_candidate_cap(client, user, category_id, monkeypatch):
+    _, token = user
+    monkeypatch.setattr(search_service, "SEARCH_MAX_CANDIDATES", 3)
+    monkeypatch.setattr(expenses_router, "SEARCH_MAX_CANDIDATES", 3)
+    await import_expenses(client, token, [f"{category_id},{amount},lunch {amount}" for amount in range(1, 6)])
+
+    # Ранжуються лише три найновіші збіги, і відповідь про це каже
+    found = await search(client, token, q="lunch", limit=2)
+    assert found["truncated"] is True and found["next_offset"] is None
+    assert {item["amount"] for item in found["items"]} <= {3, 4, 5}
+
+    response = await client.get("/expenses/search", params={"q": "lunch", "limit": 2, "offset": 2},
+                                headers=auth(token))
+    assert response.status_code == 400
+
+    # З фільтром межі немає: видно всі збіги
+    found = await search(client, token, q="lunch", limit=10, category_id=category_id)
+    assert found["truncated"] is False and len(found["items"]) == 5